@@ -0,0 +1,351 @@
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from itertools import chain
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import traceback
+from cache import CHANGE_STREAM_ENABLED, start_change_stream_invalidation
+from cli import CONSULTAS, LISTINGS, iter_listing
+from database import get_config, get_database, get_pool_metrics, close_database
+import operations
+import writes
+from profiling import command_metrics
+from query_cache import QUERY_CACHE_ENABLED, QUERY_CACHE_TTL, WATCHED_COLLECTIONS, query_cache
+from validation import ValidationError, parse_id, parse_id_list
+from writes import write_metrics
+
+# HTTP/JSON API over the same operations and queries as the menus and the CLI.
+# Every worker thread shares the pooled client of database.py.
+#
+#   GET    /usuarios | /times-oficiais | /jogadores | /times-usuario | /jogadores-sem-time
+#   GET    /consultas/por-posicao | /consultas/sem-time | /consultas/time-preferido?usuario_id=1
+#   POST   /usuarios | /times-oficiais | /jogadores | /times-usuario
+#   POST   /times-usuario/{id}/jogadores        {"jogadores": [1, 2, 3]}
+#   PATCH  /jogadores/{id}                      {"time_id": 2, "posicao": "Atacante"}
+#   DELETE /jogadores/{id}
+#   GET    /saude | /metricas
+#
+# The POSTs go through writes.py (retries with backoff); a client that sends an
+# Idempotency-Key header can repeat the request without creating twice.
+#
+# Listings are streamed with chunked transfer encoding as a JSON array
+# (or JSON lines with ?formato=jsonl), so memory does not grow with the result.
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Requests handled at once; more would only wait for a pooled connection
+API_WORKERS = int(os.getenv("API_WORKERS", "16"))
+# Seconds a keep-alive connection may stay idle (or a request stall) before it
+# is closed: every open connection holds a worker
+API_IDLE_TIMEOUT = float(os.getenv("API_IDLE_TIMEOUT", "15"))
+# Bytes buffered before a chunk is sent
+STREAM_CHUNK_SIZE = 64 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+
+class ApiError(Exception):
+    """An error answered with the given HTTP status and {"erro": message}"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+def _read_body(handler: "ApiHandler") -> bytes:
+    """The raw request body, read before routing so no error path leaves it on the connection"""
+    if "chunked" in handler.headers.get("Transfer-Encoding", "").lower():
+        raise ApiError(HTTPStatus.LENGTH_REQUIRED, "Informe o Content-Length do corpo")
+    try:
+        length = int(handler.headers.get("Content-Length") or 0)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length inválido")
+    if length < 0:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length inválido")
+    if length > MAX_BODY_SIZE:
+        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição muito grande")
+    return handler.rfile.read(length) if length else b""
+
+def _body(handler: "ApiHandler") -> Dict[str, Any]:
+    try:
+        data = json.loads(handler.body or b"{}")
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "JSON inválido")
+    if not isinstance(data, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "O corpo deve ser um objeto JSON")
+    return data
+
+def _listing(name: str) -> Callable[..., None]:
+    listing = LISTINGS[name]
+
+    def get(handler: "ApiHandler", query: Dict[str, str]) -> None:
+        handler.send_rows(listing.fields, iter_listing(get_database(), listing), query)
+    return get
+
+def _consulta(name: str) -> Callable[..., None]:
+    def get(handler: "ApiHandler", query: Dict[str, str]) -> None:
+        usuario_id = parse_id(query["usuario_id"]) if query.get("usuario_id") else None
+        report = CONSULTAS[name](get_database(), usuario_id)
+        handler.send_rows(report.fields, report.rows, query)
+    return get
+
+def _idempotency_key(handler: "ApiHandler") -> Optional[str]:
+    return handler.headers.get("Idempotency-Key") or None
+
+def _create(operation: Callable[..., Dict[str, Any]]) -> Callable[..., None]:
+    def post(handler: "ApiHandler", query: Dict[str, str]) -> None:
+        created = operation(get_database(), _body(handler), _idempotency_key(handler))
+        handler.send_json(HTTPStatus.CREATED, operations.public_document(created))
+    return post
+
+def adicionar_jogadores(handler: "ApiHandler", query: Dict[str, str], time_usuario_id: str) -> None:
+    result = writes.adicionar_jogadores(get_database(), parse_id(time_usuario_id),
+                                        parse_id_list(_body(handler).get("jogadores")), _idempotency_key(handler))
+    status = HTTPStatus.CREATED if result.inseridos else HTTPStatus.CONFLICT
+    handler.send_json(status, vars(result))
+
+def transferir_jogador(handler: "ApiHandler", query: Dict[str, str], jogador_id: str) -> None:
+    jogador = operations.transferir_jogador(get_database(), parse_id(jogador_id), _body(handler))
+    handler.send_json(HTTPStatus.OK, operations.public_document(jogador))
+
+def remover_jogador(handler: "ApiHandler", query: Dict[str, str], jogador_id: str) -> None:
+    handler.send_json(HTTPStatus.OK, operations.public_document(operations.remover_jogador(get_database(), parse_id(jogador_id))))
+
+def saude(handler: "ApiHandler", query: Dict[str, str]) -> None:
+    get_database().command("ping")
+    handler.send_json(HTTPStatus.OK, {"status": "ok", "pool": get_pool_metrics()})
+
+def metricas(handler: "ApiHandler", query: Dict[str, str]) -> None:
+    body = command_metrics.to_prometheus({
+        "mongo_pool": get_pool_metrics(), "app_query_cache": query_cache.stats(), "app_writes": write_metrics.stats()
+    }).encode("utf-8")
+    handler.send_bytes(HTTPStatus.OK, body, "text/plain; version=0.0.4; charset=utf-8")
+
+# (method, path regex) -> handler(request, query, *path groups)
+ROUTES: List[Tuple[str, "re.Pattern[str]", Callable[..., None]]] = [
+    ("GET", re.compile(r"/saude"), saude),
+    ("GET", re.compile(r"/metricas"), metricas),
+    *[("GET", re.compile(f"/{name}"), _listing(name)) for name in LISTINGS],
+    *[("GET", re.compile(f"/consultas/{name}"), _consulta(name)) for name in CONSULTAS],
+    ("POST", re.compile(r"/usuarios"), _create(writes.cadastrar_usuario)),
+    ("POST", re.compile(r"/times-oficiais"), _create(writes.cadastrar_time_oficial)),
+    ("POST", re.compile(r"/jogadores"), _create(writes.cadastrar_jogador)),
+    ("POST", re.compile(r"/times-usuario"), _create(writes.criar_time_usuario)),
+    ("POST", re.compile(r"/times-usuario/([^/]+)/jogadores"), adicionar_jogadores),
+    ("PATCH", re.compile(r"/jogadores/([^/]+)"), transferir_jogador),
+    ("DELETE", re.compile(r"/jogadores/([^/]+)"), remover_jogador)
+]
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Dispatches requests to ROUTES and turns exceptions into JSON errors"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "FutebolApp"
+    # Headers, chunks and the terminator are separate writes: without this,
+    # Nagle's algorithm and delayed ACKs add ~40 ms to every response
+    disable_nagle_algorithm = True
+    # Socket timeout: an idle keep-alive client would otherwise hold its worker forever
+    timeout = API_IDLE_TIMEOUT
+
+    def do_GET(self) -> None:
+        self.dispatch("GET")
+
+    def do_POST(self) -> None:
+        self.dispatch("POST")
+
+    def do_PATCH(self) -> None:
+        self.dispatch("PATCH")
+
+    def do_PUT(self) -> None:
+        self.dispatch("PUT")
+
+    def do_DELETE(self) -> None:
+        self.dispatch("DELETE")
+
+    def dispatch(self, method: str) -> None:
+        self.streaming = False
+        try:
+            self.body = _read_body(self)
+        except ApiError as e:
+            # The body was not read: it would be parsed as the next request
+            self.close_connection = True
+            self.send_json(e.status, {"erro": str(e)})
+            return
+
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/") or "/"
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        allowed = []
+        for route_method, pattern, route in ROUTES:
+            match = pattern.fullmatch(path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed.append(route_method)
+                continue
+            try:
+                route(self, query, *match.groups())
+            except ApiError as e:
+                self.send_json(e.status, {"erro": str(e)})
+            except ValidationError as e:
+                self.send_json(HTTPStatus.BAD_REQUEST, {"erro": str(e)})
+            except DuplicateKeyError:
+                self.send_json(HTTPStatus.CONFLICT, {"erro": "Registro duplicado"})
+            except PyMongoError as e:
+                self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"erro": str(e)})
+            except Exception:
+                traceback.print_exc()
+                if self.streaming:
+                    # The status is already sent: only a dropped connection tells the client
+                    self.close_connection = True
+                else:
+                    self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": "Erro interno do servidor"})
+            return
+
+        if allowed:
+            self.send_json(HTTPStatus.METHOD_NOT_ALLOWED, {"erro": "Método não permitido"}, {"Allow": ", ".join(allowed)})
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {"erro": "Rota não encontrada"})
+
+    def send_bytes(self, status: int, body: bytes, content_type: str,
+                   headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, data: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_bytes(status, body, "application/json; charset=utf-8", headers)
+
+    def send_rows(self, fields: List[str], rows: Iterable[Tuple[Any, ...]], query: Dict[str, str]) -> None:
+        """Stream rows as a JSON array (or JSON lines) in chunks of ~STREAM_CHUNK_SIZE bytes"""
+        jsonl = query.get("formato") == "jsonl"
+        rows = iter(rows)
+        # Pull the first row before the headers, so query errors still get a proper status
+        first = next(rows, None)
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson" if jsonl else "application/json; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.streaming = True
+
+        buffer: List[str] = [] if jsonl else ["["]
+        size = 0
+        count = 0
+        try:
+            for row in chain([first], rows) if first is not None else ():
+                item = json.dumps(dict(zip(fields, row)), ensure_ascii=False, default=str)
+                piece = item + "\n" if jsonl else ("," if count else "") + item
+                buffer.append(piece)
+                size += len(piece)
+                count += 1
+                if size >= STREAM_CHUNK_SIZE:
+                    self._chunk("".join(buffer))
+                    buffer, size = [], 0
+        except PyMongoError:
+            # The status is already sent: drop the connection so the client sees a truncated body
+            self.close_connection = True
+            return
+        if not jsonl:
+            buffer.append("]")
+        self._chunk("".join(buffer))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles each connection on a fixed-size thread pool.
+
+    Unlike ThreadingHTTPServer, the number of threads (and so of concurrent
+    MongoDB operations) stays bounded under load. A connection keeps its
+    worker until it closes, so at most `workers` connections are accepted at
+    once; the others wait in the listen backlog instead of a queue no worker
+    would reach while idle connections hold them (ApiHandler.timeout closes
+    those).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], workers: int = API_WORKERS, verbose: bool = False) -> None:
+        super().__init__(address, ApiHandler)
+        self.verbose = verbose
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.slots = threading.BoundedSemaphore(workers)
+
+    def verify_request(self, request: Any, client_address: Any) -> bool:
+        # Called by serve_forever before process_request: wait for a free worker
+        self.slots.acquire()
+        return True
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        try:
+            self.executor.submit(self._process, request, client_address)
+        except RuntimeError:
+            # Executor already shut down
+            self.slots.release()
+            self.shutdown_request(request)
+
+    def _process(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON das consultas e cadastros")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="requisições atendidas em paralelo")
+    parser.add_argument("--verbose", action="store_true", help="registra cada requisição")
+    args = parser.parse_args()
+
+    if args.workers > get_config().max_pool_size:
+        print(f"⚠ {args.workers} workers para um pool de {get_config().max_pool_size} conexões (MONGODB_MAX_POOL_SIZE)")
+
+    server = PooledHTTPServer((args.host, args.port), args.workers, args.verbose)
+    print(f"✓ API em http://{args.host}:{args.port} ({args.workers} workers) - Ctrl+C para parar")
+    try:
+        db = get_database()
+        if CHANGE_STREAM_ENABLED:
+            # Writes by other processes (CLI, importer, other API instances)
+            start_change_stream_invalidation(db, WATCHED_COLLECTIONS)
+        elif QUERY_CACHE_ENABLED:
+            print(f"⚠ Sem CACHE_CHANGE_STREAM=1, escritas de outros processos aparecem nas consultas após até {QUERY_CACHE_TTL:.0f}s (QUERY_CACHE_TTL)")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Até logo!")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        server.server_close()
+        close_database()
+
+if __name__ == "__main__":
+    main()
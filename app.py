@@ -1,50 +1,20 @@
-from pymongo import MongoClient, ASCENDING
-from pymongo.database import Database
 from pymongo.errors import DuplicateKeyError
-from typing import List, Tuple, Any, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import re
 import sys
-from datetime import datetime
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-MONGODB_URI = os.getenv("MONGODB_URI")
-if not MONGODB_URI:
-    raise ValueError("MONGODB_URI environment variable is not set")
-
-# Global variables for connection management
-_client: MongoClient = None
-_database: Database = None
-
-def get_database() -> Database:
-    """Get MongoDB database (singleton pattern)"""
-    global _client, _database
-
-    if _database is None:
-        _client = MongoClient(MONGODB_URI)
-        db_name = MONGODB_URI.split("/")[-1].split("?")[0]
-        if not db_name or db_name == "":
-            db_name = "futebol_app"
-        _database = _client[db_name]
-
-    return _database
-
-def close_database() -> None:
-    """Close MongoDB connection"""
-    global _client, _database
-
-    if _client is not None:
-        _client.close()
-        _client = None
-        _database = None
-
-def get_next_id(db: Database, collection_name: str) -> int:
-    """Get next auto-increment ID for a collection"""
-    result = db[collection_name].find_one(sort=[("_id", -1)])
-    if result:
-        return result["_id"] + 1
-    return 1
+from cache import CHANGE_STREAM_ENABLED, reference_cache, start_change_stream_invalidation
+import cli
+from cli import LISTINGS, Listing
+from database import get_database, get_pool_metrics, close_database
+from position_counts import POSITION_COUNTS_COLLECTION, ensure_position_counts
+from profiling import PROFILE_HISTORY, command_metrics
+from queries import PageKey, iter_pages, name_key, jogadores_por_posicao_resumo_pipeline, time_preferido_pipeline
+from query_cache import WATCHED_COLLECTIONS, cached_aggregate, query_cache
+from search import describe, search
+import writes
+from writes import write_metrics
+from table import print_table, print_table_stream
+from validation import SEXO_OPCOES, ValidationError, is_valid_date, parse_id_list
 
 def clear_screen() -> None:
     """Clear terminal screen"""
@@ -58,36 +28,46 @@ def print_header(title: str) -> None:
     print("=" * 80)
     print()
 
-def print_table(headers: List[str], rows: List[Tuple[Any, ...]]) -> None:
-    """Print query results in a formatted table"""
-    if not rows:
-        print("Nenhum resultado encontrado.")
-        return
-
-    col_widths = [len(h) for h in headers]
+def wait_for_enter() -> None:
+    """Wait for user to press enter"""
+    input("\nPressione ENTER para continuar...")
 
-    for row in rows:
-        for i, cell in enumerate(row):
-            cell_str = str(cell) if cell is not None else "NULL"
-            col_widths[i] = max(col_widths[i], len(cell_str))
+def print_paginated(headers: List[str], fetch_page: Callable[..., Any],
+                    to_rows: Callable[[Dict[str, Any]], Iterable[Tuple[Any, ...]]],
+                    page_key: Callable[[Dict[str, Any]], PageKey] = name_key) -> None:
+    """Print a listing page by page, streaming each page's rows as the cursor yields them"""
+    db = get_database()
 
-    header_row = " | ".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
-    separator = "-+-".join("-" * w for w in col_widths)
+    for number, page in enumerate(iter_pages(fetch_page, db, to_rows, page_key), start=1):
+        print_table_stream(headers, page.rows())
+        if not page.has_more:
+            break
+        if input(f"Página {number} - ENTER para a próxima, 0 para parar: ").strip() == "0":
+            break
 
-    print(header_row)
-    print(separator)
+def print_listing(listing: Listing) -> None:
+    """Print one of cli.LISTINGS page by page"""
+    print_paginated(listing.headers, listing.fetch_page, listing.to_rows, listing.page_key)
 
-    for row in rows:
-        row_str = " | ".join(
-            (str(cell) if cell is not None else "NULL").ljust(col_widths[i])
-            for i, cell in enumerate(row)
-        )
-        print(row_str)
-    print()
+# Answers taken as IDs by prompt_id: digits, commas and spaces (or nothing)
+ID_INPUT = re.compile(r"[\d\s,]*")
 
-def wait_for_enter() -> None:
-    """Wait for user to press enter"""
-    input("\nPressione ENTER para continuar...")
+def prompt_id(collection_name: str, prompt: str) -> str:
+    """Read an ID (or list of IDs); any other text is a name search, shown before asking again"""
+    db = get_database()
+    while True:
+        valor = input(f"{prompt} [ou parte do nome para buscar]: ").strip()
+        if ID_INPUT.fullmatch(valor):
+            return valor
+        try:
+            results = search(db, collection_name, valor)
+        except Exception as e:
+            print(f"❌ Erro na busca: {e}")
+            continue
+        if not results:
+            print(f"  Nenhum resultado para '{valor}'")
+        for doc in results:
+            print(f"  {describe(collection_name, doc)}")
 
 def cadastrar_usuario() -> None:
     """Register new user"""
@@ -116,8 +96,7 @@ def cadastrar_usuario() -> None:
     print("2 - Feminino (F)")
     print("3 - Outro (O)")
     sexo_opcao = input("Escolha (1-3): ").strip()
-    sexo_map = {"1": "M", "2": "F", "3": "O"}
-    sexo = sexo_map.get(sexo_opcao)
+    sexo = SEXO_OPCOES.get(sexo_opcao)
 
     if not sexo:
         print("❌ Opção de sexo inválida!")
@@ -128,9 +107,7 @@ def cadastrar_usuario() -> None:
     telefone = telefone if telefone else None
 
     data_nascimento = input("Data de nascimento (AAAA-MM-DD): ").strip()
-    try:
-        datetime.strptime(data_nascimento, "%Y-%m-%d")
-    except ValueError:
+    if not is_valid_date(data_nascimento):
         print("❌ Data inválida! Use o formato AAAA-MM-DD")
         wait_for_enter()
         return
@@ -141,9 +118,7 @@ def cadastrar_usuario() -> None:
     db = get_database()
 
     try:
-        user_id = get_next_id(db, "usuario")
-        usuario = {
-            "_id": user_id,
+        usuario = writes.cadastrar_usuario(db, {
             "nome": nome,
             "email": email,
             "senha": senha,
@@ -151,9 +126,10 @@ def cadastrar_usuario() -> None:
             "telefone": telefone,
             "data_nascimento": data_nascimento,
             "time_preferido": time_preferido
-        }
-        db.usuario.insert_one(usuario)
-        print(f"\n✅ Usuário '{nome}' cadastrado com sucesso! ID: {user_id}")
+        })
+        print(f"\n✅ Usuário '{nome}' cadastrado com sucesso! ID: {usuario['_id']}")
+    except ValidationError as e:
+        print(f"\n❌ {e}")
     except DuplicateKeyError:
         print("\n❌ Erro: Email já cadastrado!")
     except Exception as e:
@@ -180,14 +156,10 @@ def cadastrar_time_oficial() -> None:
     db = get_database()
 
     try:
-        time_id = get_next_id(db, "time_oficial")
-        time_oficial = {
-            "_id": time_id,
-            "nome": nome,
-            "sigla": sigla
-        }
-        db.time_oficial.insert_one(time_oficial)
-        print(f"\n✅ Time '{nome}' cadastrado com sucesso! ID: {time_id}")
+        time_oficial = writes.cadastrar_time_oficial(db, {"nome": nome, "sigla": sigla})
+        print(f"\n✅ Time '{nome}' cadastrado com sucesso! ID: {time_oficial['_id']}")
+    except ValidationError as e:
+        print(f"\n❌ {e}")
     except DuplicateKeyError:
         print(f"\n❌ Erro: Sigla '{sigla}' já cadastrada!")
     except Exception as e:
@@ -201,15 +173,6 @@ def cadastrar_jogador() -> None:
 
     db = get_database()
 
-    times = list(db.time_oficial.find({}, {"_id": 1, "nome": 1, "sigla": 1}).sort("nome", ASCENDING))
-
-    if times:
-        print("Times disponíveis:")
-        for time in times:
-            print(f"  {time['_id']} - {time['nome']} ({time['sigla']})")
-        print("  0 - Sem time (jogador livre)")
-        print()
-
     nome = input("Nome do jogador: ").strip()
     if not nome:
         print("❌ Nome é obrigatório!")
@@ -222,7 +185,7 @@ def cadastrar_jogador() -> None:
         wait_for_enter()
         return
 
-    time_id_input = input("ID do time (0 para jogador livre): ").strip()
+    time_id_input = prompt_id("time_oficial", "ID do time (0 para jogador livre)")
     time_id: Optional[int] = None
 
     if time_id_input and time_id_input != "0":
@@ -234,15 +197,10 @@ def cadastrar_jogador() -> None:
             return
 
     try:
-        jogador_id = get_next_id(db, "jogador")
-        jogador = {
-            "_id": jogador_id,
-            "nome": nome,
-            "posicao": posicao,
-            "time_id": time_id
-        }
-        db.jogador.insert_one(jogador)
-        print(f"\n✅ Jogador '{nome}' cadastrado com sucesso! ID: {jogador_id}")
+        jogador = writes.cadastrar_jogador(db, {"nome": nome, "posicao": posicao, "time_id": time_id})
+        print(f"\n✅ Jogador '{nome}' cadastrado com sucesso! ID: {jogador['_id']}")
+    except ValidationError as e:
+        print(f"\n❌ {e}")
     except Exception as e:
         print(f"\n❌ Erro ao cadastrar jogador: {e}")
 
@@ -254,19 +212,12 @@ def criar_time_usuario() -> None:
 
     db = get_database()
 
-    usuarios = list(db.usuario.find({}, {"_id": 1, "nome": 1, "email": 1}).sort("nome", ASCENDING))
-
-    if not usuarios:
+    if not db.usuario.find_one({}, {"_id": 1}):
         print("❌ Nenhum usuário cadastrado! Cadastre um usuário primeiro.")
         wait_for_enter()
         return
 
-    print("Usuários disponíveis:")
-    for usuario in usuarios:
-        print(f"  {usuario['_id']} - {usuario['nome']} ({usuario['email']})")
-    print()
-
-    usuario_id_input = input("ID do usuário dono do time: ").strip()
+    usuario_id_input = prompt_id("usuario", "ID do usuário dono do time")
     try:
         usuario_id = int(usuario_id_input)
     except ValueError:
@@ -281,18 +232,10 @@ def criar_time_usuario() -> None:
         return
 
     try:
-        # Check if user exists
-        if not db.usuario.find_one({"_id": usuario_id}):
-            print(f"\n❌ Erro: Usuário ID {usuario_id} não existe!")
-        else:
-            time_usuario_id = get_next_id(db, "time_usuario")
-            time_usuario = {
-                "_id": time_usuario_id,
-                "nome": nome_time,
-                "usuario_id": usuario_id
-            }
-            db.time_usuario.insert_one(time_usuario)
-            print(f"\n✅ Time '{nome_time}' criado com sucesso! ID: {time_usuario_id}")
+        time_usuario = writes.criar_time_usuario(db, {"nome": nome_time, "usuario_id": usuario_id})
+        print(f"\n✅ Time '{nome_time}' criado com sucesso! ID: {time_usuario['_id']}")
+    except ValidationError as e:
+        print(f"\n❌ Erro: {e}")
     except Exception as e:
         print(f"\n❌ Erro ao criar time: {e}")
 
@@ -304,38 +247,12 @@ def adicionar_jogador_time_usuario() -> None:
 
     db = get_database()
 
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "usuario",
-                "localField": "usuario_id",
-                "foreignField": "_id",
-                "as": "usuario"
-            }
-        },
-        {"$unwind": "$usuario"},
-        {
-            "$project": {
-                "_id": 1,
-                "nome": 1,
-                "dono": "$usuario.nome"
-            }
-        },
-        {"$sort": {"nome": 1}}
-    ]
-    times = list(db.time_usuario.aggregate(pipeline))
-
-    if not times:
+    if not db.time_usuario.find_one({}, {"_id": 1}):
         print("❌ Nenhum time de usuário cadastrado! Crie um time primeiro.")
         wait_for_enter()
         return
 
-    print("Times de usuário disponíveis:")
-    for time in times:
-        print(f"  {time['_id']} - {time['nome']} (Dono: {time['dono']})")
-    print()
-
-    time_usuario_id_input = input("ID do time de usuário: ").strip()
+    time_usuario_id_input = prompt_id("time_usuario", "ID do time de usuário")
     try:
         time_usuario_id = int(time_usuario_id_input)
     except ValueError:
@@ -343,83 +260,31 @@ def adicionar_jogador_time_usuario() -> None:
         wait_for_enter()
         return
 
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "time_oficial",
-                "localField": "time_id",
-                "foreignField": "_id",
-                "as": "time"
-            }
-        },
-        {
-            "$unwind": {
-                "path": "$time",
-                "preserveNullAndEmptyArrays": True
-            }
-        },
-        {
-            "$project": {
-                "_id": 1,
-                "nome": 1,
-                "posicao": 1,
-                "time_oficial": {"$ifNull": ["$time.nome", None]}
-            }
-        },
-        {"$sort": {"nome": 1}}
-    ]
-    jogadores = list(db.jogador.aggregate(pipeline))
-
-    if not jogadores:
+    if not db.jogador.find_one({}, {"_id": 1}):
         print("❌ Nenhum jogador cadastrado!")
         wait_for_enter()
         return
 
-    print("\nJogadores disponíveis:")
-    for jogador in jogadores:
-        time_nome = jogador['time_oficial'] if jogador['time_oficial'] else "Livre"
-        print(f"  {jogador['_id']} - {jogador['nome']} ({jogador['posicao']}) - Time: {time_nome}")
-    print()
-
-    jogador_id_input = input("ID do jogador: ").strip()
+    jogador_id_input = prompt_id("jogador", "ID do(s) jogador(es), separados por vírgula")
     try:
-        jogador_id = int(jogador_id_input)
-    except ValueError:
-        print("❌ ID inválido!")
-        wait_for_enter()
-        return
-
-    # Verify that time_usuario exists
-    if not db.time_usuario.find_one({"_id": time_usuario_id}):
-        print(f"\n❌ Erro: Time de usuário ID {time_usuario_id} não existe!")
-        wait_for_enter()
-        return
-
-    # Verify that jogador exists
-    if not db.jogador.find_one({"_id": jogador_id}):
-        print(f"\n❌ Erro: Jogador ID {jogador_id} não existe!")
-        wait_for_enter()
-        return
-
-    # Check if the relationship already exists
-    existing = db.time_usuario_jogador.find_one({
-        "time_usuario_id": time_usuario_id,
-        "jogador_id": jogador_id
-    })
-    if existing:
-        print("\n❌ Erro: Este jogador já está neste time!")
+        jogador_ids = parse_id_list(jogador_id_input)
+    except ValidationError as e:
+        print(f"❌ {e}")
         wait_for_enter()
         return
 
     try:
-        tuj_id = get_next_id(db, "time_usuario_jogador")
-        tuj = {
-            "_id": tuj_id,
-            "time_usuario_id": time_usuario_id,
-            "jogador_id": jogador_id
-        }
-        db.time_usuario_jogador.insert_one(tuj)
-        print("\n✅ Jogador adicionado ao time com sucesso!")
+        result = writes.adicionar_jogadores(db, time_usuario_id, jogador_ids)
+        for jogador_id in result.inexistentes:
+            print(f"\n❌ Erro: Jogador ID {jogador_id} não existe!")
+        for jogador_id in result.duplicados:
+            print(f"\n❌ Erro: O jogador ID {jogador_id} já está neste time!")
+        if len(result.inseridos) == 1:
+            print("\n✅ Jogador adicionado ao time com sucesso!")
+        elif result.inseridos:
+            print(f"\n✅ {len(result.inseridos)} jogadores adicionados ao time com sucesso!")
+    except ValidationError as e:
+        print(f"\n❌ Erro: {e}")
     except Exception as e:
         print(f"\n❌ Erro ao adicionar jogador: {e}")
 
@@ -429,15 +294,8 @@ def listar_usuarios() -> None:
     """List all users"""
     print_header("Lista de Usuários")
 
-    db = get_database()
-
     try:
-        usuarios = list(db.usuario.find({}).sort("nome", ASCENDING))
-        results = [
-            (u["_id"], u["nome"], u["email"], u["sexo"], u.get("telefone"), u["data_nascimento"], u.get("time_preferido"))
-            for u in usuarios
-        ]
-        print_table(["ID", "Nome", "Email", "Sexo", "Telefone", "Nascimento", "Time Preferido"], results)
+        print_listing(LISTINGS["usuarios"])
     except Exception as e:
         print(f"❌ Erro ao listar usuários: {e}")
 
@@ -447,12 +305,8 @@ def listar_times_oficiais() -> None:
     """List all official teams"""
     print_header("Lista de Times Oficiais")
 
-    db = get_database()
-
     try:
-        times = list(db.time_oficial.find({}).sort("nome", ASCENDING))
-        results = [(t["_id"], t["nome"], t["sigla"]) for t in times]
-        print_table(["ID", "Nome", "Sigla"], results)
+        print_listing(LISTINGS["times-oficiais"])
     except Exception as e:
         print(f"❌ Erro ao listar times: {e}")
 
@@ -462,37 +316,8 @@ def listar_jogadores() -> None:
     """List all players"""
     print_header("Lista de Jogadores")
 
-    db = get_database()
-
     try:
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "time_oficial",
-                    "localField": "time_id",
-                    "foreignField": "_id",
-                    "as": "time"
-                }
-            },
-            {
-                "$unwind": {
-                    "path": "$time",
-                    "preserveNullAndEmptyArrays": True
-                }
-            },
-            {
-                "$project": {
-                    "_id": 1,
-                    "nome": 1,
-                    "posicao": 1,
-                    "time_oficial": {"$ifNull": ["$time.nome", None]}
-                }
-            },
-            {"$sort": {"nome": 1}}
-        ]
-        jogadores = list(db.jogador.aggregate(pipeline))
-        results = [(j["_id"], j["nome"], j["posicao"], j["time_oficial"]) for j in jogadores]
-        print_table(["ID", "Nome", "Posição", "Time Oficial"], results)
+        print_listing(LISTINGS["jogadores"])
     except Exception as e:
         print(f"❌ Erro ao listar jogadores: {e}")
 
@@ -502,60 +327,8 @@ def listar_times_usuario() -> None:
     """List all user teams with their players"""
     print_header("Times de Usuário e Seus Jogadores")
 
-    db = get_database()
-
     try:
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "usuario",
-                    "localField": "usuario_id",
-                    "foreignField": "_id",
-                    "as": "usuario"
-                }
-            },
-            {"$unwind": "$usuario"},
-            {
-                "$lookup": {
-                    "from": "time_usuario_jogador",
-                    "localField": "_id",
-                    "foreignField": "time_usuario_id",
-                    "as": "jogadores_rel"
-                }
-            },
-            {
-                "$unwind": {
-                    "path": "$jogadores_rel",
-                    "preserveNullAndEmptyArrays": True
-                }
-            },
-            {
-                "$lookup": {
-                    "from": "jogador",
-                    "localField": "jogadores_rel.jogador_id",
-                    "foreignField": "_id",
-                    "as": "jogador"
-                }
-            },
-            {
-                "$unwind": {
-                    "path": "$jogador",
-                    "preserveNullAndEmptyArrays": True
-                }
-            },
-            {
-                "$project": {
-                    "time_usuario": "$nome",
-                    "dono": "$usuario.nome",
-                    "jogador": {"$ifNull": ["$jogador.nome", None]},
-                    "posicao": {"$ifNull": ["$jogador.posicao", None]}
-                }
-            },
-            {"$sort": {"time_usuario": 1, "jogador": 1}}
-        ]
-        results_data = list(db.time_usuario.aggregate(pipeline))
-        results = [(r["time_usuario"], r["dono"], r["jogador"], r["posicao"]) for r in results_data]
-        print_table(["Time do Usuário", "Dono", "Jogador", "Posição"], results)
+        print_listing(LISTINGS["times-usuario"])
     except Exception as e:
         print(f"❌ Erro ao listar times de usuário: {e}")
 
@@ -592,40 +365,8 @@ def consulta_jogadores_por_posicao() -> None:
     db = get_database()
 
     try:
-        pipeline = [
-            {
-                "$match": {"time_id": {"$ne": None}}
-            },
-            {
-                "$lookup": {
-                    "from": "time_oficial",
-                    "localField": "time_id",
-                    "foreignField": "_id",
-                    "as": "time"
-                }
-            },
-            {"$unwind": "$time"},
-            {
-                "$group": {
-                    "_id": {
-                        "time_oficial": "$time.nome",
-                        "posicao": "$posicao"
-                    },
-                    "qtd": {"$sum": 1}
-                }
-            },
-            {
-                "$project": {
-                    "time_oficial": "$_id.time_oficial",
-                    "posicao": "$_id.posicao",
-                    "qtd": 1
-                }
-            },
-            {
-                "$sort": {"time_oficial": 1, "qtd": -1}
-            }
-        ]
-        results_data = list(db.jogador.aggregate(pipeline))
+        ensure_position_counts(db)
+        results_data = cached_aggregate(db, POSITION_COUNTS_COLLECTION, jogadores_por_posicao_resumo_pipeline())
         results = [(r["time_oficial"], r["posicao"], r["qtd"]) for r in results_data]
         print_table(["Time Oficial", "Posição", "Quantidade"], results)
     except Exception as e:
@@ -637,12 +378,8 @@ def consulta_jogadores_sem_time() -> None:
     """Query players without an official team"""
     print_header("Jogadores Sem Time Oficial")
 
-    db = get_database()
-
     try:
-        jogadores = list(db.jogador.find({"time_id": None}, {"_id": 1, "nome": 1, "posicao": 1}))
-        results = [(j["_id"], j["nome"], j["posicao"]) for j in jogadores]
-        print_table(["ID", "Nome", "Posição"], results)
+        print_listing(LISTINGS["jogadores-sem-time"])
     except Exception as e:
         print(f"❌ Erro ao executar consulta: {e}")
 
@@ -652,83 +389,20 @@ def consulta_jogadores_time_preferido() -> None:
     """Query players from preferred team in user teams"""
     print_header("Para um usuário específico, quantos jogadores do elenco dele pertencem ao seu 'time preferido'")
 
+    usuario_id_input = prompt_id("usuario", "ID do usuário (ENTER para todos)")
+    usuario_id: Optional[int] = None
+    if usuario_id_input:
+        try:
+            usuario_id = int(usuario_id_input)
+        except ValueError:
+            print("❌ ID inválido!")
+            wait_for_enter()
+            return
+
     db = get_database()
 
     try:
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "time_usuario",
-                    "localField": "_id",
-                    "foreignField": "usuario_id",
-                    "as": "times"
-                }
-            },
-            {"$unwind": "$times"},
-            {
-                "$lookup": {
-                    "from": "time_usuario_jogador",
-                    "localField": "times._id",
-                    "foreignField": "time_usuario_id",
-                    "as": "jogadores_rel"
-                }
-            },
-            {"$unwind": "$jogadores_rel"},
-            {
-                "$lookup": {
-                    "from": "jogador",
-                    "localField": "jogadores_rel.jogador_id",
-                    "foreignField": "_id",
-                    "as": "jogador"
-                }
-            },
-            {"$unwind": "$jogador"},
-            {
-                "$lookup": {
-                    "from": "time_oficial",
-                    "localField": "jogador.time_id",
-                    "foreignField": "_id",
-                    "as": "time_oficial"
-                }
-            },
-            {"$unwind": "$time_oficial"},
-            {
-                "$lookup": {
-                    "from": "time_oficial",
-                    "localField": "time_preferido",
-                    "foreignField": "nome_curto",
-                    "as": "time_preferido_obj"
-                }
-            },
-            {
-                "$unwind": {
-                    "path": "$time_preferido_obj",
-                    "preserveNullAndEmptyArrays": True
-                }
-            },
-            {
-                "$match": {
-                    "$expr": {"$eq": ["$time_oficial.sigla", "$time_preferido_obj.sigla"]}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "usuario": "$nome",
-                        "time_preferido": "$time_preferido"
-                    },
-                    "jogadores_do_time_preferido": {"$sum": 1}
-                }
-            },
-            {
-                "$project": {
-                    "usuario": "$_id.usuario",
-                    "time_preferido": "$_id.time_preferido",
-                    "jogadores_do_time_preferido": 1
-                }
-            }
-        ]
-        results_data = list(db.usuario.aggregate(pipeline))
+        results_data = cached_aggregate(db, "usuario", time_preferido_pipeline(usuario_id))
         results = [(r["usuario"], r["time_preferido"], r["jogadores_do_time_preferido"]) for r in results_data]
         print_table(["Usuário", "Time Preferido", "Jogadores do Time Preferido"], results)
     except Exception as e:
@@ -796,12 +470,74 @@ def menu_consultas() -> None:
             print("❌ Opção inválida!")
             wait_for_enter()
 
+def diagnostico() -> None:
+    """Show the last operations sent to MongoDB, per-command totals, pool, cache and write retry counters"""
+    while True:
+        print_header("Diagnóstico")
+
+        operacoes = command_metrics.last_operations(20)
+        print(f"Últimas {len(operacoes)} operações (de até {PROFILE_HISTORY} guardadas):\n")
+        print_table(
+            ["Início", "Comando", "Coleção", "Duração (ms)", "Docs", "Formato"],
+            [
+                (op.inicio[11:23], op.comando if op.sucesso else f"{op.comando} (erro)", op.colecao or "-",
+                 f"{op.duracao_ms:.1f}", "-" if op.documentos is None else op.documentos, op.formato)
+                for op in operacoes
+            ]
+        )
+
+        print("Totais por comando:\n")
+        print_table(
+            ["Comando", "Coleção", "Execuções", "Erros", "Total (ms)", "Média (ms)", "Máx (ms)"],
+            [
+                (row["comando"], row["colecao"] or "-", row["count"], row["errors"],
+                 f"{row['total_ms']:.1f}", f"{row['avg_ms']:.1f}", f"{row['max_ms']:.1f}")
+                for row in command_metrics.summary()
+            ]
+        )
+
+        print("Pool de conexões: " + ", ".join(f"{k}={v}" for k, v in get_pool_metrics().items()))
+        print("Cache de referência: " + ", ".join(f"{k}={v}" for k, v in reference_cache.stats().items()))
+        print("Cache de consultas: " + ", ".join(f"{k}={v}" for k, v in query_cache.stats().items()))
+        print("Escritas: " + ", ".join(f"{k}={v}" for k, v in write_metrics.stats().items()))
+        print()
+        print("1 - Exportar métricas (.prom para Prometheus, .json para JSON)")
+        print("2 - Zerar métricas")
+        print("0 - Voltar")
+        print()
+
+        opcao = input("Escolha uma opção: ").strip()
+
+        if opcao == "1":
+            caminho = input("Arquivo (ex: metricas.prom): ").strip()
+            if caminho:
+                try:
+                    command_metrics.export(caminho, {
+                        "mongo_pool": get_pool_metrics(),
+                        "app_cache": reference_cache.stats(),
+                        "app_query_cache": query_cache.stats(),
+                        "app_writes": write_metrics.stats()
+                    })
+                    print(f"\n✅ Métricas exportadas para {caminho}")
+                except OSError as e:
+                    print(f"\n❌ Erro ao exportar métricas: {e}")
+                wait_for_enter()
+        elif opcao == "2":
+            command_metrics.reset()
+            write_metrics.reset()
+        elif opcao == "0":
+            break
+        else:
+            print("❌ Opção inválida!")
+            wait_for_enter()
+
 def menu_principal() -> None:
     """Main menu"""
     while True:
         print_header("Futebol App - Sistema de Gerenciamento")
         print("1 - Cadastros")
         print("2 - Consultas")
+        print("3 - Diagnóstico")
         print("0 - Sair")
         print()
 
@@ -811,6 +547,8 @@ def menu_principal() -> None:
             menu_cadastros()
         elif opcao == "2":
             menu_consultas()
+        elif opcao == "3":
+            diagnostico()
         elif opcao == "0":
             print("\n👋 Até logo!")
             close_database()
@@ -821,7 +559,13 @@ def menu_principal() -> None:
 
 def main() -> None:
     """Main function"""
+    # Any argument switches to the non-interactive subcommands (see cli.py)
+    if len(sys.argv) > 1:
+        cli.main()
+
     try:
+        if CHANGE_STREAM_ENABLED:
+            start_change_stream_invalidation(get_database(), WATCHED_COLLECTIONS)
         menu_principal()
     except KeyboardInterrupt:
         print("\n\n👋 Até logo!")
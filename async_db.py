@@ -0,0 +1,276 @@
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import argparse
+import asyncio
+import sys
+import time
+from cache import invalidate_collection
+from database import get_config, get_database, close_database
+from ids import COUNTERS_COLLECTION, max_int_id, reserve_update, reserved_range, sync_update
+from operations import new_document
+import position_counts
+from position_counts import POSITION_COUNTS_COLLECTION, increments, rebuild_pipeline
+from profiling import command_metrics
+from queries import REPORT_QUERIES
+import roster_schema
+import roster_view
+from rosters import (
+    EMBEDDED_WRITE_ATTEMPTS, RosterAddResult, existing_players_pipeline, link_documents, plan_embedded_add,
+    record_link_results, requested_players, split_requested
+)
+from table import print_table
+from validation import (
+    ValidationError, validate_jogador, validate_time_oficial, validate_time_usuario, validate_usuario
+)
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+except ImportError:  # motor is only needed by the async layer
+    AsyncIOMotorClient = None
+    AsyncIOMotorDatabase = Any
+
+# Async counterparts of the creates and roster adds of operations.py and of
+# the report queries, on Motor. Transfers and deletes have no async version.
+# They share validation, document building (IDs, search and idempotency
+# keys), the roster and position-count helpers and the pipelines with the
+# sync code, so both paths produce the same documents and results.
+
+# Global variables for connection management
+_async_client: "AsyncIOMotorClient" = None
+_async_database: "AsyncIOMotorDatabase" = None
+
+def get_async_database() -> "AsyncIOMotorDatabase":
+    """Get the Motor database, built from the same pool configuration as database.py"""
+    global _async_client, _async_database
+
+    if AsyncIOMotorClient is None:
+        raise RuntimeError("motor is not installed: pip install motor")
+
+    if _async_database is None:
+        config = get_config()
+        _async_client = AsyncIOMotorClient(config.uri, event_listeners=[command_metrics], **config.client_options())
+        _async_database = _async_client[config.db_name]
+
+    return _async_database
+
+def close_async_database() -> None:
+    """Close the Motor client"""
+    global _async_client, _async_database
+
+    if _async_client is not None:
+        _async_client.close()
+        _async_client = None
+        _async_database = None
+
+_synced: Set[Tuple[str, str]] = set()
+
+async def reserve_ids(db: "AsyncIOMotorDatabase", collection_name: str, count: int) -> Tuple[int, int]:
+    """Async version of ids.reserve_ids"""
+    update = reserve_update(count)
+    if (db.name, collection_name) not in _synced:
+        last = await db[collection_name].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        await db[COUNTERS_COLLECTION].update_one({"_id": collection_name}, sync_update(max_int_id(last)), upsert=True)
+        _synced.add((db.name, collection_name))
+
+    counter = await db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": collection_name},
+        update,
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return reserved_range(counter, count)
+
+async def get_next_id(db: "AsyncIOMotorDatabase", collection_name: str) -> int:
+    """Async version of ids.get_next_id"""
+    first, _ = await reserve_ids(db, collection_name, 1)
+    return first
+
+_counts_ensured: Set[str] = set()
+
+async def ensure_position_counts(db: "AsyncIOMotorDatabase") -> None:
+    """Async version of position_counts.ensure_position_counts (before the insert, for the same reason)"""
+    if db.name in _counts_ensured:
+        return
+    if POSITION_COUNTS_COLLECTION not in await db.list_collection_names(filter={"name": POSITION_COUNTS_COLLECTION}):
+        await db.jogador.aggregate(rebuild_pipeline()).to_list(None)
+        invalidate_collection(POSITION_COUNTS_COLLECTION)
+    _counts_ensured.add(db.name)
+
+async def _insert(db: "AsyncIOMotorDatabase", collection_name: str, doc: Dict[str, Any],
+                  chave: Optional[str]) -> Dict[str, Any]:
+    doc = new_document(collection_name, {"_id": await get_next_id(db, collection_name), **doc}, chave)
+    await db[collection_name].insert_one(doc)
+    invalidate_collection(collection_name)
+    return doc
+
+async def _refresh_roster_if_enabled(db: "AsyncIOMotorDatabase", time_usuario_id: int) -> None:
+    if roster_view.ENABLED:
+        await db.time_usuario.aggregate(roster_view.merge_pipeline(time_usuario_id)).to_list(None)
+
+async def cadastrar_usuario(db: "AsyncIOMotorDatabase", dados: Mapping[str, Any],
+                            chave: Optional[str] = None) -> Dict[str, Any]:
+    """Register a user"""
+    return await _insert(db, "usuario", validate_usuario(dados), chave)
+
+async def cadastrar_time_oficial(db: "AsyncIOMotorDatabase", dados: Mapping[str, Any],
+                                 chave: Optional[str] = None) -> Dict[str, Any]:
+    """Register an official team"""
+    return await _insert(db, "time_oficial", validate_time_oficial(dados), chave)
+
+async def cadastrar_jogador(db: "AsyncIOMotorDatabase", dados: Mapping[str, Any],
+                            chave: Optional[str] = None) -> Dict[str, Any]:
+    """Register a player"""
+    jogador = validate_jogador(dados)
+    await ensure_position_counts(db)
+    jogador = await _insert(db, "jogador", jogador, chave)
+    updates = increments([jogador])
+    if updates:
+        await db[POSITION_COUNTS_COLLECTION].bulk_write(updates, ordered=False)
+        invalidate_collection(POSITION_COUNTS_COLLECTION)
+    return jogador
+
+async def criar_time_usuario(db: "AsyncIOMotorDatabase", dados: Mapping[str, Any],
+                             chave: Optional[str] = None) -> Dict[str, Any]:
+    """Create a user team; the owner must exist"""
+    time_usuario = validate_time_usuario(dados)
+    if not await db.usuario.find_one({"_id": time_usuario["usuario_id"]}, {"_id": 1}):
+        raise ValidationError(f"Usuário ID {time_usuario['usuario_id']} não existe!")
+
+    time_usuario = await _insert(db, "time_usuario", time_usuario, chave)
+    await _refresh_roster_if_enabled(db, time_usuario["_id"])
+    return time_usuario
+
+async def adicionar_jogadores(db: "AsyncIOMotorDatabase", time_usuario_id: int,
+                              jogador_ids: Iterable[int], chave: Optional[str] = None) -> RosterAddResult:
+    """Async version of rosters.adicionar_jogadores"""
+    requested = requested_players(jogador_ids)
+    if roster_schema.EMBEDDED:
+        return await _adicionar_embutido(db, time_usuario_id, requested)
+
+    found = await db.time_usuario.aggregate(existing_players_pipeline(time_usuario_id, requested)).to_list(1)
+    if not found:
+        raise ValidationError(f"Time de usuário ID {time_usuario_id} não existe!")
+
+    result, to_insert = split_requested(requested, found[0]["jogadores"])
+    if not to_insert:
+        return result
+
+    first_id, _ = await reserve_ids(db, "time_usuario_jogador", len(to_insert))
+    docs = link_documents(time_usuario_id, first_id, to_insert, chave)
+    try:
+        await db.time_usuario_jogador.insert_many(docs, ordered=False)
+        record_link_results(result, docs)
+    except BulkWriteError as e:
+        record_link_results(result, docs, e)
+
+    if result.inseridos:
+        invalidate_collection("time_usuario_jogador")
+        await _refresh_roster_if_enabled(db, time_usuario_id)
+
+    return result
+
+async def _adicionar_embutido(db: "AsyncIOMotorDatabase", time_usuario_id: int,
+                              requested: List[int]) -> RosterAddResult:
+    """Async version of rosters._adicionar_embutido"""
+    for _ in range(EMBEDDED_WRITE_ATTEMPTS):
+        found = await db.time_usuario.aggregate(existing_players_pipeline(time_usuario_id, requested)).to_list(1)
+        if not found:
+            raise ValidationError(f"Time de usuário ID {time_usuario_id} não existe!")
+
+        result, to_add = plan_embedded_add(found[0], requested)
+        if not to_add:
+            return result
+
+        ids = [jogador["_id"] for jogador in to_add]
+        updated = await db.time_usuario.update_one(
+            roster_schema.add_players_filter(time_usuario_id, ids),
+            roster_schema.add_players_update(to_add)
+        )
+        if updated.matched_count:
+            result.inseridos = ids
+            invalidate_collection("time_usuario")
+            await _refresh_roster_if_enabled(db, time_usuario_id)
+            return result
+
+    raise ValidationError("O elenco foi alterado por outra operação, tente novamente!")
+
+async def run_query(db: "AsyncIOMotorDatabase", name: str) -> List[Dict[str, Any]]:
+    """Run one of queries.REPORT_QUERIES and return all its documents"""
+    collection_name, pipeline = REPORT_QUERIES[name]
+    if collection_name == POSITION_COUNTS_COLLECTION:
+        await ensure_position_counts(db)
+    return await db[collection_name].aggregate(pipeline()).to_list(None)
+
+async def _timed(coro: Any) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - started) * 1000
+
+async def gather_queries(db: "AsyncIOMotorDatabase", names: Optional[Iterable[str]] = None) -> Dict[str, Tuple[List[Dict[str, Any]], float]]:
+    """Run independent report queries concurrently; returns name -> (results, elapsed ms)"""
+    names = list(names or REPORT_QUERIES)
+    outcomes = await asyncio.gather(*(_timed(run_query(db, name)) for name in names))
+    return dict(zip(names, outcomes))
+
+def run_sequential(names: Iterable[str]) -> Dict[str, Tuple[List[Dict[str, Any]], float]]:
+    """Run the same queries one after another on the sync client"""
+    db = get_database()
+    outcomes = {}
+    for name in names:
+        collection_name, pipeline = REPORT_QUERIES[name]
+        if collection_name == POSITION_COUNTS_COLLECTION:
+            position_counts.ensure_position_counts(db)
+        started = time.perf_counter()
+        results = list(db[collection_name].aggregate(pipeline()))
+        outcomes[name] = (results, (time.perf_counter() - started) * 1000)
+    return outcomes
+
+async def compare(names: List[str]) -> None:
+    """Print per-query and total wall-clock time, sequential (sync) vs concurrent (async)"""
+    started = time.perf_counter()
+    sequential = run_sequential(names)
+    sequential_total = (time.perf_counter() - started) * 1000
+
+    db = get_async_database()
+    started = time.perf_counter()
+    concurrent = await gather_queries(db, names)
+    concurrent_total = (time.perf_counter() - started) * 1000
+
+    rows = []
+    for name in names:
+        seq_results, seq_ms = sequential[name]
+        conc_results, conc_ms = concurrent[name]
+        # Groups without a $sort may come back in any order, so compare as multisets
+        same = "sim" if sorted(map(repr, seq_results)) == sorted(map(repr, conc_results)) else "NÃO"
+        rows.append((name, len(seq_results), f"{seq_ms:.1f}", f"{conc_ms:.1f}", same))
+    print_table(["Consulta", "Documentos", "Sequencial (ms)", "Concorrente (ms)", "Mesmo resultado"], rows)
+
+    print(f"Tempo total sequencial: {sequential_total:.1f} ms")
+    print(f"Tempo total concorrente: {concurrent_total:.1f} ms")
+    print(f"Ganho: {sequential_total / max(concurrent_total, 0.001):.2f}x")
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Executa as consultas em paralelo (asyncio) e compara com o caminho sequencial")
+    parser.add_argument("consultas", nargs="*", metavar="consulta",
+                        help=f"consultas a executar (padrão: todas): {', '.join(REPORT_QUERIES)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.consultas if name not in REPORT_QUERIES]
+    if unknown:
+        parser.error(f"consulta desconhecida: {', '.join(unknown)}")
+    names = args.consultas or list(REPORT_QUERIES)
+
+    print("=== Consultas: sequencial vs. concorrente ===\n")
+
+    try:
+        asyncio.run(compare(names))
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_async_database()
+        close_database()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from typing import Any, Callable, Dict
+import argparse
+import random
+import statistics
+import sys
+import time
+from database import get_client, get_config, close_database
+from queries import time_preferido_pipeline, time_preferido_pipeline_legacy
+from synthetic_data import SyntheticConfig, generate
+from table import print_table
+
+def measure(run: Callable[[], Any], repeticoes: int) -> Dict[str, float]:
+    """Run a query several times, returning the median and best wall-clock time in ms"""
+    timings = []
+    for _ in range(repeticoes):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"mediana_ms": statistics.median(timings), "melhor_ms": min(timings)}
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compara o plano antigo e o otimizado da consulta 'time preferido'")
+    parser.add_argument("--db", help="banco usado no benchmark (padrão: <banco>_bench)")
+    parser.add_argument("--usuarios", type=int, default=100000)
+    parser.add_argument("--times-oficiais", type=int, default=20)
+    parser.add_argument("--jogadores", type=int, default=5000)
+    parser.add_argument("--elenco", type=int, default=11, help="jogadores por time de usuário")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reusar", action="store_true", help="não regerar os dados se o banco já existir")
+    args = parser.parse_args()
+
+    db_name = args.db or f"{get_config().db_name}_bench"
+    print(f"=== Benchmark da consulta 'time preferido' ({db_name}) ===\n")
+
+    try:
+        db = get_client()[db_name]
+
+        if not (args.reusar and db.usuario.estimated_document_count() > 0):
+            print(f"Gerando {args.usuarios} usuários, {args.usuarios * args.elenco} vínculos de elenco...")
+            started = time.perf_counter()
+            generate(db, SyntheticConfig(
+                usuarios=args.usuarios,
+                times_oficiais=args.times_oficiais,
+                jogadores=args.jogadores,
+                times_por_usuario=1.0,
+                elenco=args.elenco,
+                seed=args.seed
+            ))
+            print(f"✓ Dados gerados em {time.perf_counter() - started:.1f}s\n")
+
+        usuario_id = random.Random(args.seed).randint(1, db.usuario.estimated_document_count())
+
+        def legacy_single() -> Any:
+            # The old screen had no user filter: run everything, then pick the user
+            nome = db.usuario.find_one({"_id": usuario_id}, {"nome": 1})["nome"]
+            return [r for r in db.usuario.aggregate(time_preferido_pipeline_legacy()) if r["usuario"] == nome]
+
+        cases = [
+            ("Plano antigo - todos os usuários", lambda: list(db.usuario.aggregate(time_preferido_pipeline_legacy()))),
+            ("Plano otimizado - todos os usuários", lambda: list(db.usuario.aggregate(time_preferido_pipeline()))),
+            (f"Plano antigo - usuário {usuario_id}", legacy_single),
+            (f"Plano otimizado - usuário {usuario_id}", lambda: list(db.usuario.aggregate(time_preferido_pipeline(usuario_id))))
+        ]
+
+        rows = []
+        for label, run in cases:
+            result = measure(run, args.repeticoes)
+            rows.append((label, f"{result['mediana_ms']:.1f}", f"{result['melhor_ms']:.1f}"))
+        print_table(["Caso", "Mediana (ms)", "Melhor (ms)"], rows)
+
+        ganho_todos = float(rows[0][1]) / max(float(rows[1][1]), 0.001)
+        ganho_um = float(rows[2][1]) / max(float(rows[3][1]), 0.001)
+        print(f"Ganho (todos os usuários): {ganho_todos:.1f}x")
+        print(f"Ganho (um usuário): {ganho_um:.1f}x")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+from bson import decode_all
+from pymongo.database import Database
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+from database import get_client, get_config, close_database
+import operations
+from queries import (
+    NAME_ORDER, REPORT_QUERIES, TIME_OFICIAL_FIELDS, USUARIO_FIELDS, jogadores_page, time_preferido_pipeline,
+    times_usuario_page, usuarios_page
+)
+import roster_schema
+from row_decoding import DECODE_MODES, codec_options, collection, projection
+from stats import summarize
+from synthetic_data import SyntheticConfig, generate
+from table import print_table
+
+def time_runs(run: Callable[[int], Any], repeticoes: int, aquecimento: int) -> Tuple[List[float], Any]:
+    """Call run(i) repeatedly, discarding the warm-up runs; returns (durations in ms, last result)"""
+    timings = []
+    result = None
+    for i in range(aquecimento + repeticoes):
+        started = time.perf_counter()
+        result = run(i)
+        elapsed = (time.perf_counter() - started) * 1000
+        if i >= aquecimento:
+            timings.append(elapsed)
+    return timings, result
+
+def _sum_key(node: Any, key: str) -> int:
+    """Sum every occurrence of `key` in a nested explain document"""
+    if isinstance(node, dict):
+        return sum(v if k == key and isinstance(v, int) else _sum_key(v, key) for k, v in node.items())
+    if isinstance(node, list):
+        return sum(_sum_key(item, key) for item in node)
+    return 0
+
+def explain_stats(db: Database, collection_name: str, pipeline: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Docs and keys examined by an aggregation, from explain('executionStats')"""
+    explain = db.command(
+        "explain",
+        {"aggregate": collection_name, "pipeline": pipeline, "cursor": {}},
+        verbosity="executionStats"
+    )
+    return {
+        "docs_examined": _sum_key(explain, "totalDocsExamined"),
+        "keys_examined": _sum_key(explain, "totalKeysExamined")
+    }
+
+def benchmark_queries(db: Database, repeticoes: int, aquecimento: int, rng: random.Random) -> Dict[str, Any]:
+    """Time every report query and the app's paginated counterparts"""
+    usuario_id = rng.randint(1, max(1, db.usuario.estimated_document_count()))
+    cases: Dict[str, Tuple[str, Callable[[], List[Dict[str, Any]]]]] = dict(REPORT_QUERIES)
+    cases["app_time_preferido_usuario"] = ("usuario", lambda: time_preferido_pipeline(usuario_id))
+
+    results: Dict[str, Any] = {}
+    for name, (collection_name, pipeline) in cases.items():
+        timings, docs = time_runs(lambda _: list(db[collection_name].aggregate(pipeline())), repeticoes, aquecimento)
+        results[name] = {
+            "colecao": collection_name,
+            "documentos": len(docs),
+            **summarize(timings),
+            **explain_stats(db, collection_name, pipeline())
+        }
+
+    pages = {
+        "app_listar_usuarios_pagina": usuarios_page,
+        "app_listar_jogadores_pagina": jogadores_page,
+        "app_listar_times_usuario_pagina": times_usuario_page
+    }
+    for name, fetch_page in pages.items():
+        timings, docs = time_runs(lambda _: list(fetch_page(db)), repeticoes, aquecimento)
+        results[name] = {"documentos": len(docs), **summarize(timings)}
+
+    return results
+
+def benchmark_inserts(db: Database, repeticoes: int, aquecimento: int, rng: random.Random) -> Dict[str, Any]:
+    """Time each write path of operations.py (the data they insert stays in the benchmark database)"""
+    run_id = int(time.time())
+    n_jogadores = db.jogador.estimated_document_count()
+    n_usuarios = db.usuario.estimated_document_count()
+
+    paths: Dict[str, Callable[[int], Any]] = {
+        "cadastrar_usuario": lambda i: operations.cadastrar_usuario(db, {
+            "nome": f"Bench {run_id}-{i}", "email": f"bench{run_id}-{i}@example.com", "senha": "hash",
+            "sexo": "M", "data_nascimento": "2000-01-01"
+        }),
+        "cadastrar_time_oficial": lambda i: operations.cadastrar_time_oficial(db, {
+            "nome": f"Bench {run_id}-{i}", "sigla": f"B{run_id}-{i}"
+        }),
+        "cadastrar_jogador": lambda i: operations.cadastrar_jogador(db, {
+            "nome": f"Bench {run_id}-{i}", "posicao": "Atacante", "time_id": None
+        }),
+        "criar_time_usuario": lambda i: operations.criar_time_usuario(db, {
+            "nome": f"Bench {run_id}-{i}", "usuario_id": rng.randint(1, n_usuarios)
+        })
+    }
+
+    results: Dict[str, Any] = {}
+    for name, run in paths.items():
+        timings, _ = time_runs(run, repeticoes, aquecimento)
+        results[name] = summarize(timings)
+
+    # Each run fills a fresh team with a full roster in one call
+    def adicionar(i: int) -> Any:
+        time_usuario = operations.criar_time_usuario(db, {"nome": f"Bench elenco {run_id}-{i}", "usuario_id": 1})
+        jogador_ids = rng.sample(range(1, n_jogadores + 1), min(11, n_jogadores))
+        started = time.perf_counter()
+        operations.adicionar_jogadores(db, time_usuario["_id"], jogador_ids)
+        return (time.perf_counter() - started) * 1000
+
+    timings = [adicionar(i) for i in range(aquecimento + repeticoes)][aquecimento:]
+    results["adicionar_jogadores_elenco_11"] = summarize(timings)
+    return results
+
+def benchmark_decoding(db: Database, repeticoes: int, aquecimento: int) -> Dict[str, Any]:
+    """Bytes received and decode time of the full listings: whole documents vs. projection in each decode mode.
+
+    "busca" times the query plus decoding; "decodificacao" times only turning
+    the already received bytes into documents and reading the rendered fields.
+    """
+    listings = {"listar_usuarios": ("usuario", USUARIO_FIELDS), "listar_times_oficiais": ("time_oficial", TIME_OFICIAL_FIELDS)}
+    results: Dict[str, Any] = {}
+    for name, (collection_name, fields) in listings.items():
+        variants = {"completo_dict": (None, "dict")}
+        variants.update({f"projetado_{mode}": (projection(fields), mode) for mode in DECODE_MODES})
+
+        for variant, (spec, mode) in variants.items():
+            raw_coll = db.get_collection(collection_name, codec_options=codec_options(fields, "raw"))
+            raw_docs = list(raw_coll.find({}, spec).sort(NAME_ORDER))
+            data = b"".join(doc.raw for doc in raw_docs)
+            options = codec_options(fields, mode)
+
+            coll = db[collection_name] if spec is None else collection(db, collection_name, fields, mode)
+            busca, _ = time_runs(lambda _: list(coll.find({}, spec).sort(NAME_ORDER)), repeticoes, aquecimento)
+            decodificacao, _ = time_runs(
+                lambda _: [tuple(doc.get(f) for f in fields) for doc in decode_all(data, options)],
+                repeticoes, aquecimento
+            )
+            results[f"{name}_{variant}"] = {
+                "documentos": len(raw_docs),
+                "bytes": len(data),
+                "busca": summarize(busca),
+                "decodificacao": summarize(decodificacao)
+            }
+    return results
+
+def print_decoding(results: Dict[str, Any]) -> None:
+    """Print bytes and p50 times of benchmark_decoding"""
+    print("Decodificação:\n")
+    print_table(
+        ["Caso", "Documentos", "Bytes", "Busca p50 (ms)", "Decodificação p50 (ms)"],
+        [(name, r["documentos"], r["bytes"], r["busca"]["p50_ms"], r["decodificacao"]["p50_ms"])
+         for name, r in results.items()]
+    )
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    """Print p50/p95/p99 per case, plus the p50 ratio against a previous report"""
+    for section in ("consultas", "insercoes"):
+        rows = []
+        for name, stats in report[section].items():
+            row = [name, stats["p50_ms"], stats["p95_ms"], stats["p99_ms"],
+                   stats.get("docs_examined", "-"), stats.get("keys_examined", "-")]
+            if baseline is not None:
+                base = baseline.get(section, {}).get(name)
+                row.append(f"{stats['p50_ms'] / base['p50_ms']:.2f}x" if base and base["p50_ms"] else "-")
+            rows.append(tuple(row))
+
+        headers = ["Caso", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Docs examinados", "Chaves examinadas"]
+        if baseline is not None:
+            headers.append("p50 vs. base")
+        print(f"{section.capitalize()}:\n")
+        print_table(headers, rows)
+
+def main() -> None:
+    """Main function"""
+    defaults = SyntheticConfig()
+    parser = argparse.ArgumentParser(description="Benchmark reproduzível das consultas Q1–Q5 e dos caminhos de escrita")
+    parser.add_argument("--db", help="banco usado no benchmark (padrão: <banco>_bench)")
+    parser.add_argument("--usuarios", type=int, default=defaults.usuarios)
+    parser.add_argument("--times-oficiais", type=int, default=defaults.times_oficiais)
+    parser.add_argument("--jogadores", type=int, default=defaults.jogadores)
+    parser.add_argument("--times-por-usuario", type=float, default=defaults.times_por_usuario)
+    parser.add_argument("--elenco", type=int, default=defaults.elenco)
+    parser.add_argument("--skew", type=float, default=defaults.skew, help="expoente Zipf da distribuição")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--aquecimento", type=int, default=2, help="execuções descartadas antes de medir")
+    parser.add_argument("--reusar", action="store_true", help="não regerar os dados se o banco já existir")
+    parser.add_argument("--sem-insercoes", action="store_true", help="mede apenas as consultas")
+    parser.add_argument("--sem-decodificacao", action="store_true",
+                        help="não compara projeção e modos de decodificação (dict, raw, linha)")
+    parser.add_argument("--saida", help="arquivo JSON com os resultados (padrão: stdout)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    config = SyntheticConfig(
+        usuarios=args.usuarios,
+        times_oficiais=args.times_oficiais,
+        jogadores=args.jogadores,
+        times_por_usuario=args.times_por_usuario,
+        elenco=args.elenco,
+        skew=args.skew,
+        seed=args.seed
+    )
+    db_name = args.db or f"{get_config().db_name}_bench"
+
+    try:
+        db = get_client()[db_name]
+        rng = random.Random(args.seed)
+
+        if not (args.reusar and db.usuario.estimated_document_count() > 0):
+            print(f"Gerando dados sintéticos em {db_name}...", file=sys.stderr)
+            generate(db, config)
+
+        # Queries run first so that the insert paths do not change what they read
+        report = {
+            "metadata": {
+                "commit": _git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "server_version": get_client().server_info().get("version"),
+                "banco": db_name,
+                "elencos": roster_schema.ROSTER_SCHEMA + (" + snapshot" if roster_schema.EMBEDDED and roster_schema.SNAPSHOT else ""),
+                "dados": config.to_dict(),
+                "repeticoes": args.repeticoes,
+                "aquecimento": args.aquecimento
+            },
+            "consultas": benchmark_queries(db, args.repeticoes, args.aquecimento, rng),
+            "decodificacao": {} if args.sem_decodificacao else benchmark_decoding(db, args.repeticoes, args.aquecimento),
+            "insercoes": {} if args.sem_insercoes else benchmark_inserts(db, args.repeticoes, args.aquecimento, rng)
+        }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+            baseline = None
+            if args.comparar:
+                with open(args.comparar, encoding="utf-8") as f:
+                    baseline = json.load(f)
+            print_results(report, baseline)
+            if report["decodificacao"]:
+                print_decoding(report["decodificacao"])
+            print(f"✓ Resultados salvos em {args.saida}")
+        else:
+            print(output)
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
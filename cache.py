@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from pymongo.database import Database
+from pymongo.errors import InvalidOperation, OperationFailure, PyMongoError
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+import os
+import threading
+import time
+
+# Reference data (the name searches of search.py) changes rarely; entries live this long
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "128"))
+# Also follow writes made by other processes through a change stream
+CHANGE_STREAM_ENABLED = os.getenv("CACHE_CHANGE_STREAM", "0").lower() in ("1", "true", "sim")
+# Pause (s) before resuming a failed stream, doubled up to the max
+CHANGE_STREAM_RETRY_MIN = 1.0
+CHANGE_STREAM_RETRY_MAX = 30.0
+# Events without a collection, after which every watched collection is stale
+DATABASE_EVENTS = ("dropDatabase", "invalidate")
+
+CHANGE_STREAM_NOT_SUPPORTED = 40573
+CHANGE_STREAM_FATAL_ERROR = 280
+CHANGE_STREAM_HISTORY_LOST = 286
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and collection dependencies.
+
+    Every entry records the collections it was computed from, so a write to
+    any of them can drop exactly the entries that became stale.
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float], max_bytes: Optional[int] = None) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Optional memory budget, checked against the sizes given to put()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, Set[str], int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value), refreshing the entry's LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, _, _ = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def _remove(self, key: Hashable) -> None:
+        # Caller holds the lock
+        self.bytes -= self._entries.pop(key)[3]
+
+    def put(self, key: Hashable, value: Any, depends_on: Iterable[str], size: int = 0,
+            still_valid: Optional[Callable[[], bool]] = None) -> None:
+        """Store a value; `size` (bytes) counts against max_bytes.
+
+        `still_valid` is checked under the lock, so an invalidation cannot run
+        between the check and the store; the value is dropped when it is False.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            if still_valid is not None and not still_valid():
+                return
+            if key in self._entries:
+                self._remove(key)
+            # A value larger than the whole budget would only evict everything else
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, expires_at, set(depends_on), size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, depends_on: Iterable[str], loader: Callable[[], Any]) -> Any:
+        """Read-through lookup: return the cached value or load and store it"""
+        found, value = self.get(key)
+        if found:
+            return value
+        value = loader()
+        self.put(key, value, depends_on)
+        return value
+
+    def invalidate(self, collection_name: str) -> int:
+        """Drop every entry that depends on a collection; returns how many were dropped"""
+        with self._lock:
+            stale = [key for key, (_, _, deps, _) in self._entries.items() if collection_name in deps]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+reference_cache = LRUCache(REFERENCE_CACHE_SIZE, REFERENCE_CACHE_TTL)
+
+# Callbacks run on every invalidation, so other caches can follow the app's writes
+_invalidation_listeners: List[Callable[[str], Any]] = [reference_cache.invalidate]
+
+def add_invalidation_listener(listener: Callable[[str], Any]) -> None:
+    """Register a callback called with the collection name after each write"""
+    _invalidation_listeners.append(listener)
+
+def invalidate_collection(collection_name: str) -> None:
+    """Notify the caches that a collection was written"""
+    for listener in _invalidation_listeners:
+        listener(collection_name)
+
+def start_change_stream_invalidation(db: Database, collections: Iterable[str] = ("time_oficial", "jogador")) -> threading.Thread:
+    """Invalidate caches on writes made by other processes (requires a replica set).
+
+    Runs a daemon thread watching the given collections. A failed stream is
+    resumed after a growing pause, invalidating every watched collection
+    since changes may have been missed; the thread stops when the client is
+    closed or the server has no change streams (TTL only).
+    """
+    names = list(collections)
+    pipeline = [{"$match": {"$or": [
+        {"ns.coll": {"$in": names}},
+        {"operationType": {"$in": list(DATABASE_EVENTS)}}
+    ]}}]
+
+    def watch() -> None:
+        token = None
+        delay = CHANGE_STREAM_RETRY_MIN
+        while True:
+            try:
+                with db.watch(pipeline, resume_after=token) as stream:
+                    for name in names:
+                        invalidate_collection(name)
+                    delay = CHANGE_STREAM_RETRY_MIN
+                    for change in stream:
+                        token = stream.resume_token
+                        collection_name = change.get("ns", {}).get("coll")
+                        if collection_name:
+                            invalidate_collection(collection_name)
+                            continue
+                        for name in names:
+                            invalidate_collection(name)
+                        if change["operationType"] == "invalidate":
+                            # The stream is closed for good: watch again from now
+                            token = None
+            except InvalidOperation:
+                # Client closed
+                return
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_NOT_SUPPORTED:
+                    return
+                if e.code in (CHANGE_STREAM_FATAL_ERROR, CHANGE_STREAM_HISTORY_LOST):
+                    # The token cannot be resumed from
+                    token = None
+            except PyMongoError:
+                # Network error, failover: resume from the last token
+                pass
+            time.sleep(delay)
+            delay = min(delay * 2, CHANGE_STREAM_RETRY_MAX)
+
+    thread = threading.Thread(target=watch, name="cache-change-stream", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,483 @@
+from bson import json_util
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pymongo.database import Database
+from pymongo.errors import OperationFailure, PyMongoError
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+import argparse
+import copy
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from cache import invalidate_collection
+from database import get_database, close_database
+from profiling import command_metrics
+import roster_schema
+
+# Change stream consumer for downstream services (leaderboards, caches,
+# search). It follows inserts, updates, replaces and deletes on the roster
+# collections and hands them to handlers in batches:
+#   - changes to the same document inside a batch are coalesced (the last
+#     one wins, `ocorrencias` counts them);
+#   - a batch is dispatched when it is full, when no change arrived for
+#     CHANGE_DEBOUNCE_MS, or when its oldest change waited CHANGE_MAX_WAIT_MS;
+#   - the resume token is saved to CHANGE_TOKEN_FILE only after every handler
+#     accepted the batch, so a restart resumes after the last delivered batch
+#     (at-least-once: a batch interrupted by a crash is delivered again).
+# Change streams need a replica set; a single node is enough (see README).
+COLLECTIONS = ("jogador", "time_usuario", "time_usuario_jogador")
+OPERATIONS = ("insert", "update", "replace", "delete")
+
+CHANGE_TOKEN_FILE = os.getenv("CHANGE_TOKEN_FILE", ".change_stream_token.json")
+CHANGE_BATCH_SIZE = int(os.getenv("CHANGE_BATCH_SIZE", "500"))
+CHANGE_DEBOUNCE_MS = int(os.getenv("CHANGE_DEBOUNCE_MS", "200"))
+CHANGE_MAX_WAIT_MS = int(os.getenv("CHANGE_MAX_WAIT_MS", "2000"))
+
+# Window (s) of the recent throughput
+THROUGHPUT_WINDOW = 60.0
+
+CHANGE_STREAM_HISTORY_LOST = 286
+CHANGE_STREAM_FATAL_ERROR = 280
+
+def _path_parent(doc: Any, path: str) -> Tuple[Any, Any]:
+    """(container, key) of a dotted update path, e.g. "jogadores.3" -> (doc["jogadores"], 3)"""
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc[int(part)] if isinstance(doc, list) else doc.setdefault(part, {})
+    return doc, int(last) if isinstance(doc, list) else last
+
+def apply_update(documento: Dict[str, Any], description: Mapping[str, Any]) -> Dict[str, Any]:
+    """A copy of documento with an updateDescription applied (set, removed and truncated fields)"""
+    doc = copy.deepcopy(documento)
+    for path, value in (description.get("updatedFields") or {}).items():
+        container, key = _path_parent(doc, path)
+        if isinstance(container, list) and key >= len(container):
+            container.extend([None] * (key + 1 - len(container)))
+        container[key] = value
+    for path in description.get("removedFields") or []:
+        container, key = _path_parent(doc, path)
+        if isinstance(container, list):
+            container[key] = None
+        else:
+            container.pop(key, None)
+    for truncated in description.get("truncatedArrays") or []:
+        container, key = _path_parent(doc, truncated["field"])
+        del container[key][truncated["newSize"]:]
+    return doc
+
+@dataclass
+class ChangeEvent:
+    """One change as seen by the handlers"""
+    operacao: str
+    colecao: str
+    documento_id: Any
+    horario: datetime
+    # Fields set or removed by an update
+    campos: List[str] = field(default_factory=list)
+    # The inserted or replaced document
+    documento: Optional[Dict[str, Any]] = None
+    # Changes of this document coalesced into this event
+    ocorrencias: int = 1
+
+    @classmethod
+    def from_change(cls, change: Mapping[str, Any]) -> "ChangeEvent":
+        """Build from a change stream document"""
+        description = change.get("updateDescription") or {}
+        campos = list(description.get("updatedFields") or {}) + list(description.get("removedFields") or [])
+        # wallTime (MongoDB 6.0+) has millisecond precision; clusterTime only seconds
+        horario = change.get("wallTime") or change["clusterTime"].as_datetime()
+        if horario.tzinfo is None:
+            horario = horario.replace(tzinfo=timezone.utc)
+        return cls(
+            operacao=change["operationType"],
+            colecao=change["ns"]["coll"],
+            documento_id=change["documentKey"]["_id"],
+            horario=horario,
+            campos=campos,
+            documento=change.get("fullDocument")
+        )
+
+    @property
+    def key(self) -> Tuple[str, Hashable]:
+        return self.colecao, repr(self.documento_id)
+
+Handler = Callable[[List[ChangeEvent]], Any]
+
+class TokenStore:
+    """Resume token kept in a JSON file, replaced atomically on each save"""
+
+    def __init__(self, path: str = CHANGE_TOKEN_FILE) -> None:
+        self.path = path
+
+    def load(self) -> Optional[Mapping[str, Any]]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json_util.loads(f.read())["token"]
+        except FileNotFoundError:
+            return None
+
+    def save(self, token: Mapping[str, Any]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".token-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json_util.dumps({"token": token, "salvo_em": datetime.now(timezone.utc)}))
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class ConsumerMetrics:
+    """Throughput and lag of the consumer"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self.started = time.monotonic()
+        self.recebidos = 0
+        self.entregues = 0
+        self.agrupados = 0
+        self.lotes = 0
+        self.erros = 0
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.ultimo_evento: Optional[datetime] = None
+
+    def received(self, event: ChangeEvent) -> None:
+        lag = (datetime.now(timezone.utc) - event.horario).total_seconds() * 1000
+        with self._lock:
+            self.recebidos += 1
+            # Second-resolution clusterTime can make a fresh change look slightly in the future
+            self.lag_ms = max(0.0, lag)
+            self.max_lag_ms = max(self.max_lag_ms, self.lag_ms)
+            self.ultimo_evento = event.horario
+
+    def coalesced(self) -> None:
+        with self._lock:
+            self.agrupados += 1
+
+    def dispatched(self, events: List[ChangeEvent]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.lotes += 1
+            self.entregues += len(events)
+            self._recent.append((now, len(events)))
+            while self._recent and self._recent[0][0] < now - THROUGHPUT_WINDOW:
+                self._recent.popleft()
+
+    def failed(self) -> None:
+        with self._lock:
+            self.erros += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, events/s (overall and last minute) and lag of the newest change (ms)"""
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(count for ts, count in self._recent if ts >= now - THROUGHPUT_WINDOW)
+            elapsed = now - self.started
+            return {
+                "recebidos": self.recebidos,
+                "entregues": self.entregues,
+                "agrupados": self.agrupados,
+                "lotes": self.lotes,
+                "erros": self.erros,
+                "eventos_por_s": round(self.entregues / elapsed, 2) if elapsed else 0.0,
+                "eventos_por_s_recente": round(recent / min(elapsed, THROUGHPUT_WINDOW), 2) if elapsed else 0.0,
+                "lag_ms": round(self.lag_ms, 1),
+                "max_lag_ms": round(self.max_lag_ms, 1)
+            }
+
+class ChangeConsumer:
+    """Reads the change stream and dispatches debounced batches to the handlers"""
+
+    def __init__(self, db: Database, handlers: Iterable[Handler], collections: Iterable[str] = COLLECTIONS,
+                 token_store: Optional[TokenStore] = None, batch_size: int = CHANGE_BATCH_SIZE,
+                 debounce_ms: int = CHANGE_DEBOUNCE_MS, max_wait_ms: int = CHANGE_MAX_WAIT_MS,
+                 full_document: bool = False) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.db = db
+        self.handlers = list(handlers)
+        self.collections = list(collections)
+        self.token_store = token_store
+        self.batch_size = batch_size
+        self.debounce_ms = debounce_ms
+        self.max_wait_ms = max(max_wait_ms, debounce_ms)
+        self.full_document = full_document
+        self.metrics = ConsumerMetrics()
+        self._pending: "OrderedDict[Tuple[str, Hashable], ChangeEvent]" = OrderedDict()
+        self._pending_token: Optional[Mapping[str, Any]] = None
+        self._first_at = 0.0
+        self._last_at = 0.0
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        return [{"$match": {"ns.coll": {"$in": self.collections}, "operationType": {"$in": list(OPERATIONS)}}}]
+
+    def add(self, change: Mapping[str, Any], token: Optional[Mapping[str, Any]]) -> None:
+        """Queue a change, coalescing it with a pending change of the same document"""
+        event = ChangeEvent.from_change(change)
+        self.metrics.received(event)
+        now = time.monotonic()
+        if not self._pending:
+            self._first_at = now
+        self._last_at = now
+
+        previous = self._pending.pop(event.key, None)
+        if previous is not None:
+            self.metrics.coalesced()
+            event.ocorrencias += previous.ocorrencias
+            event.campos = sorted(set(previous.campos) | set(event.campos))
+            # An insert followed by updates is still new to the handlers, with
+            # the inserted document brought up to date when the updates have
+            # no full document (no --documento-completo)
+            if previous.operacao == "insert" and event.operacao != "delete":
+                event.operacao = "insert"
+                if event.documento is None and previous.documento is not None:
+                    try:
+                        event.documento = apply_update(previous.documento, change.get("updateDescription") or {})
+                    except (KeyError, IndexError, TypeError, ValueError):
+                        # A path that does not fit the document (e.g. a field name with a dot)
+                        event.documento = previous.documento
+        self._pending[event.key] = event
+        self._pending_token = token
+
+    def due(self) -> bool:
+        """Whether the pending batch must be dispatched now"""
+        if not self._pending:
+            return False
+        now = time.monotonic()
+        return (len(self._pending) >= self.batch_size
+                or (now - self._last_at) * 1000 >= self.debounce_ms
+                or (now - self._first_at) * 1000 >= self.max_wait_ms)
+
+    def flush(self) -> int:
+        """Dispatch the pending batch, then save its resume token"""
+        if not self._pending:
+            return 0
+        events = list(self._pending.values())
+        for handler in self.handlers:
+            try:
+                handler(events)
+            except Exception:
+                # The token is not saved, so the batch is delivered again after a restart
+                self.metrics.failed()
+                raise
+        self.metrics.dispatched(events)
+        if self.token_store is not None and self._pending_token is not None:
+            self.token_store.save(self._pending_token)
+        self._pending.clear()
+        return len(events)
+
+    def run(self, stop: Optional[threading.Event] = None, max_events: Optional[int] = None,
+            on_idle: Optional[Callable[["ChangeConsumer"], Any]] = None) -> None:
+        """Consume until `stop` is set (or `max_events` were dispatched); flushes before returning"""
+        stop = stop or threading.Event()
+        resume_after = self.token_store.load() if self.token_store is not None else None
+        options: Dict[str, Any] = {"max_await_time_ms": max(1, self.debounce_ms), "batch_size": self.batch_size}
+        if resume_after is not None:
+            options["resume_after"] = resume_after
+        if self.full_document:
+            options["full_document"] = "updateLookup"
+
+        with self.db.watch(self.pipeline(), **options) as stream:
+            while not stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    self.add(change, stream.resume_token)
+                if self.due():
+                    self.flush()
+                    if max_events is not None and self.metrics.entregues >= max_events:
+                        return
+                if change is None and on_idle is not None:
+                    on_idle(self)
+            self.flush()
+
+def log_handler(events: List[ChangeEvent]) -> None:
+    """Print one line per batch with the changes per collection and operation"""
+    counts: Dict[Tuple[str, str], int] = {}
+    for event in events:
+        counts[(event.colecao, event.operacao)] = counts.get((event.colecao, event.operacao), 0) + event.ocorrencias
+    resumo = ", ".join(f"{colecao}.{operacao}={n}" for (colecao, operacao), n in sorted(counts.items()))
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {len(events)} documentos: {resumo}", flush=True)
+
+def cache_handler(events: List[ChangeEvent]) -> None:
+    """Invalidate the caches of this process (cache.py, query_cache.py) once per collection"""
+    for colecao in sorted({event.colecao for event in events}):
+        invalidate_collection(colecao)
+
+class JsonlHandler:
+    """Append each change to a JSON Lines file (one line per document changed)"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def __call__(self, events: List[ChangeEvent]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json_util.dumps(asdict(event), ensure_ascii=False) + "\n")
+
+def load_handler(spec: str) -> Handler:
+    """Handler from a name: log, cache, jsonl:<arquivo> or <módulo>:<função>"""
+    if spec == "log":
+        return log_handler
+    if spec == "cache":
+        return cache_handler
+    name, _, arg = spec.partition(":")
+    if name == "jsonl" and arg:
+        return JsonlHandler(arg)
+    if not arg:
+        raise ValueError(f"Handler desconhecido: {spec}")
+    handler = getattr(importlib.import_module(name), arg)
+    if not callable(handler):
+        raise ValueError(f"{spec} não é uma função")
+    return handler
+
+def verify(db: Database, timeout: float = 15.0) -> List[Tuple[str, bool]]:
+    """Smoke test: run the consumer in a thread, write through operations.py and check what arrives.
+
+    Writes (and then removes) a player and a user team in `db`; use a test database.
+    """
+    import operations
+
+    usuario = db.usuario.find_one({}, {"_id": 1})
+    time_oficial = db.time_oficial.find_one({}, {"_id": 1})
+    if usuario is None or time_oficial is None:
+        raise ValueError("o banco precisa de pelo menos um usuário e um time oficial (python setup_database.py)")
+
+    received: List[ChangeEvent] = []
+    lock = threading.Lock()
+
+    def collect(events: List[ChangeEvent]) -> None:
+        with lock:
+            received.extend(events)
+
+    def seen(colecao: str, operacao: str, campo: Optional[str] = None) -> bool:
+        with lock:
+            # Array appends are reported per element (jogador_ids.0)
+            return any(e.colecao == colecao and e.operacao == operacao
+                       and (campo is None or any(c == campo or c.startswith(campo + ".") for c in e.campos))
+                       for e in received)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        token_store = TokenStore(os.path.join(tmp, "token.json"))
+        # One event per batch: nothing is coalesced, so every operation can be checked
+        consumer = ChangeConsumer(db, [collect], token_store=token_store, batch_size=1, debounce_ms=100)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def consume() -> None:
+            try:
+                consumer.run(stop)
+            except BaseException as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=consume, name="change-consumer-verify", daemon=True)
+        thread.start()
+        # The stream only sees changes made after it opened
+        time.sleep(1.0)
+
+        jogador = operations.cadastrar_jogador(db, {"nome": "Verificação change stream", "posicao": "Atacante"})
+        time_usuario = operations.criar_time_usuario(db, {"nome": "Verificação change stream", "usuario_id": usuario["_id"]})
+        operations.adicionar_jogadores(db, time_usuario["_id"], [jogador["_id"]])
+        operations.transferir_jogador(db, jogador["_id"], {"time_id": time_oficial["_id"]})
+        operations.remover_jogador(db, jogador["_id"])
+        db.time_usuario.delete_one({"_id": time_usuario["_id"]})
+
+        checks = {
+            "jogador cadastrado": lambda: seen("jogador", "insert"),
+            "time de usuário criado": lambda: seen("time_usuario", "insert"),
+            "jogador adicionado ao elenco": (lambda: seen("time_usuario", "update", "jogador_ids")) if roster_schema.EMBEDDED
+            else (lambda: seen("time_usuario_jogador", "insert")),
+            "jogador transferido": lambda: seen("jogador", "update", "time_id"),
+            "jogador removido": lambda: seen("jogador", "delete"),
+            "time de usuário removido": lambda: seen("time_usuario", "delete")
+        }
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not errors and not all(check() for check in checks.values()):
+            time.sleep(0.1)
+        stop.set()
+        thread.join(timeout=5)
+        if errors:
+            raise errors[0]
+
+        results = [(name, check()) for name, check in checks.items()]
+        results.append(("token de retomada salvo", token_store.load() is not None))
+        return results
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Consome o change stream de jogador, time_usuario e time_usuario_jogador")
+    parser.add_argument("--handler", action="append", default=[], metavar="NOME",
+                        help="log (padrão), cache, jsonl:<arquivo> ou <módulo>:<função> que recebe a lista de eventos; repetível")
+    parser.add_argument("--colecao", action="append", choices=COLLECTIONS, help="coleções acompanhadas (padrão: todas)")
+    parser.add_argument("--token-arquivo", default=CHANGE_TOKEN_FILE, help="onde o token de retomada é salvo")
+    parser.add_argument("--do-agora", action="store_true", help="ignora o token salvo e começa pelas mudanças novas")
+    parser.add_argument("--lote", type=int, default=CHANGE_BATCH_SIZE, help="máximo de documentos por lote")
+    parser.add_argument("--debounce-ms", type=int, default=CHANGE_DEBOUNCE_MS)
+    parser.add_argument("--espera-maxima-ms", type=int, default=CHANGE_MAX_WAIT_MS)
+    parser.add_argument("--documento-completo", action="store_true", help="inclui o documento atual nos updates (updateLookup)")
+    parser.add_argument("--metricas", help="arquivo (.prom ou .json) reescrito a cada --intervalo segundos")
+    parser.add_argument("--intervalo", type=float, default=10.0, help="segundos entre as linhas de métricas")
+    parser.add_argument("--verificar", action="store_true",
+                        help="teste rápido: grava e remove um jogador e um time e confere os eventos recebidos")
+    args = parser.parse_args()
+
+    db = get_database()
+    try:
+        if args.verificar:
+            print("=== Verificando o change stream ===\n")
+            results = verify(db)
+            for name, ok in results:
+                print(f"{'✓' if ok else '✗'} {name}")
+            if not all(ok for _, ok in results):
+                sys.exit(1)
+            return
+
+        token_store = TokenStore(args.token_arquivo)
+        if args.do_agora:
+            token_store.clear()
+        consumer = ChangeConsumer(
+            db, [load_handler(spec) for spec in args.handler or ["log"]], args.colecao or COLLECTIONS,
+            token_store, args.lote, args.debounce_ms, args.espera_maxima_ms, args.documento_completo
+        )
+
+        last_report = [time.monotonic()]
+
+        def report(consumer: ChangeConsumer) -> None:
+            if time.monotonic() - last_report[0] < args.intervalo:
+                return
+            last_report[0] = time.monotonic()
+            stats = consumer.metrics.stats()
+            print("Métricas: " + ", ".join(f"{k}={v}" for k, v in stats.items()), flush=True)
+            if args.metricas:
+                command_metrics.export(args.metricas, {"change_consumer": stats})
+
+        print(f"=== Acompanhando {', '.join(consumer.collections)} (Ctrl+C para sair) ===\n", flush=True)
+        try:
+            consumer.run(on_idle=report)
+        except KeyboardInterrupt:
+            print("\nInterrompido.")
+        print("Métricas: " + json.dumps(consumer.metrics.stats(), ensure_ascii=False))
+    except OperationFailure as e:
+        if e.code == CHANGE_STREAM_HISTORY_LOST:
+            print("\n✗ O token salvo não está mais no oplog; use --do-agora para recomeçar (mudanças no intervalo serão perdidas)")
+        elif e.code == CHANGE_STREAM_FATAL_ERROR:
+            print(f"\n✗ Token de retomada inválido ({args.token_arquivo}): {e}")
+        else:
+            print(f"\n✗ Erro fatal: {e} (change streams exigem replica set)")
+        sys.exit(1)
+    except (PyMongoError, ValueError, OSError) as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
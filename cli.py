@@ -0,0 +1,314 @@
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import argparse
+import csv
+import json
+import shlex
+import sys
+from database import get_database, close_database
+import operations
+from position_counts import POSITION_COUNTS_COLLECTION, ensure_position_counts
+from queries import (
+    PageKey, id_key, iter_pages, name_key, jogadores_page, jogadores_por_posicao_resumo_pipeline,
+    jogadores_sem_time_page, time_preferido_pipeline, times_oficiais_page, times_usuario_page, usuarios_page
+)
+import roster_view
+from query_cache import cached_aggregate
+from table import print_table_stream
+from validation import ValidationError, parse_id, parse_id_list
+import writes
+
+# Subcommand interface over the same operations and queries as the menus:
+#   python app.py cadastrar-jogador --nome "Fulano" --posicao Atacante --time-id 1
+#   python app.py listar jogadores --format json
+#   python app.py lote comandos.txt
+# Nothing prompts; errors go to stderr and set the exit code.
+
+FORMATS = ("table", "json", "jsonl", "csv")
+
+class Listing(NamedTuple):
+    """A paginated listing: field names (json/csv), table headers and how to fetch and flatten it"""
+    fields: List[str]
+    headers: List[str]
+    fetch_page: Callable[..., Any]
+    to_rows: Callable[[Dict[str, Any]], Iterable[Tuple[Any, ...]]]
+    page_key: Callable[[Dict[str, Any]], PageKey] = name_key
+
+LISTINGS: Dict[str, Listing] = {
+    "usuarios": Listing(
+        ["id", "nome", "email", "sexo", "telefone", "data_nascimento", "time_preferido"],
+        ["ID", "Nome", "Email", "Sexo", "Telefone", "Nascimento", "Time Preferido"],
+        usuarios_page,
+        lambda u: [(u["_id"], u["nome"], u["email"], u["sexo"], u.get("telefone"), u["data_nascimento"], u.get("time_preferido"))]
+    ),
+    "times-oficiais": Listing(
+        ["id", "nome", "sigla"],
+        ["ID", "Nome", "Sigla"],
+        times_oficiais_page,
+        lambda t: [(t["_id"], t["nome"], t["sigla"])]
+    ),
+    "jogadores": Listing(
+        ["id", "nome", "posicao", "time_oficial"],
+        ["ID", "Nome", "Posição", "Time Oficial"],
+        jogadores_page,
+        lambda j: [(j["_id"], j["nome"], j["posicao"], j["time_oficial"])]
+    ),
+    "times-usuario": Listing(
+        ["time_usuario", "dono", "jogador", "posicao"],
+        ["Time do Usuário", "Dono", "Jogador", "Posição"],
+        times_usuario_page,
+        roster_view.roster_rows
+    ),
+    "jogadores-sem-time": Listing(
+        ["id", "nome", "posicao"],
+        ["ID", "Nome", "Posição"],
+        jogadores_sem_time_page,
+        lambda j: [(j["_id"], j["nome"], j["posicao"])],
+        id_key
+    )
+}
+
+def iter_listing(db: Database, listing: Listing) -> Iterator[Tuple[Any, ...]]:
+    """Every row of a listing, fetched page by page"""
+    for page in iter_pages(listing.fetch_page, db, listing.to_rows, listing.page_key):
+        yield from page.rows()
+
+class Report(NamedTuple):
+    """Result of an advanced query: field names, table headers and the rows (a lazy iterator)"""
+    fields: List[str]
+    headers: List[str]
+    rows: Iterator[Tuple[Any, ...]]
+
+def consulta_por_posicao(db: Database, usuario_id: Optional[int] = None) -> Report:
+    ensure_position_counts(db)
+    docs = cached_aggregate(db, POSITION_COUNTS_COLLECTION, jogadores_por_posicao_resumo_pipeline())
+    return Report(["time_oficial", "posicao", "qtd"], ["Time Oficial", "Posição", "Quantidade"],
+                  ((r["time_oficial"], r["posicao"], r["qtd"]) for r in docs))
+
+def consulta_sem_time(db: Database, usuario_id: Optional[int] = None) -> Report:
+    listing = LISTINGS["jogadores-sem-time"]
+    return Report(listing.fields, listing.headers, iter_listing(db, listing))
+
+def consulta_time_preferido(db: Database, usuario_id: Optional[int] = None) -> Report:
+    docs = cached_aggregate(db, "usuario", time_preferido_pipeline(usuario_id))
+    return Report(["usuario", "time_preferido", "jogadores_do_time_preferido"],
+                  ["Usuário", "Time Preferido", "Jogadores do Time Preferido"],
+                  ((r["usuario"], r["time_preferido"], r["jogadores_do_time_preferido"]) for r in docs))
+
+# Advanced queries by name: (db, usuario_id) -> Report; only time-preferido uses usuario_id
+CONSULTAS: Dict[str, Callable[[Database, Optional[int]], Report]] = {
+    "por-posicao": consulta_por_posicao,
+    "sem-time": consulta_sem_time,
+    "time-preferido": consulta_time_preferido
+}
+
+def write_rows(fields: List[str], headers: List[str], rows: Iterable[Tuple[Any, ...]],
+               output_format: str, out: Any = None) -> int:
+    """Write rows as they arrive in the given format; returns the number of rows"""
+    out = out or sys.stdout
+    if output_format == "table":
+        return print_table_stream(headers, rows)
+
+    count = 0
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(["" if cell is None else cell for cell in row])
+            count += 1
+    elif output_format == "jsonl":
+        for row in rows:
+            out.write(json.dumps(dict(zip(fields, row)), ensure_ascii=False, default=str) + "\n")
+            count += 1
+    else:
+        # A JSON array written item by item, so long listings are not held in memory
+        out.write("[")
+        for row in rows:
+            out.write(("," if count else "") + "\n  " + json.dumps(dict(zip(fields, row)), ensure_ascii=False, default=str))
+            count += 1
+        out.write("\n]\n" if count else "]\n")
+    return count
+
+def write_document(doc: Any, output_format: str) -> None:
+    """Print the result of a write command"""
+    doc = operations.public_document(doc)
+    if output_format == "table":
+        print(", ".join(f"{key}={value}" for key, value in doc.items()))
+    else:
+        print(json.dumps(doc, ensure_ascii=False, default=str))
+
+def cmd_cadastrar_usuario(db: Database, args: argparse.Namespace) -> None:
+    write_document(writes.cadastrar_usuario(db, {
+        "nome": args.nome,
+        "email": args.email,
+        "senha": args.senha,
+        "sexo": args.sexo,
+        "telefone": args.telefone,
+        "data_nascimento": args.data_nascimento,
+        "time_preferido": args.time_preferido
+    }), args.format)
+
+def cmd_cadastrar_time_oficial(db: Database, args: argparse.Namespace) -> None:
+    write_document(writes.cadastrar_time_oficial(db, {
+        "nome": args.nome, "sigla": args.sigla, "nome_curto": args.nome_curto
+    }), args.format)
+
+def cmd_cadastrar_jogador(db: Database, args: argparse.Namespace) -> None:
+    write_document(writes.cadastrar_jogador(db, {
+        "nome": args.nome, "posicao": args.posicao, "time_id": args.time_id
+    }), args.format)
+
+def cmd_transferir_jogador(db: Database, args: argparse.Namespace) -> None:
+    dados = {}
+    if args.time_id is not None:
+        dados["time_id"] = args.time_id
+    if args.posicao is not None:
+        dados["posicao"] = args.posicao
+    write_document(operations.transferir_jogador(db, parse_id(args.id), dados), args.format)
+
+def cmd_remover_jogador(db: Database, args: argparse.Namespace) -> None:
+    write_document(operations.remover_jogador(db, parse_id(args.id)), args.format)
+
+def cmd_criar_time_usuario(db: Database, args: argparse.Namespace) -> None:
+    write_document(writes.criar_time_usuario(db, {"nome": args.nome, "usuario_id": args.usuario_id}), args.format)
+
+def cmd_adicionar_jogadores(db: Database, args: argparse.Namespace) -> None:
+    result = writes.adicionar_jogadores(db, parse_id(args.time_usuario_id), parse_id_list(args.jogadores))
+    write_document(vars(result), args.format)
+    if not result.inseridos:
+        raise ValidationError("Nenhum jogador adicionado!")
+
+def cmd_listar(db: Database, args: argparse.Namespace) -> None:
+    listing = LISTINGS[args.listagem]
+    write_rows(listing.fields, listing.headers, iter_listing(db, listing), args.format)
+
+def cmd_consulta(db: Database, args: argparse.Namespace) -> None:
+    usuario_id = parse_id(args.usuario_id) if args.usuario_id is not None else None
+    report = CONSULTAS[args.consulta](db, usuario_id)
+    write_rows(report.fields, report.headers, report.rows, args.format)
+
+def cmd_lote(db: Database, args: argparse.Namespace) -> None:
+    source = sys.stdin if args.arquivo == "-" else open(args.arquivo, encoding="utf-8")
+    ok = falhas = 0
+    try:
+        for line_num, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                tokens = shlex.split(line)
+            except ValueError as e:
+                tokens = None
+                print(f"linha {line_num}: ✗ {e}", file=sys.stderr)
+            if tokens and tokens[0] == "lote":
+                raise ValidationError(f"linha {line_num}: 'lote' não pode ser usado dentro de um lote")
+            if tokens is not None and run(db, tokens, prefix=f"linha {line_num}: ") == 0:
+                ok += 1
+            else:
+                falhas += 1
+                if args.parar_no_erro:
+                    break
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    print(f"Lote: {ok} comando(s) executado(s), {falhas} com erro", file=sys.stderr)
+    if falhas:
+        raise ValidationError(f"{falhas} comando(s) do lote falharam")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Argument parser with one subcommand per menu operation"""
+    parser = argparse.ArgumentParser(prog="app.py", description="Futebol App - modo não interativo (sem argumentos abre o menu)")
+    parser.add_argument("--format", choices=FORMATS, default="table", help="formato de saída (padrão: table)")
+    sub = parser.add_subparsers(dest="comando", required=True, metavar="comando")
+
+    def command(name: str, handler: Callable[[Database, argparse.Namespace], None], help_text: str) -> argparse.ArgumentParser:
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--format", choices=FORMATS, default=argparse.SUPPRESS, help="formato de saída")
+        p.set_defaults(handler=handler)
+        return p
+
+    p = command("cadastrar-usuario", cmd_cadastrar_usuario, "cadastra um usuário")
+    p.add_argument("--nome", required=True)
+    p.add_argument("--email", required=True)
+    p.add_argument("--senha", required=True)
+    p.add_argument("--sexo", required=True, help="M, F, O (ou 1-3)")
+    p.add_argument("--telefone")
+    p.add_argument("--data-nascimento", required=True, help="AAAA-MM-DD")
+    p.add_argument("--time-preferido")
+
+    p = command("cadastrar-time-oficial", cmd_cadastrar_time_oficial, "cadastra um time oficial")
+    p.add_argument("--nome", required=True)
+    p.add_argument("--sigla", required=True)
+    p.add_argument("--nome-curto")
+
+    p = command("cadastrar-jogador", cmd_cadastrar_jogador, "cadastra um jogador")
+    p.add_argument("--nome", required=True)
+    p.add_argument("--posicao", required=True)
+    p.add_argument("--time-id", help="ID do time oficial (omitido ou 0: jogador livre)")
+
+    p = command("transferir-jogador", cmd_transferir_jogador, "muda o time oficial e/ou a posição de um jogador")
+    p.add_argument("--id", required=True)
+    p.add_argument("--time-id", help="novo time oficial (0: jogador livre)")
+    p.add_argument("--posicao")
+
+    p = command("remover-jogador", cmd_remover_jogador, "remove um jogador e o tira dos times de usuário")
+    p.add_argument("--id", required=True)
+
+    p = command("criar-time-usuario", cmd_criar_time_usuario, "cria um time de usuário")
+    p.add_argument("--nome", required=True)
+    p.add_argument("--usuario-id", required=True)
+
+    p = command("adicionar-jogadores", cmd_adicionar_jogadores, "adiciona jogadores a um time de usuário")
+    p.add_argument("--time-usuario-id", required=True)
+    p.add_argument("--jogadores", required=True, help="IDs separados por vírgula")
+
+    p = command("listar", cmd_listar, "lista usuários, times ou jogadores")
+    p.add_argument("listagem", choices=sorted(LISTINGS))
+
+    p = command("consulta", cmd_consulta, "consultas avançadas")
+    p.add_argument("consulta", choices=list(CONSULTAS))
+    p.add_argument("--usuario-id", help="apenas para time-preferido (padrão: todos)")
+
+    p = command("lote", cmd_lote, "executa um arquivo de comandos (um por linha) na mesma conexão")
+    p.add_argument("arquivo", help="arquivo de comandos ou - para a entrada padrão")
+    p.add_argument("--parar-no-erro", action="store_true", help="interrompe o lote no primeiro erro")
+
+    return parser
+
+def run(db: Database, argv: List[str], prefix: str = "") -> int:
+    """Run one command line; returns the exit code (0 ok, 1 failed, 2 invalid arguments)"""
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 2
+
+    try:
+        args.handler(db, args)
+        return 0
+    except ValidationError as e:
+        print(f"{prefix}✗ {e}", file=sys.stderr)
+    except DuplicateKeyError:
+        print(f"{prefix}✗ Registro duplicado!", file=sys.stderr)
+    except OSError as e:
+        print(f"{prefix}✗ {e}", file=sys.stderr)
+    except PyMongoError as e:
+        # Timeouts, write concern and server errors fail this command only (a batch goes on)
+        print(f"{prefix}✗ Erro no banco de dados: {e}", file=sys.stderr)
+    return 1
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run a single subcommand (or a batch) and exit with its status"""
+    try:
+        code = run(get_database(), sys.argv[1:] if argv is None else argv)
+    except Exception as e:
+        print(f"✗ Erro fatal: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        close_database()
+    sys.exit(code)
+
+if __name__ == "__main__":
+    main()
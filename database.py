@@ -0,0 +1,216 @@
+from pymongo import MongoClient
+from pymongo.database import Database
+from pymongo.monitoring import ConnectionPoolListener
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from profiling import command_metrics
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    raise ValueError("MONGODB_URI environment variable is not set")
+
+DEFAULT_DB_NAME = "futebol_app"
+
+READ_PREFERENCES = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    """Read an optional integer environment variable"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+def _env_list(name: str) -> List[str]:
+    """Read a comma separated environment variable"""
+    value = os.getenv(name, "")
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+@dataclass
+class DatabaseConfig:
+    """Connection pool and consistency settings for the shared client"""
+    uri: str = MONGODB_URI
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    wait_queue_timeout_ms: Optional[int] = None
+    compressors: List[str] = field(default_factory=list)
+    read_preference: str = "primary"
+    write_concern: Optional[str] = None
+    # The driver retries a failed write once, safely (the server discards a duplicate)
+    retry_writes: bool = True
+
+    @classmethod
+    def from_env(cls) -> "DatabaseConfig":
+        """Build the configuration from MONGODB_* environment variables"""
+        return cls(
+            uri=MONGODB_URI,
+            max_pool_size=_env_int("MONGODB_MAX_POOL_SIZE", 100),
+            min_pool_size=_env_int("MONGODB_MIN_POOL_SIZE", 0),
+            wait_queue_timeout_ms=_env_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS", None),
+            compressors=_env_list("MONGODB_COMPRESSORS"),
+            read_preference=os.getenv("MONGODB_READ_PREFERENCE", "primary"),
+            write_concern=os.getenv("MONGODB_WRITE_CONCERN") or None,
+            retry_writes=os.getenv("MONGODB_RETRY_WRITES", "1").lower() in ("1", "true", "sim")
+        )
+
+    @property
+    def db_name(self) -> str:
+        db_name = self.uri.split("/")[-1].split("?")[0]
+        return db_name if db_name else DEFAULT_DB_NAME
+
+    def client_options(self) -> Dict[str, Any]:
+        """Keyword arguments for MongoClient (also accepted by async clients)"""
+        if self.read_preference not in READ_PREFERENCES:
+            raise ValueError(f"Invalid read preference: {self.read_preference}")
+
+        options: Dict[str, Any] = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "readPreference": self.read_preference,
+            "retryWrites": self.retry_writes
+        }
+        if self.wait_queue_timeout_ms is not None:
+            options["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.compressors:
+            options["compressors"] = self.compressors
+        if self.write_concern is not None:
+            w = self.write_concern
+            options["w"] = int(w) if w.isdigit() else w
+        return options
+
+class PoolMetrics(ConnectionPoolListener):
+    """Collects connection checkout counts and wait times from pool events"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkins = 0
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        wait_ms = self._wait_ms()
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event) -> None:
+        wait_ms = self._wait_ms()
+        with self._lock:
+            self.checkout_failures += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.checkins += 1
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current counters as a dict"""
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkins": self.checkins,
+                "in_use": self.checkouts - self.checkins,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "open_connections": self.connections_created - self.connections_closed,
+                "avg_wait_ms": round(self.total_wait_ms / attempts, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3)
+            }
+
+# Global variables for connection management
+_client: MongoClient = None
+_database: Database = None
+_config: DatabaseConfig = None
+pool_metrics = PoolMetrics()
+
+def configure(config: DatabaseConfig) -> None:
+    """Replace the configuration used by the next connection (closes the current one)"""
+    global _config
+    close_database()
+    _config = config
+
+def get_config() -> DatabaseConfig:
+    """Get the active configuration, loading it from the environment on first use"""
+    global _config
+    if _config is None:
+        _config = DatabaseConfig.from_env()
+    return _config
+
+def get_client() -> MongoClient:
+    """Get the shared MongoClient (singleton pattern)"""
+    global _client, _database
+
+    if _client is None:
+        config = get_config()
+        _client = MongoClient(config.uri, event_listeners=[pool_metrics, command_metrics], **config.client_options())
+        _database = _client[config.db_name]
+
+    return _client
+
+def get_database() -> Database:
+    """Get MongoDB database (singleton pattern)"""
+    if _database is None:
+        get_client()
+    return _database
+
+def close_database() -> None:
+    """Close MongoDB connection"""
+    global _client, _database
+
+    if _client is not None:
+        _client.close()
+        _client = None
+        _database = None
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Pool checkout and wait metrics for the shared client"""
+    return pool_metrics.snapshot()
@@ -0,0 +1,199 @@
+from bson.codec_options import CodecOptions
+from pymongo.collection import Collection
+from pymongo.database import Database
+from typing import Any, Callable, ClassVar, Dict, Iterator, List, Mapping, Optional, Tuple, Type, TypeVar
+import argparse
+import sys
+import tracemalloc
+from database import get_database, close_database
+from row_decoding import SlottedRow, projection
+from table import print_table
+from validation import (
+    validate_jogador, validate_time_oficial, validate_time_usuario, validate_time_usuario_jogador, validate_usuario
+)
+
+# Typed records of the five collections. Each class keeps its fields in
+# __slots__ (no per-instance dict) and is also a mapping, so:
+#   - the BSON decoder can build it straight from the cursor bytes
+#     (entity_collection), with no intermediate dict per document;
+#   - code written against documents (doc["nome"], doc.get("telefone"))
+#     keeps working unchanged.
+# Fields missing from the document (e.g. left out by a projection) are missing
+# from the mapping too, but read as None through attributes (usuario.telefone).
+# from_input() applies the same validation as operations.cadastrar_*.
+
+E = TypeVar("E", bound="Entity")
+
+class Entity(SlottedRow):
+    """Base of the entity classes"""
+    __slots__ = ()
+    COLLECTION: ClassVar[str] = ""
+    VALIDATOR: ClassVar[Callable[[Mapping[str, Any]], Dict[str, Any]]]
+
+    def __init__(self, **fields: Any) -> None:
+        for name, value in fields.items():
+            self[name] = value
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for declared fields that were never set
+        if name in self.__slots__:
+            return None
+        raise AttributeError(name)
+
+    def __getitem__(self, key: str) -> Any:
+        # Unset fields are missing from the mapping, as in the document
+        if key not in self:
+            raise KeyError(key)
+        return object.__getattribute__(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in self.__slots__ if _is_set(self, name))
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and name in self.__slots__ and _is_set(self, name)
+
+    @property
+    def id(self) -> Any:
+        return self._id
+
+    @classmethod
+    def from_document(cls: Type[E], doc: Mapping[str, Any]) -> E:
+        """Build from a decoded document (dict or RawBSONDocument), ignoring unknown fields"""
+        entity = cls.__new__(cls)
+        for name in cls.__slots__:
+            if name in doc:
+                setattr(entity, name, doc[name])
+        return entity
+
+    @classmethod
+    def from_input(cls: Type[E], dados: Mapping[str, Any]) -> E:
+        """Validate raw input (menus, CSV, JSON) with the registration rules; no _id yet"""
+        return cls(**cls.VALIDATOR(dados))
+
+    def to_document(self) -> Dict[str, Any]:
+        """Plain dict with the fields that are set, ready for insert_one or JSON"""
+        return {name: getattr(self, name) for name in self}
+
+    def row(self, fields: Tuple[str, ...]) -> Tuple[Any, ...]:
+        """Table row with the given fields"""
+        return tuple(getattr(self, name) for name in fields)
+
+def _is_set(entity: Entity, name: str) -> bool:
+    # object.__getattribute__ skips Entity.__getattr__, which would answer None
+    try:
+        object.__getattribute__(entity, name)
+    except AttributeError:
+        return False
+    return True
+
+class Usuario(Entity):
+    __slots__ = ("_id", "nome", "email", "senha", "sexo", "telefone", "data_nascimento", "time_preferido")
+    COLLECTION = "usuario"
+    VALIDATOR = staticmethod(validate_usuario)
+
+class TimeOficial(Entity):
+    __slots__ = ("_id", "nome", "sigla", "nome_curto")
+    COLLECTION = "time_oficial"
+    VALIDATOR = staticmethod(validate_time_oficial)
+
+class Jogador(Entity):
+    # time_oficial is the team name added by the listing $lookup
+    __slots__ = ("_id", "nome", "posicao", "time_id", "time_oficial")
+    COLLECTION = "jogador"
+    VALIDATOR = staticmethod(validate_jogador)
+
+class TimeUsuario(Entity):
+    # dono and jogadores come from the roster stages; jogador_ids and elenco
+    # are the embedded layout of roster_schema.py
+    __slots__ = ("_id", "nome", "usuario_id", "dono", "jogadores", "jogador_ids", "elenco", "versao")
+    COLLECTION = "time_usuario"
+    VALIDATOR = staticmethod(validate_time_usuario)
+
+    @classmethod
+    def from_document(cls, doc: Mapping[str, Any]) -> "TimeUsuario":
+        """Roster members become Jogador objects as well"""
+        time_usuario = super().from_document(doc)
+        for name in ("jogadores", "elenco"):
+            if name in time_usuario:
+                time_usuario[name] = [Jogador.from_document(j) for j in time_usuario[name]]
+        return time_usuario
+
+class TimeUsuarioJogador(Entity):
+    __slots__ = ("_id", "time_usuario_id", "jogador_id")
+    COLLECTION = "time_usuario_jogador"
+    VALIDATOR = staticmethod(validate_time_usuario_jogador)
+
+ENTITIES: Dict[str, Type[Entity]] = {
+    cls.COLLECTION: cls for cls in (Usuario, TimeOficial, Jogador, TimeUsuario, TimeUsuarioJogador)
+}
+
+def entity_collection(db: Database, entity: Type[Entity], collection_name: Optional[str] = None) -> Collection:
+    """Collection whose cursors yield `entity` objects decoded straight from BSON.
+
+    Only for flat results: nested documents would be decoded as `entity` too,
+    so rosters go through TimeUsuario.from_document instead. Queries must
+    project the entity's fields, since stored documents also carry keys the
+    class does not declare (e.g. the search keys of search.py).
+    """
+    return db.get_collection(collection_name or entity.COLLECTION, codec_options=CodecOptions(document_class=entity))
+
+def measure_rows(load: Callable[[], List[Any]]) -> Tuple[int, int]:
+    """(rows, bytes still allocated) for the list returned by load()"""
+    tracemalloc.start()
+    try:
+        rows = load()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return len(rows), current
+
+def compare_memory(db: Database, limit: int = 0) -> List[Tuple[str, str, int, int]]:
+    """Memory of each collection held as dicts vs. entities: [(colecao, formato, linhas, bytes)]"""
+    results = []
+    for name, entity in ENTITIES.items():
+        # Nested rosters cannot be decoded as one class; measure them through from_document
+        flat = name != "time_usuario"
+        # Both formats hold the same fields: the ones the entity declares
+        fields = projection(entity.__slots__)
+        loaders = {
+            "dict": lambda: list(db[name].find({}, fields, limit=limit)),
+            "entidade": (lambda: list(entity_collection(db, entity).find({}, fields, limit=limit))) if flat
+            else (lambda: [entity.from_document(d) for d in db[name].find({}, fields, limit=limit)])
+        }
+        for formato, load in loaders.items():
+            rows, allocated = measure_rows(load)
+            results.append((name, formato, rows, allocated))
+    return results
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compara a memória por linha de documentos (dict) e entidades com __slots__")
+    parser.add_argument("--limite", type=int, default=0, help="documentos por coleção (padrão: todos)")
+    args = parser.parse_args()
+
+    print("=== Memória por linha: dict vs. entidades ===\n")
+
+    try:
+        results = compare_memory(get_database(), args.limite)
+        by_collection: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        for name, formato, rows, allocated in results:
+            by_collection.setdefault(name, {})[formato] = (rows, allocated)
+
+        table = []
+        for name, formats in by_collection.items():
+            rows, dict_bytes = formats["dict"]
+            _, entity_bytes = formats["entidade"]
+            if not rows:
+                table.append((name, 0, "-", "-", "-"))
+                continue
+            table.append((name, rows, round(dict_bytes / rows), round(entity_bytes / rows),
+                          f"{1 - entity_bytes / dict_bytes:.0%}" if dict_bytes else "-"))
+        print_table(["Coleção", "Linhas", "dict (bytes/linha)", "Entidade (bytes/linha)", "Economia"], table)
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+from itertools import chain
+from pymongo.database import Database
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from cli import LISTINGS, Report, write_rows
+from database import get_database, close_database
+from position_counts import POSITION_COUNTS_COLLECTION, ensure_position_counts
+from queries import REPORT_QUERIES, iter_pages, jogadores_por_posicao_resumo_pipeline, time_preferido_pipeline
+import roster_schema
+from validation import parse_id
+
+# Streams a listing, an advanced query, a report query (Q1-Q5) or the roster
+# links to a file. Rows go from the cursor to the (optionally compressed)
+# file as they arrive: listings are read in keyset pages of --batch-size,
+# aggregations with batchSize, and Parquet is written one row group per batch,
+# so memory does not grow with the size of the result.
+#   python export.py vinculos vinculos.csv.gz --batch-size 10000
+
+DEFAULT_BATCH_SIZE = 5000
+FORMATS = ("csv", "jsonl", "json", "parquet")
+COMPRESSIONS = ("gzip", "zstd")
+
+class ExportStats(NamedTuple):
+    linhas: int
+    bytes: Optional[int]
+    segundos: float
+
+def _aggregate(db: Database, collection_name: str, pipeline: List[Dict[str, Any]], batch_size: int) -> Report:
+    """Report over an aggregation; the columns are the fields of the first document"""
+    cursor = db[collection_name].aggregate(pipeline, batchSize=batch_size, allowDiskUse=True)
+    first = next(cursor, None)
+    if first is None:
+        return Report([], [], iter(()))
+    fields = list(first.keys())
+    docs = chain([first], cursor)
+    return Report(fields, fields, (tuple(doc.get(f) for f in fields) for doc in docs))
+
+def _listing(name: str) -> Callable[[Database, int, Optional[int]], Report]:
+    listing = LISTINGS[name]
+
+    def source(db: Database, batch_size: int, usuario_id: Optional[int] = None) -> Report:
+        pages = iter_pages(listing.fetch_page, db, listing.to_rows, listing.page_key, page_size=batch_size)
+        return Report(listing.fields, listing.headers, (row for page in pages for row in page.rows()))
+    return source
+
+def _report_query(name: str) -> Callable[[Database, int, Optional[int]], Report]:
+    collection_name, pipeline = REPORT_QUERIES[name]
+
+    def source(db: Database, batch_size: int, usuario_id: Optional[int] = None) -> Report:
+        if collection_name == POSITION_COUNTS_COLLECTION:
+            ensure_position_counts(db)
+        return _aggregate(db, collection_name, pipeline(), batch_size)
+    return source
+
+def export_por_posicao(db: Database, batch_size: int, usuario_id: Optional[int] = None) -> Report:
+    ensure_position_counts(db)
+    docs = db[POSITION_COUNTS_COLLECTION].aggregate(jogadores_por_posicao_resumo_pipeline(), batchSize=batch_size)
+    return Report(["time_oficial", "posicao", "qtd"], ["Time Oficial", "Posição", "Quantidade"],
+                  ((r["time_oficial"], r["posicao"], r["qtd"]) for r in docs))
+
+def export_time_preferido(db: Database, batch_size: int, usuario_id: Optional[int] = None) -> Report:
+    # Not through the query cache: an export of every user must not be held in memory
+    docs = db.usuario.aggregate(time_preferido_pipeline(usuario_id), batchSize=batch_size, allowDiskUse=True)
+    return Report(["usuario", "time_preferido", "jogadores_do_time_preferido"],
+                  ["Usuário", "Time Preferido", "Jogadores do Time Preferido"],
+                  ((r["usuario"], r["time_preferido"], r["jogadores_do_time_preferido"]) for r in docs))
+
+def export_vinculos(db: Database, batch_size: int, usuario_id: Optional[int] = None) -> Report:
+    """Every (time_usuario_id, jogador_id) roster link, in either roster layout"""
+    if roster_schema.EMBEDDED:
+        docs = db.time_usuario.aggregate([
+            {"$match": {"jogador_ids.0": {"$exists": True}}},
+            {"$sort": {"_id": 1}},
+            {"$unwind": "$jogador_ids"},
+            {"$project": {"_id": 0, "time_usuario_id": "$_id", "jogador_id": "$jogador_ids"}}
+        ], batchSize=batch_size, allowDiskUse=True)
+    else:
+        docs = db.time_usuario_jogador.find(
+            {}, {"_id": 0, "time_usuario_id": 1, "jogador_id": 1}, batch_size=batch_size
+        ).sort("_id", 1)
+    return Report(["time_usuario_id", "jogador_id"], ["Time do Usuário", "Jogador"],
+                  ((d["time_usuario_id"], d["jogador_id"]) for d in docs))
+
+# Source name -> (db, batch_size, usuario_id) -> Report
+SOURCES: Dict[str, Callable[[Database, int, Optional[int]], Report]] = {
+    **{name: _listing(name) for name in LISTINGS},
+    "por-posicao": export_por_posicao,
+    "sem-time": _listing("jogadores-sem-time"),
+    "time-preferido": export_time_preferido,
+    **{name: _report_query(name) for name in REPORT_QUERIES},
+    "vinculos": export_vinculos
+}
+
+def detect_format(path: str) -> Tuple[str, Optional[str]]:
+    """(format, compression) from a name like vinculos.csv.gz"""
+    base, ext = os.path.splitext(path.lower())
+    compression = {".gz": "gzip", ".zst": "zstd"}.get(ext)
+    if compression:
+        base, ext = os.path.splitext(base)
+    output_format = ext.lstrip(".")
+    if output_format not in FORMATS:
+        raise ValueError(f"Formato não reconhecido para {path}: use --formato ({', '.join(FORMATS)})")
+    return output_format, compression
+
+def open_output(path: str, compression: Optional[str]) -> IO[bytes]:
+    """Binary stream to a file (or stdout for "-"), compressed as it is written"""
+    if compression is None:
+        return sys.stdout.buffer if path == "-" else open(path, "wb")
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb") if path == "-" else gzip.open(path, "wb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Compressão zstd requer o pacote zstandard (pip install zstandard)") from None
+        raw = sys.stdout.buffer if path == "-" else open(path, "wb")
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=path != "-")
+    raise ValueError(f"Unknown compression: {compression}")
+
+def _cell(value: Any) -> Any:
+    """CSV cell: nested values (arrays, subdocuments) as JSON"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return value
+
+def _batches(rows: Iterable[Tuple[Any, ...]], size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    batch: List[Tuple[Any, ...]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# Parquet columns declared as integers: IDs and counts that can be null in a
+# whole batch (e.g. time_id of players without a team), so the first batch
+# alone cannot type them
+PARQUET_INTEGER_FIELDS = (
+    "id", "time_id", "usuario_id", "time_usuario_id", "jogador_id", "qtd", "jogadores_do_time_preferido"
+)
+
+def _text(value: Any) -> Optional[str]:
+    """Parquet text cell: nested values as JSON, other scalars as str"""
+    if value is None or isinstance(value, str):
+        return value
+    return str(_cell(value))
+
+def parquet_schema(fields: List[str], batch: List[Tuple[Any, ...]]) -> Any:
+    """Fixed schema of an export, from the first batch.
+
+    Declared integer fields are int64; the other columns take the type of
+    their first-batch values, or text when the first batch has none.
+    """
+    import pyarrow as pa
+
+    declared = [pa.field(name, pa.int64()) for name in fields if name in PARQUET_INTEGER_FIELDS]
+    inferred = pa.Table.from_pydict({
+        name: [row[i] for row in batch] for i, name in enumerate(fields) if name not in PARQUET_INTEGER_FIELDS
+    }).schema
+    types = {f.name: f for f in declared}
+    for f in inferred:
+        types[f.name] = pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+    return pa.schema([types[name] for name in fields])
+
+def write_parquet(fields: List[str], rows: Iterable[Tuple[Any, ...]], path: str,
+                  compression: Optional[str], batch_size: int) -> int:
+    """Write one Parquet row group per batch, every batch cast to the schema fixed by the first"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("O formato parquet requer o pacote pyarrow (pip install pyarrow)") from None
+    if path == "-":
+        raise ValueError("O formato parquet precisa de um arquivo de saída")
+
+    count = 0
+    writer = None
+    schema = None
+    try:
+        for batch in _batches(rows, batch_size):
+            if schema is None:
+                schema = parquet_schema(fields, batch)
+                writer = pq.ParquetWriter(path, schema, compression=compression or "snappy")
+            columns = {}
+            for i, f in enumerate(schema):
+                values = [row[i] for row in batch]
+                columns[f.name] = [_text(v) for v in values] if pa.types.is_string(f.type) else values
+            try:
+                table = pa.Table.from_pydict(columns, schema=schema)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError) as e:
+                raise ValueError(f"Valores fora do tipo das colunas na linha {count + 1} em diante: {e}") from None
+            writer.write_table(table)
+            count += len(batch)
+        if writer is None:
+            pq.write_table(pa.table({name: pa.array([], pa.string()) for name in fields}), path)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+def export(db: Database, source: str, path: str, output_format: str, compression: Optional[str] = None,
+           batch_size: int = DEFAULT_BATCH_SIZE, usuario_id: Optional[int] = None) -> ExportStats:
+    """Stream a source to `path` ("-" for stdout)"""
+    started = time.perf_counter()
+    report = SOURCES[source](db, batch_size, usuario_id)
+
+    if output_format == "parquet":
+        count = write_parquet(report.fields, report.rows, path, compression, batch_size)
+    else:
+        rows = report.rows
+        if output_format == "csv":
+            rows = (tuple(_cell(value) for value in row) for row in rows)
+        stream = open_output(path, compression)
+        out = io.TextIOWrapper(stream, encoding="utf-8", newline="", write_through=False)
+        try:
+            count = write_rows(report.fields, report.headers, rows, output_format, out)
+            out.flush()
+        finally:
+            if path == "-" and compression is None:
+                out.detach()
+            else:
+                out.close()
+
+    size = os.path.getsize(path) if path != "-" else None
+    return ExportStats(count, size, time.perf_counter() - started)
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Exporta listagens, consultas e elencos para CSV, JSONL ou Parquet")
+    parser.add_argument("fonte", choices=list(SOURCES), help="listagem, consulta (por-posicao, Q1…) ou vinculos")
+    parser.add_argument("arquivo", help="arquivo de saída (.csv, .jsonl, .json, .parquet, + .gz/.zst) ou - para stdout")
+    parser.add_argument("--formato", choices=FORMATS, help="padrão: pela extensão do arquivo")
+    parser.add_argument("--compressao", choices=COMPRESSIONS, help="padrão: pela extensão (.gz, .zst)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documentos por lote lido do cursor")
+    parser.add_argument("--usuario-id", help="apenas para time-preferido (padrão: todos)")
+    args = parser.parse_args()
+
+    if args.batch_size < 1:
+        parser.error("--batch-size deve ser maior que zero")
+
+    # Progress goes to stderr so that "-" can be piped
+    log = sys.stderr if args.arquivo == "-" else sys.stdout
+    try:
+        output_format, compression = args.formato, args.compressao
+        if output_format is None:
+            output_format, detected = detect_format(args.arquivo)
+            compression = compression or detected
+        usuario_id = parse_id(args.usuario_id) if args.usuario_id is not None else None
+
+        print(f"=== Exportando {args.fonte} para {args.arquivo} ===\n", file=log)
+        stats = export(get_database(), args.fonte, args.arquivo, output_format, compression, args.batch_size, usuario_id)
+
+        rate = stats.linhas / stats.segundos if stats.segundos else 0.0
+        print(f"Linhas: {stats.linhas}", file=log)
+        if stats.bytes is not None:
+            print(f"Tamanho: {stats.bytes / 1024 / 1024:.2f} MB", file=log)
+        print(f"\n✓ Exportação concluída em {stats.segundos:.2f}s ({rate:.0f} linhas/s)", file=log)
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from pymongo import ReturnDocument
+from pymongo.database import Database
+from typing import Any, Dict, Iterator, Mapping, Optional, Set, Tuple
+
+COUNTERS_COLLECTION = "contador"
+DEFAULT_BLOCK_SIZE = 1000
+
+# Client-chosen key stored with a created document, so a retried create can
+# recognize that an earlier attempt was already applied (see writes.py)
+IDEMPOTENCY_FIELD = "chave_idempotencia"
+
+# Collections whose counter was already synced with max(_id) in this process
+_synced: Set[Tuple[str, str]] = set()
+
+# Pure helpers shared with the async layer (async_db.py)
+
+def max_int_id(last: Optional[Mapping[str, Any]]) -> int:
+    """The highest integer _id, from the last document in _id order (0 if none)"""
+    return last["_id"] if last and isinstance(last["_id"], int) else 0
+
+def sync_update(max_id: int) -> Dict[str, Any]:
+    """Counter update raising seq to max_id; $max never moves it backwards, so concurrent syncs are safe"""
+    return {"$max": {"seq": max_id}}
+
+def reserve_update(count: int) -> Dict[str, Any]:
+    """Counter update reserving `count` IDs"""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    return {"$inc": {"seq": count}}
+
+def reserved_range(counter: Mapping[str, Any], count: int) -> Tuple[int, int]:
+    """Inclusive (first, last) range reserved by reserve_update, from the counter after it"""
+    return counter["seq"] - count + 1, counter["seq"]
+
+def sync_counter(db: Database, collection_name: str) -> int:
+    """Raise the counter of a collection to its current max _id"""
+    last = db[collection_name].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    counter = db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": collection_name},
+        sync_update(max_int_id(last)),
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _synced.add((db.name, collection_name))
+    return counter["seq"]
+
+def raise_counter(db: Database, collection_name: str, value: int) -> None:
+    """Move a counter to at least `value`, e.g. past the explicit IDs of a file before allocating others"""
+    db[COUNTERS_COLLECTION].update_one({"_id": collection_name}, sync_update(value), upsert=True)
+
+def sync_all_counters(db: Database, collection_names: Tuple[str, ...]) -> Dict[str, int]:
+    """Sync the counters of several collections (after inserts with explicit IDs)"""
+    return {name: sync_counter(db, name) for name in collection_names}
+
+def reserve_ids(db: Database, collection_name: str, count: int) -> Tuple[int, int]:
+    """Atomically reserve a block of IDs, returning the inclusive range (first, last)"""
+    update = reserve_update(count)
+    if (db.name, collection_name) not in _synced:
+        sync_counter(db, collection_name)
+
+    counter = db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": collection_name},
+        update,
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return reserved_range(counter, count)
+
+def get_next_id(db: Database, collection_name: str) -> int:
+    """Get next auto-increment ID for a collection"""
+    first, _ = reserve_ids(db, collection_name, 1)
+    return first
+
+class IdBlockAllocator:
+    """Hands out IDs locally from blocks reserved in the counters collection.
+
+    Each bulk loader or worker should own its allocator; IDs reserved but not
+    used are simply skipped, never reused.
+    """
+
+    def __init__(self, db: Database, collection_name: str, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        self.db = db
+        self.collection_name = collection_name
+        self.block_size = block_size
+        self._next = 1
+        self._last = 0
+
+    def next_id(self) -> int:
+        """Return the next ID, reserving a new block when the current one is exhausted"""
+        if self._next > self._last:
+            self._next, self._last = reserve_ids(self.db, self.collection_name, self.block_size)
+        value = self._next
+        self._next += 1
+        return value
+
+    def __iter__(self) -> Iterator[int]:
+        while True:
+            yield self.next_id()
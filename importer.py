@@ -0,0 +1,216 @@
+from pymongo import InsertOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import argparse
+import csv
+import json
+import sys
+import time
+from cache import invalidate_collection
+from database import get_database, close_database
+from ids import IdBlockAllocator, raise_counter, sync_counter
+from position_counts import apply_increments, ensure_position_counts, increments
+import roster_schema
+from search import with_search_keys
+from validation import FOREIGN_KEYS, VALIDATORS, ValidationError, parse_id
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+DUPLICATE_KEY_ERROR = 11000
+
+def read_csv(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (line number, row) from a CSV file with a header line"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+
+def read_jsonl(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (line number, object) from a JSON Lines file, skipping blank lines"""
+    with open(path, encoding="utf-8") as f:
+        for line_num, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_num, {"__erro__": f"JSON inválido: {e.msg}"}
+                continue
+            if not isinstance(row, dict):
+                row = {"__erro__": "JSON inválido: esperado um objeto por linha"}
+            yield line_num, row
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+def detect_format(path: str) -> str:
+    """Guess the file format from its extension"""
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most `size` items"""
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class ImportStats:
+    """Counters reported at the end of an import"""
+
+    def __init__(self) -> None:
+        self.lidos = 0
+        self.inseridos = 0
+        self.invalidos = 0
+        self.duplicados = 0
+        self.erros: List[str] = []
+
+    def add_error(self, message: str) -> None:
+        if len(self.erros) < MAX_REPORTED_ERRORS:
+            self.erros.append(message)
+
+def _missing_references(db: Database, collection_name: str, docs: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, set]:
+    """Return, per foreign key field, the referenced IDs of this batch that do not exist (None is not a reference)"""
+    missing = {}
+    for field, referenced in FOREIGN_KEYS.get(collection_name, {}).items():
+        wanted = {doc[field] for _, doc in docs if doc[field] is not None}
+        found = {d["_id"] for d in db[referenced].find({"_id": {"$in": list(wanted)}}, {"_id": 1})}
+        missing[field] = wanted - found
+    return missing
+
+def max_explicit_id(path: str, file_format: str) -> int:
+    """Highest valid _id (or id) given in the file, 0 if none"""
+    highest = 0
+    for _, row in READERS[file_format](path):
+        raw_id = row.get("_id", row.get("id"))
+        if raw_id in (None, ""):
+            continue
+        try:
+            highest = max(highest, parse_id(raw_id))
+        except ValidationError:
+            # Reported as invalid when the row is imported
+            pass
+    return highest
+
+def import_file(db: Database, collection_name: str, path: str, file_format: str,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> ImportStats:
+    """Stream a CSV/JSONL file into a collection using unordered bulk writes"""
+    if collection_name == "time_usuario_jogador" and roster_schema.EMBEDDED:
+        raise ValueError("ROSTER_SCHEMA=embutido: importe os vínculos no layout 'vinculo' e use migrate_rosters.py")
+    validate = VALIDATORS[collection_name]
+    # Allocated IDs must not collide with explicit ones later in the file:
+    # move the counter past them (and past the collection's max _id) first
+    sync_counter(db, collection_name)
+    raise_counter(db, collection_name, max_explicit_id(path, file_format))
+    ids = IdBlockAllocator(db, collection_name, block_size=batch_size)
+    stats = ImportStats()
+    explicit_ids = False
+    if collection_name == "jogador":
+        ensure_position_counts(db)
+
+    for rows in batched(READERS[file_format](path), batch_size):
+        docs: List[Tuple[int, Dict[str, Any]]] = []
+        for line_num, row in rows:
+            stats.lidos += 1
+            try:
+                if "__erro__" in row:
+                    raise ValidationError(row["__erro__"])
+                doc = validate(row)
+                raw_id = row.get("_id", row.get("id"))
+                if raw_id not in (None, ""):
+                    doc = {"_id": parse_id(raw_id), **doc}
+                    explicit_ids = True
+                else:
+                    doc = {"_id": ids.next_id(), **doc}
+                docs.append((line_num, doc))
+            except ValidationError as e:
+                stats.invalidos += 1
+                stats.add_error(f"linha {line_num}: {e}")
+
+        if not docs:
+            continue
+
+        missing = _missing_references(db, collection_name, docs)
+        if any(missing.values()):
+            valid_docs = []
+            for line_num, doc in docs:
+                broken = [f for f, ids_missing in missing.items() if doc[f] in ids_missing]
+                if broken:
+                    stats.invalidos += 1
+                    stats.add_error(f"linha {line_num}: {broken[0]} {doc[broken[0]]} não existe")
+                else:
+                    valid_docs.append((line_num, doc))
+            docs = valid_docs
+
+        if not docs:
+            continue
+
+        failed = set()
+        try:
+            result = db[collection_name].bulk_write(
+                [InsertOne(with_search_keys(collection_name, doc)) for _, doc in docs], ordered=False
+            )
+            stats.inseridos += result.inserted_count
+        except BulkWriteError as e:
+            stats.inseridos += e.details.get("nInserted", 0)
+            for error in e.details.get("writeErrors", []):
+                failed.add(error["index"])
+                line_num = docs[error["index"]][0]
+                if error.get("code") == DUPLICATE_KEY_ERROR:
+                    stats.duplicados += 1
+                    stats.add_error(f"linha {line_num}: registro duplicado")
+                else:
+                    stats.add_error(f"linha {line_num}: {error.get('errmsg')}")
+
+        if collection_name == "jogador":
+            apply_increments(db, increments(doc for i, (_, doc) in enumerate(docs) if i not in failed))
+
+    if explicit_ids:
+        sync_counter(db, collection_name)
+
+    invalidate_collection(collection_name)
+
+    return stats
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Importa dados em lote a partir de arquivos CSV ou JSONL")
+    parser.add_argument("colecao", choices=sorted(VALIDATORS), help="coleção de destino")
+    parser.add_argument("arquivo", help="caminho do arquivo CSV ou JSONL")
+    parser.add_argument("--formato", choices=sorted(READERS), help="formato do arquivo (padrão: pela extensão)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documentos por bulk_write")
+    args = parser.parse_args()
+
+    if args.batch_size < 1:
+        parser.error("--batch-size deve ser maior que zero")
+
+    print(f"=== Importando {args.arquivo} para {args.colecao} ===\n")
+
+    try:
+        started = time.perf_counter()
+        stats = import_file(get_database(), args.colecao, args.arquivo,
+                            args.formato or detect_format(args.arquivo), args.batch_size)
+        elapsed = time.perf_counter() - started
+
+        for erro in stats.erros:
+            print(f"✗ {erro}")
+        if stats.erros:
+            print()
+
+        print(f"Lidos: {stats.lidos}")
+        print(f"Inseridos: {stats.inseridos}")
+        print(f"Inválidos: {stats.invalidos}")
+        print(f"Duplicados: {stats.duplicados}")
+        print(f"\n✓ Importação concluída em {elapsed:.2f}s")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+from pymongo import ASCENDING
+from pymongo.database import Database
+from typing import Any, Dict, List, Optional, Tuple
+import sys
+from database import get_database, close_database
+
+# Declarative index manifest: every join ($lookup foreignField/localField),
+# filter and sort key the app and setup_database use.
+# Each entry: (collection, keys, options)
+INDEX_MANIFEST: List[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]] = [
+    # Unique constraints
+    ("usuario", [("email", ASCENDING)], {"unique": True}),
+    ("time_oficial", [("sigla", ASCENDING)], {"unique": True}),
+    ("time_usuario_jogador", [("time_usuario_id", ASCENDING), ("jogador_id", ASCENDING)], {"unique": True}),
+    # Idempotency keys of retried creates (writes.py); only documents that have one
+    *[
+        (name, [("chave_idempotencia", ASCENDING)],
+         {"unique": True, "partialFilterExpression": {"chave_idempotencia": {"$exists": True}}})
+        for name in ("usuario", "time_oficial", "jogador", "time_usuario")
+    ],
+
+    # Joins
+    ("time_usuario", [("usuario_id", ASCENDING)], {}),
+    ("time_oficial", [("nome_curto", ASCENDING)], {}),
+    ("time_usuario_jogador", [("jogador_id", ASCENDING)], {}),
+    # Embedded roster layout (roster_schema.py): teams that contain a player
+    ("time_usuario", [("jogador_ids", ASCENDING)], {"sparse": True}),
+    # Also serves the "time_id: None" filter and the position count group
+    ("jogador", [("time_id", ASCENDING), ("posicao", ASCENDING)], {}),
+
+    # Keyset pagination order of the listings (nome, _id)
+    ("usuario", [("nome", ASCENDING), ("_id", ASCENDING)], {}),
+    ("time_oficial", [("nome", ASCENDING), ("_id", ASCENDING)], {}),
+    ("jogador", [("nome", ASCENDING), ("_id", ASCENDING)], {}),
+    ("time_usuario", [("nome", ASCENDING), ("_id", ASCENDING)], {}),
+    ("time_usuario_elenco", [("nome", ASCENDING), ("_id", ASCENDING)], {}),
+
+    # Name search (search.py): folded whole name in result order, and the
+    # folded later words (multikey)
+    ("usuario", [("nome_busca", ASCENDING), ("_id", ASCENDING)], {}),
+    ("time_oficial", [("nome_busca", ASCENDING), ("_id", ASCENDING)], {}),
+    ("jogador", [("nome_busca", ASCENDING), ("_id", ASCENDING)], {}),
+    ("time_usuario", [("nome_busca", ASCENDING), ("_id", ASCENDING)], {}),
+    ("usuario", [("palavras_busca", ASCENDING)], {}),
+    ("time_oficial", [("palavras_busca", ASCENDING)], {}),
+    ("jogador", [("palavras_busca", ASCENDING)], {}),
+    ("time_usuario", [("palavras_busca", ASCENDING)], {})
+]
+
+STATUS_CREATED = "criado"
+STATUS_PRESENT = "existente"
+STATUS_CONFLICT = "conflito"
+
+def _key_tuple(keys: Any) -> Tuple[Tuple[str, Any], ...]:
+    """Normalize an index key spec (list of pairs or SON) for comparison"""
+    items = keys.items() if hasattr(keys, "items") else keys
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in items)
+
+def _plain(value: Any) -> Any:
+    """SON (as returned by index_information) to plain dicts, for comparison"""
+    if hasattr(value, "items"):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+def _same_options(info: Dict[str, Any], options: Dict[str, Any]) -> bool:
+    """Whether an existing index has the manifest's unique, sparse and partial filter options"""
+    return (bool(info.get("unique", False)) == bool(options.get("unique", False))
+            and bool(info.get("sparse", False)) == bool(options.get("sparse", False))
+            and _plain(info.get("partialFilterExpression")) == _plain(options.get("partialFilterExpression")))
+
+def _find_existing(existing: Dict[str, Any], keys: List[Tuple[str, int]],
+                   options: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+    """Find an existing index with the same key pattern, preferring one with the same options.
+
+    Several partial indexes may share a key pattern.
+    """
+    wanted = _key_tuple(keys)
+    found = [(name, info) for name, info in existing.items() if _key_tuple(info["key"]) == wanted]
+    for name, info in found:
+        if _same_options(info, options):
+            return name, info
+    return found[0] if found else None
+
+def apply_indexes(db: Database, collection_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Create every manifest index that is missing (idempotent); returns one report entry per index"""
+    report = []
+    existing_by_collection: Dict[str, Dict[str, Any]] = {}
+
+    for coll, keys, options in INDEX_MANIFEST:
+        if collection_name is not None and coll != collection_name:
+            continue
+
+        if coll not in existing_by_collection:
+            existing_by_collection[coll] = db[coll].index_information()
+        existing = existing_by_collection[coll]
+
+        found = _find_existing(existing, keys, options)
+        if found is None:
+            name = db[coll].create_index(keys, **options)
+            existing[name] = {"key": keys, **options}
+            status = STATUS_CREATED
+        else:
+            name, info = found
+            status = STATUS_PRESENT if _same_options(info, options) else STATUS_CONFLICT
+
+        report.append({"colecao": coll, "indice": name, "status": status})
+
+    return report
+
+def index_usage(db: Database) -> List[Dict[str, Any]]:
+    """Usage counters of every index on the manifest collections, via $indexStats"""
+    usage = []
+    manifest_keys = {(coll, _key_tuple(keys)) for coll, keys, _ in INDEX_MANIFEST}
+
+    for coll in sorted({coll for coll, _, _ in INDEX_MANIFEST}):
+        if coll not in db.list_collection_names(filter={"name": coll}):
+            continue
+        for stats in db[coll].aggregate([{"$indexStats": {}}]):
+            usage.append({
+                "colecao": coll,
+                "indice": stats["name"],
+                "ops": stats["accesses"]["ops"],
+                "desde": stats["accesses"]["since"],
+                "no_manifesto": stats["name"] == "_id_" or (coll, _key_tuple(stats["key"])) in manifest_keys
+            })
+
+    return usage
+
+def print_report(report: List[Dict[str, Any]], usage: List[Dict[str, Any]]) -> None:
+    """Print the migration report and the indexes that were never used"""
+    for entry in report:
+        symbol = "✗" if entry["status"] == STATUS_CONFLICT else "✓"
+        print(f"{symbol} {entry['colecao']}.{entry['indice']}: {entry['status']}")
+
+    conflicts = [e for e in report if e["status"] == STATUS_CONFLICT]
+    if conflicts:
+        print("\n✗ Índices com opções diferentes do manifesto precisam ser recriados manualmente")
+
+    unused = [u for u in usage if u["ops"] == 0 and u["indice"] != "_id_"]
+    print("\nÍndices sem uso (desde o último restart do servidor):")
+    if not unused:
+        print("  nenhum")
+    for u in unused:
+        origem = "" if u["no_manifesto"] else " (fora do manifesto)"
+        print(f"  {u['colecao']}.{u['indice']}{origem} - sem uso desde {u['desde']:%Y-%m-%d %H:%M}")
+
+def main() -> None:
+    """Main function"""
+    print("=== Aplicando manifesto de índices ===\n")
+
+    try:
+        db = get_database()
+        report = apply_indexes(db)
+        print_report(report, index_usage(db))
+        counts = {status: sum(1 for e in report if e["status"] == status)
+                  for status in (STATUS_CREATED, STATUS_PRESENT, STATUS_CONFLICT)}
+        print(f"\n✓ Migração concluída: {counts[STATUS_CREATED]} criado(s), "
+              f"{counts[STATUS_PRESENT]} já existente(s), {counts[STATUS_CONFLICT]} em conflito")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from collections import defaultdict
+from http.client import HTTPConnection, HTTPException
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from stats import summarize
+from table import print_table
+
+# Load test for api.py: N client threads, each on its own keep-alive
+# connection, issue a weighted mix of requests for a fixed duration.
+# Only needs the API URL (no MongoDB access from here).
+
+# path -> weight; /jogadores and /times-usuario stream whole listings
+DEFAULT_MIX = {
+    "/consultas/por-posicao": 4,
+    "/consultas/time-preferido?usuario_id=1": 4,
+    "/times-oficiais": 2,
+    "/jogadores": 1,
+    "/times-usuario": 1
+}
+
+def parse_mix(values: List[str]) -> Dict[str, int]:
+    """Turn ["/path=3", "/other"] into {"/path": 3, "/other": 1}"""
+    mix = {}
+    for value in values:
+        path, _, weight = value.partition("=")
+        mix[path] = int(weight) if weight else 1
+    return mix
+
+def worker(base_url: str, mix: Dict[str, int], deadline: float, seed: int,
+           results: Dict[str, List[float]], errors: Dict[str, int], lock: threading.Lock) -> None:
+    """Issue requests until the deadline, reading each response to the end"""
+    url = urlsplit(base_url)
+    rng = random.Random(seed)
+    paths, weights = list(mix), list(mix.values())
+    conn = HTTPConnection(url.hostname, url.port or 80, timeout=60)
+    local: Dict[str, List[float]] = defaultdict(list)
+    local_errors: Dict[str, int] = defaultdict(int)
+
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choices(paths, weights)[0]
+            started = time.perf_counter()
+            try:
+                conn.request("GET", url.path.rstrip("/") + path)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors[f"{path} HTTP {response.status}"] += 1
+                    continue
+            except (OSError, HTTPException) as e:
+                local_errors[f"{path} {type(e).__name__}"] += 1
+                conn.close()
+                conn = HTTPConnection(url.hostname, url.port or 80, timeout=60)
+                continue
+            local[path].append((time.perf_counter() - started) * 1000)
+    finally:
+        conn.close()
+
+    with lock:
+        for path, timings in local.items():
+            results[path].extend(timings)
+        for key, count in local_errors.items():
+            errors[key] += count
+
+def run(base_url: str, mix: Dict[str, int], concurrency: int, duration: float,
+        seed: int = 42) -> Tuple[Dict[str, Any], float]:
+    """Run the load test; returns (report, elapsed seconds)"""
+    results: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker, args=(base_url, mix, deadline, seed + i, results, errors, lock))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(timings) for timings in results.values())
+    report = {
+        "url": base_url,
+        "concorrencia": concurrency,
+        "duracao_s": round(elapsed, 3),
+        "requisicoes": total,
+        "req_por_s": round(total / elapsed, 1) if elapsed else 0.0,
+        "erros": dict(errors),
+        "geral": summarize([t for timings in results.values() for t in timings]),
+        "rotas": {path: summarize(timings) for path, timings in sorted(results.items())}
+    }
+    return report, elapsed
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Teste de carga da API HTTP (python api.py)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 16],
+                        help="clientes simultâneos; vários valores fazem uma rodada para cada")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por rodada")
+    parser.add_argument("--rota", action="append", default=[], metavar="CAMINHO[=PESO]",
+                        help="rota GET e peso na mistura (repetível); padrão: consultas e listagens")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.rota) if args.rota else DEFAULT_MIX
+    print(f"=== Teste de carga: {args.url} ===\n")
+
+    reports = []
+    rows = []
+    try:
+        for concurrency in args.concorrencia:
+            report, _ = run(args.url, mix, concurrency, args.duracao, args.seed)
+            reports.append(report)
+            geral = report["geral"]
+            rows.append((concurrency, report["requisicoes"], report["req_por_s"], geral.get("p50_ms", "-"),
+                         geral.get("p95_ms", "-"), geral.get("p99_ms", "-"), sum(report["erros"].values())))
+    except KeyboardInterrupt:
+        print("\nInterrompido.")
+
+    print_table(["Clientes", "Requisições", "Req/s", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Erros"], rows)
+    for report in reports:
+        for error, count in report["erros"].items():
+            print(f"  [{report['concorrencia']} clientes] {error}: {count}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"✓ Resultados salvos em {args.saida}")
+
+    if not reports or not any(report["requisicoes"] for report in reports):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from cache import invalidate_collection
+from database import get_database, get_pool_metrics, close_database, pool_metrics
+from loadtest_api import parse_mix
+from queries import time_preferido_pipeline, times_usuario_page
+import roster_schema
+import roster_view
+from stats import summarize
+from table import print_table
+from validation import ValidationError
+import writes
+from writes import write_metrics
+
+# Load generator for the roster write paths of app.py, straight against
+# MongoDB (no API in between): N threads sharing the app's client, or N
+# processes with one client each, run a weighted mix of operations for a
+# fixed duration. Reported per concurrency level: operations/s, latency
+# percentiles, DuplicateKeyError and retry counts, rejected adds, the
+# connection pool checkout wait and the retries of writes.py.
+#   python loadtest_db.py --concorrencia 1 8 32 --duracao 20 --limpar
+# Teams created by the run are named "Carga <run>-..."; --limpar removes them.
+
+# operation -> weight; reads keep the mix close to the interactive app
+DEFAULT_MIX = {
+    "criar_time_usuario": 1,
+    "adicionar_jogadores": 3,
+    "listar_times_usuario": 1,
+    "time_preferido": 1
+}
+
+# Attempts of an operation that failed with DuplicateKeyError (e.g. a
+# counter behind explicitly imported IDs); each retry takes a fresh ID
+DEFAULT_ATTEMPTS = 3
+
+@dataclass
+class LoadOptions:
+    run_id: str
+    usuario_ids: List[int]
+    jogador_ids: List[int]
+    time_usuario_ids: List[int]
+    jogadores_por_chamada: int = 3
+    # Chance of adding to the same (first) team instead of a random one
+    time_disputado: float = 0.0
+    tentativas: int = DEFAULT_ATTEMPTS
+
+@dataclass
+class WorkerResult:
+    """What one thread or process measured (plain types, so it can cross processes)"""
+    timings: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    erros: Dict[str, int] = field(default_factory=Counter)
+    duplicate_key: int = 0
+    retentativas: int = 0
+    desistencias: int = 0
+    rejeitadas: int = 0
+    jogadores_duplicados: int = 0
+    times_criados: List[int] = field(default_factory=list)
+    pool: Optional[Dict[str, Any]] = None
+    escritas: Optional[Dict[str, Any]] = None
+
+    def merge(self, other: "WorkerResult") -> None:
+        for name, timings in other.timings.items():
+            self.timings[name].extend(timings)
+        for key, count in other.erros.items():
+            self.erros[key] += count
+        self.duplicate_key += other.duplicate_key
+        self.retentativas += other.retentativas
+        self.desistencias += other.desistencias
+        self.rejeitadas += other.rejeitadas
+        self.jogadores_duplicados += other.jogadores_duplicados
+        self.times_criados.extend(other.times_criados)
+
+def _error_key(name: str, error: Exception) -> str:
+    code = getattr(error, "code", None)
+    return f"{name} {type(error).__name__}" + (f" {code}" if code is not None else "")
+
+def _operations(db: Database, options: LoadOptions, rng: random.Random, worker_id: int,
+                result: WorkerResult) -> Dict[str, Callable[[int], Any]]:
+    """operation name -> run(i)"""
+    times = list(options.time_usuario_ids)
+
+    def criar_time_usuario(i: int) -> Any:
+        time_usuario = writes.criar_time_usuario(db, {
+            "nome": f"Carga {options.run_id}-{worker_id}-{i}", "usuario_id": rng.choice(options.usuario_ids)
+        })
+        times.append(time_usuario["_id"])
+        result.times_criados.append(time_usuario["_id"])
+
+    def adicionar_jogadores(i: int) -> Any:
+        if not times:
+            criar_time_usuario(i)
+        if rng.random() < options.time_disputado:
+            time_usuario_id = times[0]
+        else:
+            time_usuario_id = rng.choice(times)
+        jogadores = rng.sample(options.jogador_ids, min(options.jogadores_por_chamada, len(options.jogador_ids)))
+        added = writes.adicionar_jogadores(db, time_usuario_id, jogadores)
+        result.jogadores_duplicados += len(added.duplicados)
+
+    def listar_times_usuario(i: int) -> Any:
+        list(times_usuario_page(db))
+
+    def time_preferido(i: int) -> Any:
+        # Straight to the server: the query cache would hide the read load
+        list(db.usuario.aggregate(time_preferido_pipeline(rng.choice(options.usuario_ids))))
+
+    return {
+        "criar_time_usuario": criar_time_usuario,
+        "adicionar_jogadores": adicionar_jogadores,
+        "listar_times_usuario": listar_times_usuario,
+        "time_preferido": time_preferido
+    }
+
+def worker(db: Database, mix: Dict[str, int], deadline: float, seed: int, worker_id: int,
+           options: LoadOptions) -> WorkerResult:
+    """Run operations from the mix until the deadline"""
+    rng = random.Random(seed)
+    result = WorkerResult()
+    runs = _operations(db, options, rng, worker_id, result)
+    names, weights = list(mix), list(mix.values())
+    i = 0
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        i += 1
+        started = time.perf_counter()
+        for attempt in range(options.tentativas):
+            try:
+                runs[name](i)
+            except DuplicateKeyError:
+                result.duplicate_key += 1
+                if attempt + 1 < options.tentativas:
+                    result.retentativas += 1
+                    continue
+                result.desistencias += 1
+                result.erros[f"{name} DuplicateKeyError"] += 1
+            except ValidationError:
+                # Business rule (e.g. roster full in the embedded layout), not a failure
+                result.rejeitadas += 1
+            except (OperationFailure, PyMongoError) as e:
+                result.erros[_error_key(name, e)] += 1
+            else:
+                result.timings[name].append((time.perf_counter() - started) * 1000)
+            break
+
+    return result
+
+def _process_worker(args: Tuple[Dict[str, int], float, int, int, LoadOptions]) -> WorkerResult:
+    """Worker in its own process: own client, own pool metrics"""
+    mix, duration, seed, worker_id, options = args
+    try:
+        db = get_database()
+        db.command("ping")
+        pool_metrics.reset()
+        write_metrics.reset()
+        result = worker(db, mix, time.perf_counter() + duration, seed, worker_id, options)
+        result.pool = get_pool_metrics()
+        result.escritas = write_metrics.stats()
+        result.timings = dict(result.timings)
+        result.erros = dict(result.erros)
+        return result
+    finally:
+        close_database()
+
+def _merge_pools(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Pool metrics of several processes: summed counters, weighted mean and max wait"""
+    attempts = sum(s["checkouts"] + s["checkout_failures"] for s in snapshots)
+    return {
+        "checkouts": sum(s["checkouts"] for s in snapshots),
+        "checkout_failures": sum(s["checkout_failures"] for s in snapshots),
+        "open_connections": sum(s["open_connections"] for s in snapshots),
+        "avg_wait_ms": round(sum(s["avg_wait_ms"] * (s["checkouts"] + s["checkout_failures"]) for s in snapshots)
+                             / attempts, 3) if attempts else 0.0,
+        "max_wait_ms": max((s["max_wait_ms"] for s in snapshots), default=0.0)
+    }
+
+def run(mix: Dict[str, int], concurrency: int, duration: float, options: LoadOptions,
+        processes: bool = False, seed: int = 42) -> Tuple[Dict[str, Any], WorkerResult]:
+    """One load level; returns (report, merged worker results)"""
+    total = WorkerResult()
+    started = time.perf_counter()
+
+    if processes:
+        # Children open their own clients; one inherited across fork is not safe
+        close_database()
+        with multiprocessing.Pool(concurrency) as pool:
+            results = pool.map(_process_worker, [(mix, duration, seed + i, i, options) for i in range(concurrency)])
+        for result in results:
+            total.merge(result)
+        pool_report = _merge_pools([r.pool for r in results if r.pool])
+        writes_report: Dict[str, Any] = Counter()
+        for result in results:
+            writes_report.update({k: v for k, v in (result.escritas or {}).items() if k != "orcamento_tokens"})
+        writes_report = dict(writes_report)
+    else:
+        db = get_database()
+        db.command("ping")
+        pool_metrics.reset()
+        write_metrics.reset()
+        deadline = time.perf_counter() + duration
+        results = []
+        lock = threading.Lock()
+
+        def target(i: int) -> None:
+            result = worker(db, mix, deadline, seed + i, i, options)
+            with lock:
+                results.append(result)
+
+        threads = [threading.Thread(target=target, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for result in results:
+            total.merge(result)
+        pool_report = get_pool_metrics()
+        writes_report = write_metrics.stats()
+    elapsed = time.perf_counter() - started
+
+    count = sum(len(timings) for timings in total.timings.values())
+    report = {
+        "concorrencia": concurrency,
+        "modo": "processos" if processes else "threads",
+        "roster_schema": roster_schema.ROSTER_SCHEMA,
+        "duracao_s": round(elapsed, 3),
+        "operacoes": count,
+        "ops_por_s": round(count / elapsed, 1) if elapsed else 0.0,
+        "duplicate_key": total.duplicate_key,
+        "retentativas": total.retentativas,
+        "desistencias": total.desistencias,
+        "rejeitadas": total.rejeitadas,
+        "jogadores_ja_no_elenco": total.jogadores_duplicados,
+        "erros": {key: n for key, n in total.erros.items() if n},
+        "pool": pool_report,
+        "escritas": writes_report,
+        "geral": summarize([t for timings in total.timings.values() for t in timings]),
+        "operacoes_detalhe": {name: summarize(timings) for name, timings in sorted(total.timings.items())}
+    }
+    return report, total
+
+def load_options(db: Database, run_id: str, args: argparse.Namespace) -> LoadOptions:
+    """IDs the workers draw from"""
+    usuario_ids = db.usuario.distinct("_id")
+    jogador_ids = db.jogador.distinct("_id")
+    if not usuario_ids or not jogador_ids:
+        raise ValueError("o banco precisa de usuários e jogadores (python setup_database.py ou synthetic_data.py)")
+    return LoadOptions(
+        run_id=run_id,
+        usuario_ids=usuario_ids,
+        jogador_ids=jogador_ids,
+        time_usuario_ids=db.time_usuario.distinct("_id"),
+        jogadores_por_chamada=args.jogadores_por_chamada,
+        time_disputado=args.time_disputado,
+        tentativas=args.tentativas
+    )
+
+def cleanup(db: Database, time_usuario_ids: List[int]) -> int:
+    """Remove the teams created by a run and their rosters"""
+    if not time_usuario_ids:
+        return 0
+    if not roster_schema.EMBEDDED:
+        db.time_usuario_jogador.delete_many({"time_usuario_id": {"$in": time_usuario_ids}})
+        invalidate_collection("time_usuario_jogador")
+    if roster_view.ENABLED:
+        db[roster_view.ROSTER_VIEW_COLLECTION].delete_many({"_id": {"$in": time_usuario_ids}})
+        invalidate_collection(roster_view.ROSTER_VIEW_COLLECTION)
+    deleted = db.time_usuario.delete_many({"_id": {"$in": time_usuario_ids}}).deleted_count
+    invalidate_collection("time_usuario")
+    return deleted
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Teste de carga das escritas de elenco direto no MongoDB")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 16],
+                        help="usuários simultâneos; vários valores fazem uma rodada para cada")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por rodada")
+    parser.add_argument("--processos", action="store_true", help="um processo (e um cliente) por usuário em vez de threads")
+    parser.add_argument("--operacao", action="append", default=[], metavar="NOME[=PESO]",
+                        help=f"operação e peso na mistura (repetível): {', '.join(DEFAULT_MIX)}")
+    parser.add_argument("--jogadores-por-chamada", type=int, default=3)
+    parser.add_argument("--time-disputado", type=float, default=0.0, metavar="FRACAO",
+                        help="fração das inclusões feitas no mesmo time (contenção em um documento)")
+    parser.add_argument("--tentativas", type=int, default=DEFAULT_ATTEMPTS, help="tentativas após DuplicateKeyError")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--limpar", action="store_true", help="remove os times criados ao final")
+    parser.add_argument("--saida", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.operacao) if args.operacao else DEFAULT_MIX
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"operação desconhecida: {', '.join(sorted(unknown))}")
+    if args.tentativas < 1 or min(args.concorrencia) < 1:
+        parser.error("--tentativas e --concorrencia devem ser maiores que zero")
+
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    print(f"=== Teste de carga das escritas de elenco ({'processos' if args.processos else 'threads'}, "
+          f"layout {roster_schema.ROSTER_SCHEMA}) ===\n")
+
+    reports = []
+    rows = []
+    created: List[int] = []
+    try:
+        options = load_options(get_database(), run_id, args)
+        for concurrency in args.concorrencia:
+            report, total = run(mix, concurrency, args.duracao, options, args.processos, args.seed)
+            created.extend(total.times_criados)
+            reports.append(report)
+            geral = report["geral"]
+            rows.append((concurrency, report["operacoes"], report["ops_por_s"], geral.get("p50_ms", "-"),
+                         geral.get("p95_ms", "-"), geral.get("p99_ms", "-"), report["duplicate_key"],
+                         report["retentativas"], sum(report["erros"].values()),
+                         report["pool"]["avg_wait_ms"], report["pool"]["max_wait_ms"]))
+    except KeyboardInterrupt:
+        print("\nInterrompido.")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+
+    print_table(["Usuários", "Operações", "Ops/s", "p50 (ms)", "p95 (ms)", "p99 (ms)", "DuplicateKey",
+                 "Retentativas", "Erros", "Espera pool média (ms)", "Espera pool máx. (ms)"], rows)
+    for report in reports:
+        detalhe = report["operacoes_detalhe"]
+        print(f"\n  [{report['concorrencia']} usuários] " + ", ".join(
+            f"{name}: {s['runs']} (p95 {s.get('p95_ms', '-')} ms)" for name, s in detalhe.items()
+        ))
+        escritas = report["escritas"]
+        print(f"    escritas: retentativas {escritas.get('retentativas', 0)}, desistências {escritas.get('desistencias', 0)}, "
+              f"sem orçamento {escritas.get('sem_orcamento', 0)}, reaplicadas {escritas.get('reaplicadas', 0)}")
+        if report["rejeitadas"] or report["jogadores_ja_no_elenco"]:
+            print(f"    rejeitadas: {report['rejeitadas']}, jogadores já no elenco: {report['jogadores_ja_no_elenco']}")
+        for error, count in report["erros"].items():
+            print(f"    {error}: {count}")
+
+    try:
+        if args.limpar and created:
+            print(f"\n✓ {cleanup(get_database(), created)} times de carga removidos")
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                json.dump(reports, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+            print(f"✓ Resultados salvos em {args.saida}")
+    finally:
+        close_database()
+
+    if not reports or not any(report["operacoes"] for report in reports):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
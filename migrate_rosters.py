@@ -0,0 +1,152 @@
+from pymongo.database import Database
+from typing import Any, Dict, List
+import argparse
+import sys
+import time
+from cache import invalidate_collection
+from database import get_database, close_database
+from ids import COUNTERS_COLLECTION, sync_counter
+from indexes import apply_indexes
+import roster_schema
+from roster_schema import MAX_ROSTER_SIZE, SCHEMA_EMBEDDED, SCHEMA_LINK
+import roster_view
+
+# Converts the rosters of an existing database between the two layouts of
+# roster_schema.py. Both directions run server-side ($merge / $out), so no
+# roster document passes through Python.
+
+def to_embedded_pipeline(snapshot: bool) -> List[Dict[str, Any]]:
+    """Aggregation on time_usuario_jogador that writes jogador_ids (and elenco) into time_usuario"""
+    group: Dict[str, Any] = {"_id": "$time_usuario_id", "jogador_ids": {"$addToSet": "$jogador_id"}}
+    pipeline: List[Dict[str, Any]] = []
+    if snapshot:
+        pipeline += [
+            {
+                "$lookup": {
+                    "from": "jogador",
+                    "localField": "jogador_id",
+                    "foreignField": "_id",
+                    "pipeline": [{"$project": {"_id": 1, "nome": 1, "posicao": 1}}],
+                    "as": "jogador"
+                }
+            },
+            {"$unwind": "$jogador"},
+            {"$sort": {"jogador.nome": 1}}
+        ]
+        group["elenco"] = {"$push": "$jogador"}
+
+    return pipeline + [
+        {"$group": group},
+        {
+            "$merge": {
+                "into": "time_usuario",
+                "on": "_id",
+                "whenMatched": "merge",
+                "whenNotMatched": "discard"
+            }
+        }
+    ]
+
+def to_link_pipeline() -> List[Dict[str, Any]]:
+    """Aggregation on time_usuario that rebuilds time_usuario_jogador with sequential _ids"""
+    return [
+        {"$match": {"jogador_ids.0": {"$exists": True}}},
+        {"$unwind": "$jogador_ids"},
+        {"$project": {"_id": 0, "time_usuario_id": "$_id", "jogador_id": "$jogador_ids"}},
+        {
+            "$setWindowFields": {
+                "sortBy": {"time_usuario_id": 1, "jogador_id": 1},
+                "output": {"_id": {"$documentNumber": {}}}
+            }
+        },
+        {"$out": "time_usuario_jogador"}
+    ]
+
+def migrate_to_embedded(db: Database, snapshot: bool = roster_schema.SNAPSHOT, keep_source: bool = False) -> Dict[str, int]:
+    """Copy the link collection into time_usuario.jogador_ids (and the elenco snapshot)"""
+    if db.time_usuario_jogador.estimated_document_count() == 0 and db.time_usuario.find_one({"jogador_ids.0": {"$exists": True}}, {"_id": 1}):
+        raise ValueError("time_usuario_jogador is empty and the rosters are already embedded")
+
+    db.time_usuario.update_many({}, {"$set": {"jogador_ids": []}, "$unset": {"elenco": ""}})
+    if snapshot:
+        db.time_usuario.update_many({}, {"$set": {"elenco": []}})
+
+    db.time_usuario_jogador.aggregate(to_embedded_pipeline(snapshot))
+
+    links = db.time_usuario_jogador.estimated_document_count()
+    if not keep_source:
+        db.time_usuario_jogador.drop()
+        db[COUNTERS_COLLECTION].delete_one({"_id": "time_usuario_jogador"})
+
+    apply_indexes(db, "time_usuario")
+    invalidate_collection("time_usuario")
+    invalidate_collection("time_usuario_jogador")
+    return {
+        "vinculos": links,
+        "times": db.time_usuario.count_documents({"jogador_ids.0": {"$exists": True}}),
+        "acima_do_limite": db.time_usuario.count_documents({f"jogador_ids.{MAX_ROSTER_SIZE}": {"$exists": True}})
+    }
+
+def migrate_to_link(db: Database, keep_source: bool = False) -> Dict[str, int]:
+    """Rebuild time_usuario_jogador from time_usuario.jogador_ids"""
+    # $out replaces the link collection, so never run it from teams that were not migrated
+    if not db.time_usuario.find_one({"jogador_ids": {"$exists": True}}, {"_id": 1}) and db.time_usuario_jogador.estimated_document_count():
+        raise ValueError("time_usuario has no jogador_ids: the rosters are already in time_usuario_jogador")
+
+    db.time_usuario.aggregate(to_link_pipeline())
+    sync_counter(db, "time_usuario_jogador")
+    apply_indexes(db, "time_usuario_jogador")
+
+    if not keep_source:
+        db.time_usuario.update_many({}, {"$unset": {"jogador_ids": "", "elenco": ""}})
+
+    invalidate_collection("time_usuario")
+    invalidate_collection("time_usuario_jogador")
+    return {
+        "vinculos": db.time_usuario_jogador.estimated_document_count(),
+        "times": len(db.time_usuario_jogador.distinct("time_usuario_id"))
+    }
+
+def migrate(db: Database, target: str, snapshot: bool = roster_schema.SNAPSHOT, keep_source: bool = False) -> Dict[str, int]:
+    """Convert the rosters of `db` to the `target` layout (SCHEMA_EMBEDDED or SCHEMA_LINK)"""
+    if target == SCHEMA_EMBEDDED:
+        counts = migrate_to_embedded(db, snapshot, keep_source)
+    elif target == SCHEMA_LINK:
+        counts = migrate_to_link(db, keep_source)
+    else:
+        raise ValueError(f"Unknown roster schema: {target}")
+
+    # The view is built with the layout this process runs with
+    if roster_view.ENABLED and target == roster_schema.ROSTER_SCHEMA:
+        roster_view.refresh_all_rosters(db)
+    return counts
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Converte os elencos entre a coleção de vínculos e o array embutido em time_usuario")
+    parser.add_argument("destino", choices=roster_schema.SCHEMAS, help="layout de destino")
+    parser.add_argument("--snapshot", action="store_true", default=roster_schema.SNAPSHOT,
+                        help="guarda nome e posição dos jogadores em time_usuario.elenco (layout embutido)")
+    parser.add_argument("--manter-origem", action="store_true",
+                        help="não remove os dados do layout de origem")
+    args = parser.parse_args()
+
+    print(f"=== Migrando elencos para o layout '{args.destino}' ===\n")
+
+    try:
+        started = time.perf_counter()
+        counts = migrate(get_database(), args.destino, args.snapshot, args.manter_origem)
+        elapsed = time.perf_counter() - started
+        print(f"✓ {counts['vinculos']} vínculos de {counts['times']} times migrados ({elapsed:.2f}s)")
+        if counts.get("acima_do_limite"):
+            print(f"  ⚠ {counts['acima_do_limite']} times têm mais de {MAX_ROSTER_SIZE} jogadores (ROSTER_MAX_SIZE)")
+        if roster_schema.ROSTER_SCHEMA != args.destino:
+            print(f"  Defina ROSTER_SCHEMA={args.destino} para que o aplicativo use o novo layout")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
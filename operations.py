@@ -0,0 +1,133 @@
+from pymongo.database import Database
+from typing import Any, Dict, List, Mapping, Optional
+from cache import invalidate_collection
+from ids import IDEMPOTENCY_FIELD, get_next_id
+from position_counts import apply_increments, ensure_position_counts, increments, move_increments
+import roster_schema
+import roster_view
+from rosters import RosterAddResult, adicionar_jogadores
+from search import NAME_KEY, WORDS_KEY, with_search_keys
+from validation import (
+    ValidationError, parse_time_id, required, validate_jogador, validate_time_oficial, validate_time_usuario,
+    validate_usuario
+)
+
+# Non-interactive write operations shared by the terminal menus, the async
+# layer and the batch tools. Each one validates its input, raises
+# ValidationError/DuplicateKeyError on failure and returns the stored document.
+# The creates take an optional idempotency key, stored with the document
+# (see writes.py for the retrying layer that uses it).
+
+__all__ = [
+    "RosterAddResult", "adicionar_jogadores", "cadastrar_usuario", "cadastrar_time_oficial",
+    "cadastrar_jogador", "transferir_jogador", "remover_jogador", "criar_time_usuario", "new_document",
+    "public_document"
+]
+
+# Stored with the documents but never shown to clients (API responses, CLI output)
+PRIVATE_FIELDS = ("senha", IDEMPOTENCY_FIELD, NAME_KEY, WORDS_KEY)
+
+def public_document(doc: Mapping[str, Any]) -> Dict[str, Any]:
+    """A returned document without PRIVATE_FIELDS"""
+    return {key: value for key, value in doc.items() if key not in PRIVATE_FIELDS}
+
+def new_document(collection_name: str, doc: Dict[str, Any], chave: Optional[str]) -> Dict[str, Any]:
+    """The document as inserted: with its search keys and idempotency key"""
+    doc = with_search_keys(collection_name, doc)
+    return {**doc, IDEMPOTENCY_FIELD: chave} if chave is not None else doc
+
+def cadastrar_usuario(db: Database, dados: Mapping[str, Any], chave: Optional[str] = None) -> Dict[str, Any]:
+    """Register a user"""
+    usuario = validate_usuario(dados)
+    usuario = new_document("usuario", {"_id": get_next_id(db, "usuario"), **usuario}, chave)
+    db.usuario.insert_one(usuario)
+    invalidate_collection("usuario")
+    return usuario
+
+def cadastrar_time_oficial(db: Database, dados: Mapping[str, Any], chave: Optional[str] = None) -> Dict[str, Any]:
+    """Register an official team"""
+    time_oficial = validate_time_oficial(dados)
+    time_oficial = new_document("time_oficial", {"_id": get_next_id(db, "time_oficial"), **time_oficial}, chave)
+    db.time_oficial.insert_one(time_oficial)
+    invalidate_collection("time_oficial")
+    return time_oficial
+
+def cadastrar_jogador(db: Database, dados: Mapping[str, Any], chave: Optional[str] = None) -> Dict[str, Any]:
+    """Register a player"""
+    jogador = validate_jogador(dados)
+    ensure_position_counts(db)
+    jogador = new_document("jogador", {"_id": get_next_id(db, "jogador"), **jogador}, chave)
+    db.jogador.insert_one(jogador)
+    apply_increments(db, increments([jogador]))
+    invalidate_collection("jogador")
+    return jogador
+
+def transferir_jogador(db: Database, jogador_id: int, dados: Mapping[str, Any]) -> Dict[str, Any]:
+    """Change a player's official team and/or position; returns the updated player"""
+    changes = {}
+    if "time_id" in dados:
+        changes["time_id"] = parse_time_id(dados["time_id"])
+    if "posicao" in dados:
+        changes["posicao"] = required(dados["posicao"], "Posição é obrigatória!")
+    if not changes:
+        raise ValidationError("Informe o novo time ou a nova posição!")
+    if changes.get("time_id") is not None and not db.time_oficial.find_one({"_id": changes["time_id"]}, {"_id": 1}):
+        raise ValidationError(f"Time oficial ID {changes['time_id']} não existe!")
+
+    ensure_position_counts(db)
+    # The previous values are needed to move the player between summary counts
+    jogador = db.jogador.find_one_and_update({"_id": jogador_id}, {"$set": changes})
+    if jogador is None:
+        raise ValidationError(f"Jogador ID {jogador_id} não existe!")
+
+    apply_increments(db, move_increments(jogador, changes))
+    if roster_schema.EMBEDDED and roster_schema.SNAPSHOT and "posicao" in changes:
+        db.time_usuario.update_many(
+            {"elenco._id": jogador_id},
+            {"$set": {"elenco.$[j].posicao": changes["posicao"]}},
+            array_filters=[{"j._id": jogador_id}]
+        )
+        invalidate_collection("time_usuario")
+    invalidate_collection("jogador")
+    if roster_view.ENABLED:
+        for time_usuario_id in _times_com_jogador(db, jogador_id):
+            roster_view.refresh_roster(db, time_usuario_id)
+    return {**jogador, **changes}
+
+def remover_jogador(db: Database, jogador_id: int) -> Dict[str, Any]:
+    """Delete a player and remove it from every user team; returns the deleted player"""
+    ensure_position_counts(db)
+    jogador = db.jogador.find_one_and_delete({"_id": jogador_id})
+    if jogador is None:
+        raise ValidationError(f"Jogador ID {jogador_id} não existe!")
+
+    apply_increments(db, increments([jogador], -1))
+    time_usuario_ids = _times_com_jogador(db, jogador_id)
+    if roster_schema.EMBEDDED:
+        db.time_usuario.update_many({"jogador_ids": jogador_id}, roster_schema.remove_player_update(jogador_id))
+        invalidate_collection("time_usuario")
+    else:
+        db.time_usuario_jogador.delete_many({"jogador_id": jogador_id})
+        invalidate_collection("time_usuario_jogador")
+    invalidate_collection("jogador")
+    for time_usuario_id in time_usuario_ids:
+        roster_view.refresh_roster_if_enabled(db, time_usuario_id)
+    return jogador
+
+def _times_com_jogador(db: Database, jogador_id: int) -> List[int]:
+    """IDs of the user teams whose roster contains a player"""
+    if roster_schema.EMBEDDED:
+        return db.time_usuario.distinct("_id", {"jogador_ids": jogador_id})
+    return db.time_usuario_jogador.distinct("time_usuario_id", {"jogador_id": jogador_id})
+
+def criar_time_usuario(db: Database, dados: Mapping[str, Any], chave: Optional[str] = None) -> Dict[str, Any]:
+    """Create a user team; the owner must exist"""
+    time_usuario = validate_time_usuario(dados)
+    if not db.usuario.find_one({"_id": time_usuario["usuario_id"]}, {"_id": 1}):
+        raise ValidationError(f"Usuário ID {time_usuario['usuario_id']} não existe!")
+
+    time_usuario = new_document("time_usuario", {"_id": get_next_id(db, "time_usuario"), **time_usuario}, chave)
+    db.time_usuario.insert_one(time_usuario)
+    invalidate_collection("time_usuario")
+    roster_view.refresh_roster_if_enabled(db, time_usuario["_id"])
+    return time_usuario
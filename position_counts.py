@@ -0,0 +1,137 @@
+from collections import Counter
+from pymongo import UpdateOne
+from pymongo.database import Database
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import sys
+import time
+from cache import invalidate_collection
+from database import get_database, close_database
+
+# Summary of how many players each official team has per position, keyed by
+# _id {time_id, posicao}. Every write to jogador adjusts it with $inc, so Q3
+# reads (teams x positions) documents instead of scanning every player.
+POSITION_COUNTS_COLLECTION = "jogador_posicao_contagem"
+
+# Databases whose summary is known to exist in this process
+_ensured: Set[str] = set()
+
+def count_key(time_id: Any, posicao: Any) -> Dict[str, Any]:
+    """_id of a summary document (field order matters for equality)"""
+    return {"time_id": time_id, "posicao": posicao}
+
+def increments(jogadores: Iterable[Mapping[str, Any]], delta: int = 1) -> List[UpdateOne]:
+    """$inc updates for inserting (delta=1) or deleting (delta=-1) the given players.
+
+    Players without an official team are not counted, as in Q3.
+    """
+    totals: Counter = Counter()
+    for jogador in jogadores:
+        if jogador.get("time_id") is not None:
+            totals[(jogador["time_id"], jogador.get("posicao"))] += delta
+    return [
+        UpdateOne({"_id": count_key(time_id, posicao)}, {"$inc": {"qtd": qtd}}, upsert=True)
+        for (time_id, posicao), qtd in totals.items() if qtd
+    ]
+
+def move_increments(jogador: Mapping[str, Any], changes: Mapping[str, Any]) -> List[UpdateOne]:
+    """$inc updates for changing a player's time_id and/or posicao"""
+    updated = {**jogador, **changes}
+    if (updated.get("time_id"), updated.get("posicao")) == (jogador.get("time_id"), jogador.get("posicao")):
+        return []
+    return increments([jogador], -1) + increments([updated], 1)
+
+def apply_increments(db: Database, updates: List[UpdateOne]) -> None:
+    """Write the $inc updates in one unordered round trip"""
+    if updates:
+        db[POSITION_COUNTS_COLLECTION].bulk_write(updates, ordered=False)
+        invalidate_collection(POSITION_COUNTS_COLLECTION)
+
+def rebuild_pipeline() -> List[Dict[str, Any]]:
+    """Aggregation on jogador that recomputes the whole summary"""
+    return [
+        {"$match": {"time_id": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": {"time_id": "$time_id", "posicao": "$posicao"},
+                "qtd": {"$sum": 1}
+            }
+        },
+        {"$out": POSITION_COUNTS_COLLECTION}
+    ]
+
+def rebuild_position_counts(db: Database) -> int:
+    """Recompute the summary from jogador (repair); $out swaps it in atomically"""
+    db.jogador.aggregate(rebuild_pipeline())
+    _ensured.add(db.name)
+    invalidate_collection(POSITION_COUNTS_COLLECTION)
+    return db[POSITION_COUNTS_COLLECTION].count_documents({})
+
+def recount_position(db: Database, time_id: Any, posicao: Any) -> None:
+    """Set one summary count from a fresh count of jogador.
+
+    Unlike an $inc it can be repeated, e.g. when a retried insert cannot tell
+    whether its increment was applied. A concurrent $inc on the same key
+    between the count and the $set can still be lost.
+    """
+    if time_id is None:
+        return
+    qtd = db.jogador.count_documents({"time_id": time_id, "posicao": posicao})
+    db[POSITION_COUNTS_COLLECTION].update_one({"_id": count_key(time_id, posicao)}, {"$set": {"qtd": qtd}}, upsert=True)
+    invalidate_collection(POSITION_COUNTS_COLLECTION)
+
+def ensure_position_counts(db: Database) -> None:
+    """Build the summary on first use, for databases created before it existed.
+
+    Must run before a player write: a rebuild afterwards would already count
+    the new player and the $inc would count it twice.
+    """
+    if db.name in _ensured:
+        return
+    if POSITION_COUNTS_COLLECTION not in db.list_collection_names(filter={"name": POSITION_COUNTS_COLLECTION}):
+        rebuild_position_counts(db)
+    _ensured.add(db.name)
+
+def verify_position_counts(db: Database) -> List[Tuple[Dict[str, Any], int, Optional[int]]]:
+    """Differences between the summary and a fresh count: [(key, expected, stored)]"""
+    expected = {
+        (doc["_id"]["time_id"], doc["_id"]["posicao"]): doc["qtd"]
+        for doc in db.jogador.aggregate(rebuild_pipeline()[:-1])
+    }
+    stored = {
+        (doc["_id"]["time_id"], doc["_id"]["posicao"]): doc["qtd"]
+        for doc in db[POSITION_COUNTS_COLLECTION].find({"qtd": {"$ne": 0}}, {"qtd": 1})
+    }
+    return [
+        (count_key(*key), expected.get(key, 0), stored.get(key))
+        for key in sorted(expected.keys() | stored.keys(), key=repr)
+        if expected.get(key, 0) != stored.get(key, 0)
+    ]
+
+def main() -> None:
+    """Main function"""
+    verificar = "--verificar" in sys.argv[1:]
+    print("=== Contagem de jogadores por posição ===\n")
+
+    try:
+        db = get_database()
+        if verificar:
+            diferencas = verify_position_counts(db)
+            for key, expected, stored in diferencas:
+                print(f"  time_id={key['time_id']} posicao={key['posicao']}: esperado {expected}, armazenado {stored}")
+            print(f"{'✗' if diferencas else '✓'} {len(diferencas)} divergência(s) em {POSITION_COUNTS_COLLECTION}")
+            if diferencas:
+                print("  Execute sem --verificar para reconstruir o resumo")
+            return
+
+        started = time.perf_counter()
+        total = rebuild_position_counts(db)
+        elapsed = time.perf_counter() - started
+        print(f"✓ {total} contagens reconstruídas em {POSITION_COUNTS_COLLECTION} ({elapsed:.2f}s)")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
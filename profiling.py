@@ -0,0 +1,253 @@
+from collections import deque
+from pymongo.monitoring import CommandFailedEvent, CommandListener, CommandStartedEvent, CommandSucceededEvent
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import json
+import os
+import sys
+import threading
+
+# How many operations the diagnostic screen keeps
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "200"))
+# Operations slower than this (ms) are written to the slow query log; unset disables it
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS")) if os.getenv("SLOW_QUERY_MS") else None
+# Slow query log file (JSON lines); stderr when unset
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG") or None
+
+# Upper bounds (ms) of the latency histogram exported to Prometheus
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Handshake and session housekeeping say nothing about the app's queries
+IGNORED_COMMANDS = frozenset({"hello", "ismaster", "isMaster", "endSessions", "saslStart", "saslContinue", "ping"})
+
+@dataclass
+class OperationRecord:
+    """One command sent to the server"""
+    inicio: str
+    comando: str
+    colecao: Optional[str]
+    duracao_ms: float
+    documentos: Optional[int]
+    formato: str
+    sucesso: bool
+    erro: Optional[str] = None
+
+def _collection(event: CommandStartedEvent) -> Optional[str]:
+    if event.command_name == "getMore":
+        return event.command.get("collection")
+    target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else None
+
+def _keys(spec: Any) -> str:
+    return ",".join(spec) if isinstance(spec, dict) else ""
+
+def pipeline_shape(pipeline: List[Dict[str, Any]]) -> str:
+    """Stage names of a pipeline, with the target and sub-pipeline of each $lookup.
+
+    Values are left out, so the same query with different parameters has the
+    same shape: [{"$match": {"_id": 3}}, {"$lookup": {"from": "jogador", ...}}]
+    becomes "$match{_id} > $lookup(jogador)".
+    """
+    stages = []
+    for stage in pipeline:
+        name = next(iter(stage), "?")
+        spec = stage.get(name)
+        if name == "$lookup" and isinstance(spec, dict):
+            inner = f": {pipeline_shape(spec['pipeline'])}" if spec.get("pipeline") else ""
+            stages.append(f"$lookup({spec.get('from')}{inner})")
+        elif name == "$match":
+            stages.append(f"$match{{{_keys(spec)}}}")
+        else:
+            stages.append(name)
+    return " > ".join(stages)
+
+def command_shape(event: CommandStartedEvent) -> str:
+    """Describe what a command does without its values"""
+    command = event.command
+    if event.command_name == "aggregate":
+        return pipeline_shape(command.get("pipeline", []))
+    if event.command_name in ("find", "count", "distinct", "delete", "findAndModify"):
+        parts = [f"filtro{{{_keys(command.get('filter', command.get('query')))}}}"]
+        if command.get("sort"):
+            parts.append(f"sort{{{_keys(command['sort'])}}}")
+        if command.get("limit"):
+            parts.append("limit")
+        return " ".join(parts)
+    if event.command_name in ("insert", "update"):
+        return f"{len(command.get('documents', command.get('updates', [])))} documento(s)"
+    return ""
+
+def _documents(reply: Dict[str, Any]) -> Optional[int]:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "n" in reply:
+        return reply["n"]
+    if "value" in reply:
+        return 0 if reply["value"] is None else 1
+    return None
+
+class CommandMetrics(CommandListener):
+    """Records every command the client issues: name, collection, duration,
+    documents returned and pipeline shape.
+
+    Keeps the last PROFILE_HISTORY operations for the diagnostic screen and
+    cumulative counters per (command, collection) for the exports.
+    """
+
+    def __init__(self, history: int = PROFILE_HISTORY, slow_ms: Optional[float] = SLOW_QUERY_MS,
+                 slow_log: Optional[str] = SLOW_QUERY_LOG) -> None:
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, Optional[str], str, str]] = {}
+        self._history: Deque[OperationRecord] = deque(maxlen=max(1, history))
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._history.clear()
+            self._totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def started(self, event: CommandStartedEvent) -> None:
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        started_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        info = (event.command_name, _collection(event), command_shape(event), started_at)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = info
+
+    def succeeded(self, event: CommandSucceededEvent) -> None:
+        self._finish(event, _documents(event.reply), None)
+
+    def failed(self, event: CommandFailedEvent) -> None:
+        self._finish(event, None, str(event.failure.get("errmsg", event.failure)))
+
+    def _finish(self, event: Any, documentos: Optional[int], erro: Optional[str]) -> None:
+        with self._lock:
+            info = self._pending.pop((event.connection_id, event.request_id), None)
+        if info is None:
+            return
+
+        comando, colecao, formato, inicio = info
+        record = OperationRecord(
+            inicio=inicio,
+            comando=comando,
+            colecao=colecao,
+            duracao_ms=event.duration_micros / 1000,
+            documentos=documentos,
+            formato=formato,
+            sucesso=erro is None,
+            erro=erro
+        )
+
+        with self._lock:
+            self._history.append(record)
+            totals = self._totals.setdefault((comando, colecao or ""), {
+                "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "documents": 0,
+                "buckets": [0] * len(LATENCY_BUCKETS_MS)
+            })
+            totals["count"] += 1
+            totals["errors"] += 0 if record.sucesso else 1
+            totals["total_ms"] += record.duracao_ms
+            totals["max_ms"] = max(totals["max_ms"], record.duracao_ms)
+            totals["documents"] += documentos or 0
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if record.duracao_ms <= bound:
+                    totals["buckets"][i] += 1
+
+        if self.slow_ms is not None and record.duracao_ms >= self.slow_ms:
+            self._log_slow(record)
+
+    def _log_slow(self, record: OperationRecord) -> None:
+        line = json.dumps(asdict(record), ensure_ascii=False)
+        if self.slow_log:
+            with self._lock, open(self.slow_log, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        else:
+            print(f"[consulta lenta] {line}", file=sys.stderr)
+
+    def last_operations(self, limit: Optional[int] = None) -> List[OperationRecord]:
+        """Most recent operations, newest first"""
+        with self._lock:
+            records = list(self._history)
+        records.reverse()
+        return records[:limit] if limit is not None else records
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Cumulative counters per (command, collection), slowest total first"""
+        with self._lock:
+            rows = [
+                {
+                    "comando": comando,
+                    "colecao": colecao,
+                    "count": t["count"],
+                    "errors": t["errors"],
+                    "total_ms": round(t["total_ms"], 3),
+                    "avg_ms": round(t["total_ms"] / t["count"], 3),
+                    "max_ms": round(t["max_ms"], 3),
+                    "documents": t["documents"],
+                    "buckets": list(t["buckets"])
+                }
+                for (comando, colecao), t in self._totals.items()
+            ]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def to_json(self) -> Dict[str, Any]:
+        """Summary and recent operations as a JSON-serializable dict"""
+        return {
+            "gerado_em": datetime.now(timezone.utc).isoformat(),
+            "resumo": self.summary(),
+            "operacoes": [asdict(record) for record in self.last_operations()]
+        }
+
+    def to_prometheus(self, extra: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """Cumulative counters in the Prometheus text exposition format.
+
+        `extra` maps a metric prefix to a flat dict of numbers (e.g. the pool
+        or cache snapshots), exported as gauges.
+        """
+        lines = [
+            "# HELP mongo_command_duration_ms Duração dos comandos enviados ao MongoDB",
+            "# TYPE mongo_command_duration_ms histogram"
+        ]
+        summary = self.summary()
+        for row in summary:
+            labels = f'command="{row["comando"]}",collection="{row["colecao"]}"'
+            for bound, count in zip(LATENCY_BUCKETS_MS, row["buckets"]):
+                lines.append(f'mongo_command_duration_ms_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'mongo_command_duration_ms_bucket{{{labels},le="+Inf"}} {row["count"]}')
+            lines.append(f"mongo_command_duration_ms_sum{{{labels}}} {row['total_ms']}")
+            lines.append(f"mongo_command_duration_ms_count{{{labels}}} {row['count']}")
+
+        for name, help_text, key in (
+            ("mongo_command_errors_total", "Comandos que falharam", "errors"),
+            ("mongo_command_documents_total", "Documentos retornados ou afetados", "documents")
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for row in summary:
+                lines.append(f'{name}{{command="{row["comando"]}",collection="{row["colecao"]}"}} {row[key]}')
+
+        for prefix, values in (extra or {}).items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str, extra: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """Write the metrics to `path`: Prometheus text for .prom/.txt, JSON otherwise"""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_prometheus(extra))
+            else:
+                data = self.to_json()
+                if extra:
+                    data.update(extra)
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+
+command_metrics = CommandMetrics()
@@ -0,0 +1,500 @@
+from pymongo import ASCENDING
+from pymongo.database import Database
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+from position_counts import POSITION_COUNTS_COLLECTION
+from entities import Jogador, TimeOficial, Usuario
+import roster_schema
+import roster_view
+from row_decoding import DECODE_DICT, DECODE_ROW, QUERY_DECODE, collection, projection
+
+# Rows per page on the listing screens
+PAGE_SIZE = int(os.getenv("APP_PAGE_SIZE", "50"))
+
+# Keyset order used by every paginated listing: name, then _id as tie-breaker
+NAME_ORDER = [("nome", ASCENDING), ("_id", ASCENDING)]
+
+PageKey = Tuple[Any, Any]
+
+# Fields each listing renders; the queries project exactly these (never senha)
+USUARIO_FIELDS = ("_id", "nome", "email", "sexo", "telefone", "data_nascimento", "time_preferido")
+TIME_OFICIAL_FIELDS = ("_id", "nome", "sigla")
+JOGADOR_FIELDS = ("_id", "nome", "posicao", "time_oficial")
+JOGADOR_SEM_TIME_FIELDS = ("_id", "nome", "posicao")
+TIME_USUARIO_FIELDS = ("_id", "nome", "dono", "jogadores")
+
+def keyset_after(after: Optional[PageKey], field: str = "nome") -> Dict[str, Any]:
+    """Filter selecting the documents that come after (value, _id) in (field, _id) order"""
+    if after is None:
+        return {}
+    value, last_id = after
+    return {"$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": last_id}}]}
+
+def name_key(doc: Dict[str, Any]) -> PageKey:
+    """Keyset position of a document in NAME_ORDER"""
+    return doc["nome"], doc["_id"]
+
+def id_key(doc: Dict[str, Any]) -> PageKey:
+    """Keyset position of a document ordered by _id only"""
+    return None, doc["_id"]
+
+def usuarios_page(db: Database, after: Optional[PageKey] = None, limit: int = PAGE_SIZE):
+    """One page of users ordered by name"""
+    return collection(db, "usuario", USUARIO_FIELDS, row_type=Usuario).find(
+        keyset_after(after), projection(USUARIO_FIELDS)
+    ).sort(NAME_ORDER).limit(limit)
+
+def times_oficiais_page(db: Database, after: Optional[PageKey] = None, limit: int = PAGE_SIZE):
+    """One page of official teams ordered by name"""
+    return collection(db, "time_oficial", TIME_OFICIAL_FIELDS, row_type=TimeOficial).find(
+        keyset_after(after), projection(TIME_OFICIAL_FIELDS)
+    ).sort(NAME_ORDER).limit(limit)
+
+def jogadores_page(db: Database, after: Optional[PageKey] = None, limit: int = PAGE_SIZE):
+    """One page of players with their official team; the $lookup only runs for the page"""
+    pipeline = [
+        {"$match": keyset_after(after)},
+        {"$sort": dict(NAME_ORDER)},
+        {"$limit": limit},
+        {
+            "$lookup": {
+                "from": "time_oficial",
+                "localField": "time_id",
+                "foreignField": "_id",
+                "as": "time"
+            }
+        },
+        {
+            "$unwind": {
+                "path": "$time",
+                "preserveNullAndEmptyArrays": True
+            }
+        },
+        {
+            "$project": {
+                "_id": 1,
+                "nome": 1,
+                "posicao": 1,
+                "time_oficial": {"$ifNull": ["$time.nome", None]}
+            }
+        }
+    ]
+    return collection(db, "jogador", JOGADOR_FIELDS, row_type=Jogador).aggregate(pipeline, batchSize=limit)
+
+def times_usuario_page(db: Database, after: Optional[PageKey] = None, limit: int = PAGE_SIZE):
+    """One page of user teams with embedded rosters, from the materialized view when enabled"""
+    # The rosters are nested documents, which slotted rows cannot hold
+    mode = DECODE_DICT if QUERY_DECODE == DECODE_ROW else QUERY_DECODE
+    if roster_view.ENABLED:
+        return collection(db, roster_view.ROSTER_VIEW_COLLECTION, TIME_USUARIO_FIELDS, mode).find(
+            keyset_after(after), projection(TIME_USUARIO_FIELDS)
+        ).sort(NAME_ORDER).limit(limit)
+
+    pipeline = [
+        {"$match": keyset_after(after)},
+        {"$sort": dict(NAME_ORDER)},
+        {"$limit": limit}
+    ] + roster_view.roster_stages()
+    return collection(db, "time_usuario", TIME_USUARIO_FIELDS, mode).aggregate(pipeline, batchSize=limit)
+
+def jogadores_sem_time_page(db: Database, after: Optional[PageKey] = None, limit: int = PAGE_SIZE):
+    """One page of players without an official team, ordered by _id"""
+    query: Dict[str, Any] = {"time_id": None}
+    if after is not None:
+        query["_id"] = {"$gt": after[1]}
+    return collection(db, "jogador", JOGADOR_SEM_TIME_FIELDS, row_type=Jogador).find(
+        query, projection(JOGADOR_SEM_TIME_FIELDS)
+    ).sort("_id", ASCENDING).limit(limit)
+
+class Page:
+    """Streams the rows of one page and records where the next page starts.
+
+    The page query is asked for one extra document, which is not rendered but
+    tells whether there is a next page without a count query.
+    """
+
+    def __init__(self, docs: Iterable[Dict[str, Any]], page_size: int,
+                 to_rows: Callable[[Dict[str, Any]], Iterable[Tuple[Any, ...]]],
+                 page_key: Callable[[Dict[str, Any]], PageKey]) -> None:
+        self._docs = docs
+        self._page_size = page_size
+        self._to_rows = to_rows
+        self._page_key = page_key
+        self.last_key: Optional[PageKey] = None
+        self.has_more = False
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        for i, doc in enumerate(self._docs):
+            if i == self._page_size:
+                self.has_more = True
+                break
+            self.last_key = self._page_key(doc)
+            yield from self._to_rows(doc)
+
+def iter_pages(fetch_page: Callable[..., Iterable[Dict[str, Any]]], db: Database,
+               to_rows: Callable[[Dict[str, Any]], Iterable[Tuple[Any, ...]]],
+               page_key: Callable[[Dict[str, Any]], PageKey] = name_key,
+               page_size: int = PAGE_SIZE) -> Iterator[Page]:
+    """Yield consecutive pages; consume each page's rows() before asking for the next one"""
+    after: Optional[PageKey] = None
+    while True:
+        page = Page(fetch_page(db, after, page_size + 1), page_size, to_rows, page_key)
+        yield page
+        if not page.has_more:
+            return
+        after = page.last_key
+
+def jogadores_com_time_pipeline() -> List[Dict[str, Any]]:
+    """Q1: every player with its official team name"""
+    return [
+        {
+            "$lookup": {
+                "from": "time_oficial",
+                "localField": "time_id",
+                "foreignField": "_id",
+                "as": "time"
+            }
+        },
+        {
+            "$unwind": {
+                "path": "$time",
+                "preserveNullAndEmptyArrays": True
+            }
+        },
+        {
+            "$project": {
+                "id": "$_id",
+                "nome": 1,
+                "posicao": 1,
+                "time_oficial": {"$ifNull": ["$time.nome", None]}
+            }
+        },
+        {
+            "$sort": {"time_oficial": 1, "nome": 1}
+        }
+    ]
+
+def times_usuario_jogadores_pipeline() -> List[Dict[str, Any]]:
+    """Q2: user teams with owner and players (teams without players are left out)"""
+    if roster_schema.EMBEDDED:
+        return [
+            {"$match": {"jogador_ids.0": {"$exists": True}}},
+            {
+                "$lookup": {
+                    "from": "usuario",
+                    "localField": "usuario_id",
+                    "foreignField": "_id",
+                    "as": "usuario"
+                }
+            },
+            {"$unwind": "$usuario"},
+            *roster_schema.embedded_roster_stages(),
+            {"$unwind": "$jogadores"},
+            {
+                "$project": {
+                    "time_usuario": "$nome",
+                    "dono": "$usuario.nome",
+                    "jogador": "$jogadores.nome",
+                    "posicao": "$jogadores.posicao"
+                }
+            },
+            {
+                "$sort": {"time_usuario": 1, "jogador": 1}
+            }
+        ]
+
+    return [
+        {
+            "$lookup": {
+                "from": "usuario",
+                "localField": "usuario_id",
+                "foreignField": "_id",
+                "as": "usuario"
+            }
+        },
+        {"$unwind": "$usuario"},
+        {
+            "$lookup": {
+                "from": "time_usuario_jogador",
+                "localField": "_id",
+                "foreignField": "time_usuario_id",
+                "as": "jogadores_rel"
+            }
+        },
+        {"$unwind": "$jogadores_rel"},
+        {
+            "$lookup": {
+                "from": "jogador",
+                "localField": "jogadores_rel.jogador_id",
+                "foreignField": "_id",
+                "as": "jogador"
+            }
+        },
+        {"$unwind": "$jogador"},
+        {
+            "$project": {
+                "time_usuario": "$nome",
+                "dono": "$usuario.nome",
+                "jogador": "$jogador.nome",
+                "posicao": "$jogador.posicao"
+            }
+        },
+        {
+            "$sort": {"time_usuario": 1, "jogador": 1}
+        }
+    ]
+
+def jogadores_por_posicao_pipeline() -> List[Dict[str, Any]]:
+    """Q3: number of players per position in each official team, scanning jogador
+    (the app reads the incremental summary instead, see position_counts.py)"""
+    return [
+        {
+            "$match": {"time_id": {"$ne": None}}
+        },
+        {
+            "$lookup": {
+                "from": "time_oficial",
+                "localField": "time_id",
+                "foreignField": "_id",
+                "as": "time"
+            }
+        },
+        {"$unwind": "$time"},
+        {
+            "$group": {
+                "_id": {
+                    "time_oficial": "$time.nome",
+                    "posicao": "$posicao"
+                },
+                "qtd": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "time_oficial": "$_id.time_oficial",
+                "posicao": "$_id.posicao",
+                "qtd": 1
+            }
+        },
+        {
+            "$sort": {"time_oficial": 1, "qtd": -1}
+        }
+    ]
+
+def jogadores_por_posicao_resumo_pipeline() -> List[Dict[str, Any]]:
+    """Q3 from the position counts summary (run on POSITION_COUNTS_COLLECTION): same rows, no jogador scan"""
+    return [
+        {"$match": {"qtd": {"$gt": 0}}},
+        {
+            "$lookup": {
+                "from": "time_oficial",
+                "localField": "_id.time_id",
+                "foreignField": "_id",
+                "as": "time"
+            }
+        },
+        {"$unwind": "$time"},
+        {
+            "$project": {
+                "_id": 0,
+                "time_oficial": "$time.nome",
+                "posicao": "$_id.posicao",
+                "qtd": 1
+            }
+        },
+        {
+            "$sort": {"time_oficial": 1, "qtd": -1}
+        }
+    ]
+
+def jogadores_sem_time_pipeline() -> List[Dict[str, Any]]:
+    """Q4: players without an official team"""
+    return [
+        {"$match": {"time_id": None}},
+        {"$project": {"_id": 1, "nome": 1, "posicao": 1}}
+    ]
+
+def time_preferido_pipeline_legacy() -> List[Dict[str, Any]]:
+    """Original Q5 plan: expands every roster row, then compares siglas with $expr.
+
+    Kept as the baseline for bench_time_preferido.py.
+    """
+    return [
+        {
+            "$lookup": {
+                "from": "time_usuario",
+                "localField": "_id",
+                "foreignField": "usuario_id",
+                "as": "times"
+            }
+        },
+        {"$unwind": "$times"},
+        {
+            "$lookup": {
+                "from": "time_usuario_jogador",
+                "localField": "times._id",
+                "foreignField": "time_usuario_id",
+                "as": "jogadores_rel"
+            }
+        },
+        {"$unwind": "$jogadores_rel"},
+        {
+            "$lookup": {
+                "from": "jogador",
+                "localField": "jogadores_rel.jogador_id",
+                "foreignField": "_id",
+                "as": "jogador"
+            }
+        },
+        {"$unwind": "$jogador"},
+        {
+            "$lookup": {
+                "from": "time_oficial",
+                "localField": "jogador.time_id",
+                "foreignField": "_id",
+                "as": "time_oficial"
+            }
+        },
+        {"$unwind": "$time_oficial"},
+        {
+            "$lookup": {
+                "from": "time_oficial",
+                "localField": "time_preferido",
+                "foreignField": "nome_curto",
+                "as": "time_preferido_obj"
+            }
+        },
+        {
+            "$unwind": {
+                "path": "$time_preferido_obj",
+                "preserveNullAndEmptyArrays": True
+            }
+        },
+        {
+            "$match": {
+                "$expr": {"$eq": ["$time_oficial.sigla", "$time_preferido_obj.sigla"]}
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "usuario": "$nome",
+                    "time_preferido": "$time_preferido"
+                },
+                "jogadores_do_time_preferido": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "usuario": "$_id.usuario",
+                "time_preferido": "$_id.time_preferido",
+                "jogadores_do_time_preferido": 1
+            }
+        }
+    ]
+
+def time_preferido_pipeline(usuario_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Count the roster players that belong to each user's favourite official team.
+
+    The favourite team is resolved once per user; since siglas are unique,
+    matching siglas is the same as jogador.time_id == favourite _id, so that
+    filter runs inside the jogador $lookup before anything is unwound.
+    For a single user a zero count is returned when none of the roster
+    players match; a user without a favourite team, or whose favourite does
+    not resolve to an official team (nome_curto), gets no row. For all users
+    only users with at least one match are listed (as the original query did).
+    Requires MongoDB 5.0+ ($lookup with localField and pipeline).
+    """
+    match: Dict[str, Any] = {"time_preferido": {"$ne": None}}
+    if usuario_id is not None:
+        match["_id"] = usuario_id
+
+    # Embedded rosters: the team already holds the player IDs, one $lookup less
+    roster_count_stage = {
+        "$lookup": {
+            "from": "jogador",
+            "localField": "times.jogador_ids",
+            "foreignField": "_id",
+            "let": {"time_id": "$preferido._id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$time_id", "$$time_id"]}}},
+                {"$count": "qtd"}
+            ],
+            "as": "contagem"
+        }
+    }
+
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": match},
+        {
+            "$lookup": {
+                "from": "time_oficial",
+                "localField": "time_preferido",
+                "foreignField": "nome_curto",
+                "pipeline": [{"$project": {"_id": 1}}],
+                "as": "preferido"
+            }
+        },
+        {"$unwind": "$preferido"},
+        {
+            "$lookup": {
+                "from": "time_usuario",
+                "localField": "_id",
+                "foreignField": "usuario_id",
+                "pipeline": [{"$project": {"_id": 1, "jogador_ids": 1}}],
+                "as": "times"
+            }
+        },
+        {"$unwind": {"path": "$times", "preserveNullAndEmptyArrays": True}},
+        roster_count_stage if roster_schema.EMBEDDED else {
+            "$lookup": {
+                "from": "time_usuario_jogador",
+                "localField": "times._id",
+                "foreignField": "time_usuario_id",
+                "let": {"time_id": "$preferido._id"},
+                "pipeline": [
+                    {
+                        "$lookup": {
+                            "from": "jogador",
+                            "localField": "jogador_id",
+                            "foreignField": "_id",
+                            "pipeline": [
+                                {"$match": {"$expr": {"$eq": ["$time_id", "$$time_id"]}}},
+                                {"$project": {"_id": 1}}
+                            ],
+                            "as": "jogador"
+                        }
+                    },
+                    {"$match": {"jogador": {"$ne": []}}},
+                    {"$count": "qtd"}
+                ],
+                "as": "contagem"
+            }
+        },
+        {
+            "$group": {
+                "_id": "$_id",
+                "usuario": {"$first": "$nome"},
+                "time_preferido": {"$first": "$time_preferido"},
+                "jogadores_do_time_preferido": {"$sum": {"$sum": "$contagem.qtd"}}
+            }
+        }
+    ]
+
+    if usuario_id is None:
+        pipeline.append({"$match": {"jogadores_do_time_preferido": {"$gt": 0}}})
+
+    return pipeline
+
+# Independent report queries (setup_database Q1-Q5 plus the full listings):
+# name -> (collection, pipeline builder). Used by the async runner and the benchmarks.
+REPORT_QUERIES: Dict[str, Tuple[str, Callable[[], List[Dict[str, Any]]]]] = {
+    "Q1": ("jogador", jogadores_com_time_pipeline),
+    "Q2": ("time_usuario", times_usuario_jogadores_pipeline),
+    "Q3": (POSITION_COUNTS_COLLECTION, jogadores_por_posicao_resumo_pipeline),
+    "Q4": ("jogador", jogadores_sem_time_pipeline),
+    "Q5": ("usuario", time_preferido_pipeline),
+    "listar_usuarios": ("usuario", lambda: [{"$sort": dict(NAME_ORDER)}, {"$project": projection(USUARIO_FIELDS)}]),
+    "listar_times_oficiais": ("time_oficial", lambda: [{"$sort": dict(NAME_ORDER)}, {"$project": projection(TIME_OFICIAL_FIELDS)}]),
+    "listar_times_usuario": ("time_usuario", lambda: [{"$sort": dict(NAME_ORDER)}] + roster_view.roster_stages())
+}
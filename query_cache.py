@@ -0,0 +1,100 @@
+from bson import encode
+from pymongo.database import Database
+from typing import Any, Dict, Iterable, List, Set
+import hashlib
+import os
+import threading
+from cache import LRUCache, add_invalidation_listener
+from position_counts import POSITION_COUNTS_COLLECTION
+from roster_view import ROSTER_VIEW_COLLECTION
+
+# Results of read-only aggregations, keyed by a hash of (database, collection,
+# pipeline). Each entry depends on the collection the pipeline runs on and on
+# every collection it joins ($lookup, $graphLookup, $unionWith), and is dropped
+# by cache.invalidate_collection, i.e. by the app's own write paths and by the
+# optional change stream watcher (CACHE_CHANGE_STREAM=1). The TTL bounds how
+# stale a result can be when another process writes without a change stream.
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE", "1").lower() in ("1", "true", "sim")
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+# Memory budget, measured as the BSON size of the cached documents
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Collections the change stream watcher must follow for the cached queries
+WATCHED_COLLECTIONS = (
+    "usuario", "time_oficial", "jogador", "time_usuario", "time_usuario_jogador",
+    POSITION_COUNTS_COLLECTION, ROSTER_VIEW_COLLECTION
+)
+
+# Stages that write; their pipelines are never cached
+WRITE_STAGES = ("$out", "$merge")
+
+def pipeline_key(db_name: str, collection_name: str, pipeline: List[Dict[str, Any]]) -> str:
+    """Stable hash of a query: the BSON encoding keeps types and key order"""
+    return hashlib.sha256(encode({"db": db_name, "coll": collection_name, "pipeline": pipeline})).hexdigest()
+
+def pipeline_dependencies(collection_name: str, pipeline: Iterable[Dict[str, Any]]) -> Set[str]:
+    """Collections read by a pipeline, including joins inside sub-pipelines and $facet"""
+    deps = {collection_name}
+    for stage in pipeline:
+        for op, spec in stage.items():
+            if op in WRITE_STAGES:
+                raise ValueError(f"pipelines with {op} cannot be cached")
+            if op in ("$lookup", "$graphLookup"):
+                if spec.get("from"):
+                    deps.add(spec["from"])
+                deps |= pipeline_dependencies(spec.get("from", collection_name), spec.get("pipeline", []))
+            elif op == "$unionWith":
+                coll = spec if isinstance(spec, str) else spec.get("coll", collection_name)
+                deps.add(coll)
+                if isinstance(spec, dict):
+                    deps |= pipeline_dependencies(coll, spec.get("pipeline", []))
+            elif op == "$facet":
+                for sub_pipeline in spec.values():
+                    deps |= pipeline_dependencies(collection_name, sub_pipeline)
+    return deps
+
+def result_size(docs: List[Dict[str, Any]]) -> int:
+    """Bytes charged to the memory budget for a result"""
+    return sum(len(encode(doc)) for doc in docs)
+
+query_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_MAX_BYTES)
+
+# Invalidations per collection, so a result computed while one of its
+# collections was being written is not stored after the invalidation ran
+_generations: Dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+def _generation_snapshot(deps: Set[str]) -> Dict[str, int]:
+    with _generations_lock:
+        return {name: _generations.get(name, 0) for name in deps}
+
+def _invalidate(collection_name: str) -> None:
+    # Bump first: a reader that sees the old generation after the entries
+    # were dropped would store a result computed before the write
+    with _generations_lock:
+        _generations[collection_name] = _generations.get(collection_name, 0) + 1
+    query_cache.invalidate(collection_name)
+
+add_invalidation_listener(_invalidate)
+
+def cached_aggregate(db: Database, collection_name: str, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """All documents of an aggregation, from the cache when nothing it reads has changed.
+
+    The returned list is shared with later callers and must not be modified.
+    """
+    if not QUERY_CACHE_ENABLED:
+        return list(db[collection_name].aggregate(pipeline))
+
+    deps = pipeline_dependencies(collection_name, pipeline)
+    key = pipeline_key(db.name, collection_name, pipeline)
+    found, docs = query_cache.get(key)
+    if found:
+        return docs
+
+    before = _generation_snapshot(deps)
+    docs = list(db[collection_name].aggregate(pipeline))
+    # Compared under the cache lock: an invalidation either bumped a
+    # generation before the check or drops the entry after the store
+    query_cache.put(key, docs, deps, result_size(docs), lambda: _generation_snapshot(deps) == before)
+    return docs
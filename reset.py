@@ -1,40 +1,37 @@
-from pymongo import MongoClient
+from concurrent.futures import ThreadPoolExecutor
 from pymongo.database import Database
-import sys
+from typing import Any, Callable, Dict, Iterable, List
+import argparse
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-MONGODB_URI = os.getenv("MONGODB_URI")
-if not MONGODB_URI:
-    raise ValueError("MONGODB_URI environment variable is not set")
-
-# Global variables for connection management
-_client: MongoClient = None
-_database: Database = None
-
-def get_database() -> Database:
-    """Get MongoDB database (singleton pattern)"""
-    global _client, _database
-
-    if _database is None:
-        _client = MongoClient(MONGODB_URI)
-        db_name = MONGODB_URI.split("/")[-1].split("?")[0]
-        if not db_name or db_name == "":
-            db_name = "futebol_app"
-        _database = _client[db_name]
-
-    return _database
-
-def close_database() -> None:
-    """Close MongoDB connection"""
-    global _client, _database
-
-    if _client is not None:
-        _client.close()
-        _client = None
-        _database = None
+import sys
+import time
+from cache import invalidate_collection
+from database import get_client, get_database, close_database
+from ids import COUNTERS_COLLECTION
+from indexes import apply_indexes
+from position_counts import POSITION_COUNTS_COLLECTION
+from roster_view import ROSTER_VIEW_COLLECTION
+from setup_database import APP_COLLECTIONS, create_collections, finish_test_data, insert_test_documents, load_test_data
+from stats import summarize
+from table import print_table
+
+# Without options this script only drops the collections (the original
+# behaviour). The reset modes below leave the database with the test data of
+# setup_database.py again:
+#   drop    - the original cycle: drop, create and fill each collection serially
+#   truncar - delete_many({}) on each collection, keeping it and its indexes,
+#             and re-insert the test data; one thread per collection
+#   modelo  - copy each collection from a template database with $out
+#             (MongoDB 4.4+); build the template once with --criar-modelo
+MODE_DROP = "drop"
+MODE_TRUNCATE = "truncar"
+MODE_TEMPLATE = "modelo"
+MODES = (MODE_DROP, MODE_TRUNCATE, MODE_TEMPLATE)
+
+ALL_COLLECTIONS = APP_COLLECTIONS + (COUNTERS_COLLECTION, ROSTER_VIEW_COLLECTION, POSITION_COUNTS_COLLECTION)
+
+RESET_WORKERS = int(os.getenv("RESET_WORKERS", str(len(ALL_COLLECTIONS))))
+TEMPLATE_DB_NAME = os.getenv("RESET_TEMPLATE_DB", "")
 
 def drop_all_collections() -> None:
     """Drop all collections from the database"""
@@ -58,16 +55,172 @@ def drop_all_collections() -> None:
         db.usuario.drop()
         print("✓ Coleção usuario dropada")
 
+        db[COUNTERS_COLLECTION].drop()
+        print(f"✓ Coleção {COUNTERS_COLLECTION} dropada")
+
+        db[ROSTER_VIEW_COLLECTION].drop()
+        print(f"✓ Coleção {ROSTER_VIEW_COLLECTION} dropada")
+
+        db[POSITION_COUNTS_COLLECTION].drop()
+        print(f"✓ Coleção {POSITION_COUNTS_COLLECTION} dropada")
+
         print("\n✓ Todas as coleções foram dropadas com sucesso!")
 
     except Exception as e:
         print(f"\n✗ Erro ao dropar coleções: {e}")
         raise
 
+def template_database(db: Database) -> Database:
+    """Template database of `db` (RESET_TEMPLATE_DB or <banco>_modelo)"""
+    name = TEMPLATE_DB_NAME or f"{db.name}_modelo"
+    if name == db.name:
+        raise ValueError("the template database must not be the database being reset")
+    return get_client()[name]
+
+def run_per_collection(work: Callable[[str], Any], names: Iterable[str], workers: int = RESET_WORKERS) -> Dict[str, float]:
+    """Run work(name) for each collection in its own thread; returns the ms spent on each"""
+    def timed(name: str) -> float:
+        started = time.perf_counter()
+        work(name)
+        return (time.perf_counter() - started) * 1000
+
+    names = list(names)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="reset") as executor:
+        futures = {name: executor.submit(timed, name) for name in names}
+        # result() re-raises the first failure of a collection
+        return {name: future.result() for name, future in futures.items()}
+
+def reset_drop(db: Database) -> Dict[str, float]:
+    """The setup_database.py cycle: drop, create, index and fill every collection serially"""
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    create_collections(db)
+    timings["criar"] = (time.perf_counter() - started) * 1000
+
+    for name in APP_COLLECTIONS:
+        started = time.perf_counter()
+        insert_test_documents(db, name)
+        timings[name] = (time.perf_counter() - started) * 1000
+    return timings
+
+def reset_truncate(db: Database, workers: int = RESET_WORKERS) -> Dict[str, float]:
+    """Empty every collection in parallel and re-insert the test data; indexes are kept"""
+    def truncate(name: str) -> None:
+        db[name].delete_many({})
+        insert_test_documents(db, name)
+
+    timings = run_per_collection(truncate, ALL_COLLECTIONS, workers)
+
+    # No-op once the indexes exist; recreates the link collection after an embedded migration
+    started = time.perf_counter()
+    apply_indexes(db)
+    timings["indices"] = (time.perf_counter() - started) * 1000
+    return timings
+
+def reset_from_template(db: Database, workers: int = RESET_WORKERS) -> Dict[str, float]:
+    """Replace every collection with its copy in the template database.
+
+    $out into an existing collection keeps that collection's indexes, so
+    only the first copy has to build them.
+    """
+    template = template_database(db)
+    available = set(template.list_collection_names())
+    if not available.intersection(APP_COLLECTIONS):
+        raise ValueError(f"template database '{template.name}' is empty (run python reset.py --criar-modelo)")
+
+    def copy(name: str) -> None:
+        if name in available:
+            template[name].aggregate([{"$out": {"db": db.name, "coll": name}}])
+        else:
+            db[name].drop()
+
+    timings = run_per_collection(copy, ALL_COLLECTIONS, workers)
+
+    started = time.perf_counter()
+    apply_indexes(db)
+    timings["indices"] = (time.perf_counter() - started) * 1000
+    return timings
+
+def build_template(db: Database) -> Database:
+    """Create the template database of `db` with the test data"""
+    template = template_database(db)
+    create_collections(template)
+    load_test_data(template)
+    return template
+
+def reset(db: Database, mode: str, workers: int = RESET_WORKERS) -> Dict[str, float]:
+    """Reset `db` to the test data with the given mode; returns ms per step plus "total" """
+    started = time.perf_counter()
+    if mode == MODE_DROP:
+        timings = reset_drop(db)
+    elif mode == MODE_TRUNCATE:
+        timings = reset_truncate(db, workers)
+    elif mode == MODE_TEMPLATE:
+        timings = reset_from_template(db, workers)
+    else:
+        raise ValueError(f"Unknown reset mode: {mode}")
+
+    # The template already holds the derived data; the other modes rebuild it
+    if mode != MODE_TEMPLATE:
+        step = time.perf_counter()
+        finish_test_data(db)
+        timings["derivados"] = (time.perf_counter() - step) * 1000
+
+    for name in ALL_COLLECTIONS:
+        invalidate_collection(name)
+    timings["total"] = (time.perf_counter() - started) * 1000
+    return timings
+
+def compare_modes(db: Database, modes: List[str], repeat: int, workers: int = RESET_WORKERS) -> Dict[str, Dict[str, Any]]:
+    """Run each mode `repeat` times and summarize the total times"""
+    results = {}
+    for mode in modes:
+        totals = [reset(db, mode, workers)["total"] for _ in range(repeat)]
+        results[mode] = summarize(totals)
+    return results
+
 def main() -> None:
     """Main function"""
+    parser = argparse.ArgumentParser(description="Limpa o banco ou o restaura rapidamente com os dados de teste")
+    parser.add_argument("--modo", choices=MODES,
+                        help="restaura os dados de teste; sem esta opção as coleções são apenas dropadas")
+    parser.add_argument("--criar-modelo", action="store_true",
+                        help="cria o banco modelo (<banco>_modelo ou RESET_TEMPLATE_DB) usado pelo modo 'modelo'")
+    parser.add_argument("--comparar", action="store_true",
+                        help="mede o modo escolhido contra o ciclo drop/create atual")
+    parser.add_argument("--repetir", type=int, default=1, help="execuções de cada modo com --comparar")
+    parser.add_argument("--workers", type=int, default=RESET_WORKERS, help="threads, uma coleção por thread")
+    args = parser.parse_args()
+
     try:
-        drop_all_collections()
+        if args.modo is None and not args.criar_modelo:
+            drop_all_collections()
+            return
+
+        db = get_database()
+        if args.criar_modelo:
+            template = build_template(db)
+            print(f"✓ Banco modelo '{template.name}' criado")
+        if args.modo is None:
+            return
+
+        if args.comparar:
+            modes = [MODE_DROP] + ([args.modo] if args.modo != MODE_DROP else [])
+            print(f"=== Comparando modos de reset ({args.repetir} execuções cada) ===\n")
+            results = compare_modes(db, modes, max(1, args.repetir), args.workers)
+            baseline = results[MODE_DROP]["p50_ms"]
+            print_table(
+                ["Modo", "p50 (ms)", "mín (ms)", "máx (ms)", "Ganho"],
+                [(mode, r["p50_ms"], r["min_ms"], r["max_ms"], f"{baseline / r['p50_ms']:.1f}x" if r["p50_ms"] else "-")
+                 for mode, r in results.items()]
+            )
+        else:
+            print(f"=== Reset no modo '{args.modo}' ===\n")
+            timings = reset(db, args.modo, args.workers)
+            print_table(["Etapa", "Tempo (ms)"], [(step, round(ms, 1)) for step, ms in timings.items()])
+
+        print("\n✓ Banco restaurado com os dados de teste")
+
     except Exception as e:
         print(f"\n✗ Erro fatal: {e}")
         sys.exit(1)
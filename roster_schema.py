@@ -0,0 +1,71 @@
+from typing import Any, Dict, List
+import os
+
+# How user team rosters are stored:
+#   "vinculo"  - one time_usuario_jogador document per (team, player), as in script.sql
+#   "embutido" - time_usuario.jogador_ids holds the player IDs (bounded, written with
+#                $addToSet); with ROSTER_SNAPSHOT=1, time_usuario.elenco also keeps a
+#                {_id, nome, posicao} copy of each player sorted by name
+# migrate_rosters.py converts an existing database between the two layouts.
+SCHEMA_LINK = "vinculo"
+SCHEMA_EMBEDDED = "embutido"
+SCHEMAS = (SCHEMA_LINK, SCHEMA_EMBEDDED)
+
+ROSTER_SCHEMA = os.getenv("ROSTER_SCHEMA", SCHEMA_LINK).lower()
+if ROSTER_SCHEMA not in SCHEMAS:
+    raise ValueError(f"ROSTER_SCHEMA must be one of {', '.join(SCHEMAS)}")
+
+EMBEDDED = ROSTER_SCHEMA == SCHEMA_EMBEDDED
+SNAPSHOT = os.getenv("ROSTER_SNAPSHOT", "0").lower() in ("1", "true", "sim")
+# Upper bound of jogador_ids, so a team document cannot grow without limit
+MAX_ROSTER_SIZE = int(os.getenv("ROSTER_MAX_SIZE", "30"))
+
+def player_snapshot(jogador: Dict[str, Any]) -> Dict[str, Any]:
+    """Denormalized copy of a player kept in time_usuario.elenco"""
+    return {"_id": jogador["_id"], "nome": jogador.get("nome"), "posicao": jogador.get("posicao")}
+
+def add_players_filter(time_usuario_id: int, jogador_ids: List[int], max_size: int = MAX_ROSTER_SIZE) -> Dict[str, Any]:
+    """Match the team only if none of the players is in it yet and they all fit.
+
+    `jogador_ids.<n>` exists only when the array has more than n elements, so
+    the size check needs no $expr and the whole write stays a single update.
+    """
+    return {
+        "_id": time_usuario_id,
+        "jogador_ids": {"$nin": jogador_ids},
+        f"jogador_ids.{max_size - len(jogador_ids)}": {"$exists": False}
+    }
+
+def add_players_update(jogadores: List[Dict[str, Any]], snapshot: bool = SNAPSHOT) -> Dict[str, Any]:
+    """$addToSet the player IDs (and $push the name-sorted snapshot when enabled)"""
+    update: Dict[str, Any] = {"$addToSet": {"jogador_ids": {"$each": [j["_id"] for j in jogadores]}}}
+    if snapshot:
+        update["$push"] = {"elenco": {"$each": [player_snapshot(j) for j in jogadores], "$sort": {"nome": 1}}}
+    return update
+
+def remove_player_update(jogador_id: int) -> Dict[str, Any]:
+    """Take a player out of every embedded roster (pair with {"jogador_ids": jogador_id})"""
+    return {"$pull": {"jogador_ids": jogador_id, "elenco": {"_id": jogador_id}}}
+
+def embedded_roster_stages(snapshot: bool = SNAPSHOT) -> List[Dict[str, Any]]:
+    """Stages on time_usuario that set jogadores: [{_id, nome, posicao}] sorted by name.
+
+    With the snapshot no collection is read at all; otherwise a single
+    $lookup on jogador replaces the two lookups of the link layout.
+    """
+    if snapshot:
+        return [{"$set": {"jogadores": {"$ifNull": ["$elenco", []]}}}]
+    return [
+        {
+            "$lookup": {
+                "from": "jogador",
+                "localField": "jogador_ids",
+                "foreignField": "_id",
+                "pipeline": [
+                    {"$project": {"_id": 1, "nome": 1, "posicao": 1}},
+                    {"$sort": {"nome": 1}}
+                ],
+                "as": "jogadores"
+            }
+        }
+    ]
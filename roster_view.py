@@ -0,0 +1,147 @@
+from pymongo import ASCENDING
+from pymongo.database import Database
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import os
+import sys
+import time
+import uuid
+from cache import invalidate_collection
+from database import get_database, close_database
+from indexes import apply_indexes
+import roster_schema
+
+ROSTER_VIEW_COLLECTION = "time_usuario_elenco"
+
+# The view is optional: when disabled the app keeps using the $lookup pipeline
+ENABLED = os.getenv("ROSTER_VIEW", "0").lower() in ("1", "true", "sim")
+
+def linked_roster_stages() -> List[Dict[str, Any]]:
+    """Stages that set jogadores: [{_id, nome, posicao}] from the time_usuario_jogador links"""
+    return [
+        {
+            "$lookup": {
+                "from": "time_usuario_jogador",
+                "let": {"time_usuario_id": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$time_usuario_id", "$$time_usuario_id"]}}},
+                    {
+                        "$lookup": {
+                            "from": "jogador",
+                            "localField": "jogador_id",
+                            "foreignField": "_id",
+                            "as": "jogador"
+                        }
+                    },
+                    {"$unwind": "$jogador"},
+                    {"$replaceRoot": {"newRoot": {
+                        "_id": "$jogador._id",
+                        "nome": "$jogador.nome",
+                        "posicao": "$jogador.posicao"
+                    }}},
+                    {"$sort": {"nome": 1}}
+                ],
+                "as": "jogadores"
+            }
+        }
+    ]
+
+def roster_stages() -> List[Dict[str, Any]]:
+    """Stages that turn time_usuario documents into {nome, usuario_id, dono, jogadores: [...]}"""
+    return [
+        {
+            "$lookup": {
+                "from": "usuario",
+                "localField": "usuario_id",
+                "foreignField": "_id",
+                "as": "usuario"
+            }
+        },
+        {"$unwind": "$usuario"},
+        *(roster_schema.embedded_roster_stages() if roster_schema.EMBEDDED else linked_roster_stages()),
+        {
+            "$project": {
+                "_id": 1,
+                "nome": 1,
+                "usuario_id": 1,
+                "dono": "$usuario.nome",
+                "jogadores": 1
+            }
+        }
+    ]
+
+def merge_pipeline(time_usuario_id: Optional[int] = None, versao: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Build the aggregation that materializes one document per user team"""
+    pipeline: List[Dict[str, Any]] = []
+    if time_usuario_id is not None:
+        pipeline.append({"$match": {"_id": time_usuario_id}})
+
+    pipeline += roster_stages()
+
+    if versao is not None:
+        pipeline.append({"$set": {"versao": {"$literal": versao}}})
+
+    pipeline.append({
+        "$merge": {
+            "into": ROSTER_VIEW_COLLECTION,
+            "on": "_id",
+            "whenMatched": "merge",
+            "whenNotMatched": "insert"
+        }
+    })
+    return pipeline
+
+def refresh_roster(db: Database, time_usuario_id: int) -> None:
+    """Incrementally refresh the materialized roster of a single user team"""
+    db.time_usuario.aggregate(merge_pipeline(time_usuario_id))
+    invalidate_collection(ROSTER_VIEW_COLLECTION)
+
+def refresh_all_rosters(db: Database) -> int:
+    """Rebuild every materialized roster and remove the ones whose team no longer exists"""
+    versao = uuid.uuid4().hex
+    db.time_usuario.aggregate(merge_pipeline(versao=versao))
+    db[ROSTER_VIEW_COLLECTION].delete_many({"versao": {"$ne": versao}})
+    apply_indexes(db, ROSTER_VIEW_COLLECTION)
+    invalidate_collection(ROSTER_VIEW_COLLECTION)
+    return db[ROSTER_VIEW_COLLECTION].count_documents({})
+
+def refresh_roster_if_enabled(db: Database, time_usuario_id: int) -> None:
+    """Keep the view current after a roster write, when the view is in use"""
+    if ENABLED:
+        refresh_roster(db, time_usuario_id)
+
+def iter_roster_rows(db: Database) -> Iterator[Tuple[Any, ...]]:
+    """Yield (time do usuário, dono, jogador, posição) rows from the materialized view"""
+    cursor = db[ROSTER_VIEW_COLLECTION].find(
+        {}, {"nome": 1, "dono": 1, "jogadores": 1}
+    ).sort([("nome", ASCENDING), ("_id", ASCENDING)])
+
+    for time_usuario in cursor:
+        yield from roster_rows(time_usuario)
+
+def roster_rows(time_usuario: Dict[str, Any]) -> Iterator[Tuple[Any, ...]]:
+    """Flatten one roster document into table rows (one row for an empty roster)"""
+    jogadores = time_usuario.get("jogadores") or []
+    if not jogadores:
+        yield (time_usuario["nome"], time_usuario["dono"], None, None)
+    for jogador in jogadores:
+        yield (time_usuario["nome"], time_usuario["dono"], jogador["nome"], jogador["posicao"])
+
+def main() -> None:
+    """Main function"""
+    print("=== Atualizando visão materializada dos elencos ===\n")
+
+    try:
+        started = time.perf_counter()
+        total = refresh_all_rosters(get_database())
+        elapsed = time.perf_counter() - started
+        print(f"✓ {total} times materializados em {ROSTER_VIEW_COLLECTION} ({elapsed:.2f}s)")
+        if not ENABLED:
+            print("  Defina ROSTER_VIEW=1 para que o aplicativo leia e mantenha a visão")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
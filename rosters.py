@@ -0,0 +1,171 @@
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from cache import invalidate_collection
+from ids import IDEMPOTENCY_FIELD, reserve_ids
+import roster_schema
+import roster_view
+from validation import ValidationError
+
+DUPLICATE_KEY_ERROR = 11000
+# Attempts of an embedded roster write that lost a race with another writer
+EMBEDDED_WRITE_ATTEMPTS = 3
+
+@dataclass
+class RosterAddResult:
+    """Outcome of adding players to a user team"""
+    inseridos: List[int] = field(default_factory=list)
+    duplicados: List[int] = field(default_factory=list)
+    inexistentes: List[int] = field(default_factory=list)
+
+def existing_players_pipeline(time_usuario_id: int, jogador_ids: List[int]) -> List[Dict[str, Any]]:
+    """Aggregation on time_usuario returning {jogadores: [ids that exist]}, or nothing if the team does not exist"""
+    if roster_schema.EMBEDDED:
+        # Also return the players already in the roster and what the snapshot needs
+        return [
+            {"$match": {"_id": time_usuario_id}},
+            {
+                "$lookup": {
+                    "from": "jogador",
+                    "pipeline": [
+                        {"$match": {"_id": {"$in": jogador_ids}}},
+                        {"$project": {"_id": 1, "nome": 1, "posicao": 1}}
+                    ],
+                    "as": "jogadores"
+                }
+            },
+            {"$project": {"jogadores": 1, "jogador_ids": {"$ifNull": ["$jogador_ids", []]}}}
+        ]
+
+    return [
+        {"$match": {"_id": time_usuario_id}},
+        {
+            "$lookup": {
+                "from": "jogador",
+                "pipeline": [
+                    {"$match": {"_id": {"$in": jogador_ids}}},
+                    {"$project": {"_id": 1}}
+                ],
+                "as": "jogadores"
+            }
+        },
+        {"$project": {"jogadores": "$jogadores._id"}}
+    ]
+
+# Pure helpers, shared with the async layer (async_db.py)
+
+def requested_players(jogador_ids: Iterable[int]) -> List[int]:
+    """The requested IDs without repeats; raise if there are none"""
+    requested = list(dict.fromkeys(jogador_ids))
+    if not requested:
+        raise ValidationError("Informe ao menos um jogador!")
+    return requested
+
+def split_requested(requested: List[int], existing: Iterable[int]) -> Tuple[RosterAddResult, List[int]]:
+    """(result with the missing players, players to link) for the IDs that exist"""
+    existing = set(existing)
+    result = RosterAddResult()
+    result.inexistentes = [j for j in requested if j not in existing]
+    return result, [j for j in requested if j in existing]
+
+def link_documents(time_usuario_id: int, first_id: int, jogador_ids: List[int],
+                   chave: Optional[str] = None) -> List[Dict[str, Any]]:
+    """time_usuario_jogador documents with IDs from first_id on; `chave` marks a retried call's links"""
+    docs = [
+        {"_id": first_id + i, "time_usuario_id": time_usuario_id, "jogador_id": jogador_id}
+        for i, jogador_id in enumerate(jogador_ids)
+    ]
+    if chave is not None:
+        for doc in docs:
+            doc[IDEMPOTENCY_FIELD] = chave
+    return docs
+
+def record_link_results(result: RosterAddResult, docs: List[Dict[str, Any]],
+                        error: Optional[BulkWriteError] = None) -> None:
+    """Fill inseridos/duplicados from an unordered insert_many; errors other than duplicates are raised"""
+    failed = set()
+    if error is not None:
+        for write_error in error.details.get("writeErrors", []):
+            if write_error.get("code") != DUPLICATE_KEY_ERROR:
+                raise error
+            failed.add(write_error["index"])
+            result.duplicados.append(docs[write_error["index"]]["jogador_id"])
+    result.inseridos = [doc["jogador_id"] for i, doc in enumerate(docs) if i not in failed]
+
+def _existing_players(db: Database, time_usuario_id: int, jogador_ids: List[int]) -> List[int]:
+    """Check the team and the players in one aggregation; raise if the team does not exist"""
+    found = next(db.time_usuario.aggregate(existing_players_pipeline(time_usuario_id, jogador_ids)), None)
+    if found is None:
+        raise ValidationError(f"Time de usuário ID {time_usuario_id} não existe!")
+    return found["jogadores"]
+
+def adicionar_jogadores(db: Database, time_usuario_id: int, jogador_ids: Iterable[int],
+                        chave: Optional[str] = None) -> RosterAddResult:
+    """Add one or more players to a user team.
+
+    Existence is validated with a single aggregation and duplicates are left
+    to the unique (time_usuario_id, jogador_id) index, so a whole roster costs
+    one validation, one ID reservation and one unordered insert_many.
+    `chave` is stored on the links (link layout) to recognize a retried call.
+    """
+    requested = requested_players(jogador_ids)
+    if roster_schema.EMBEDDED:
+        return _adicionar_embutido(db, time_usuario_id, requested)
+
+    result, to_insert = split_requested(requested, _existing_players(db, time_usuario_id, requested))
+    if not to_insert:
+        return result
+
+    first_id, _ = reserve_ids(db, "time_usuario_jogador", len(to_insert))
+    docs = link_documents(time_usuario_id, first_id, to_insert, chave)
+    try:
+        db.time_usuario_jogador.insert_many(docs, ordered=False)
+        record_link_results(result, docs)
+    except BulkWriteError as e:
+        record_link_results(result, docs, e)
+
+    if result.inseridos:
+        invalidate_collection("time_usuario_jogador")
+        roster_view.refresh_roster_if_enabled(db, time_usuario_id)
+
+    return result
+
+def plan_embedded_add(found: Dict[str, Any], requested: List[int],
+                      max_size: int = roster_schema.MAX_ROSTER_SIZE) -> Tuple[RosterAddResult, List[Dict[str, Any]]]:
+    """Split the requested players of an embedded roster into missing, already
+    present and to add; raise if the roster would go over the size limit"""
+    result = RosterAddResult()
+    jogadores = {jogador["_id"]: jogador for jogador in found["jogadores"]}
+    atuais = set(found["jogador_ids"])
+    result.inexistentes = [j for j in requested if j not in jogadores]
+    result.duplicados = [j for j in requested if j in jogadores and j in atuais]
+    to_add = [jogadores[j] for j in requested if j in jogadores and j not in atuais]
+    if len(atuais) + len(to_add) > max_size:
+        raise ValidationError(f"Elenco cheio: o limite é de {max_size} jogadores por time!")
+    return result, to_add
+
+def _adicionar_embutido(db: Database, time_usuario_id: int, requested: List[int]) -> RosterAddResult:
+    """adicionar_jogadores for the embedded layout: one aggregation and one guarded $addToSet"""
+    for _ in range(EMBEDDED_WRITE_ATTEMPTS):
+        found = next(db.time_usuario.aggregate(existing_players_pipeline(time_usuario_id, requested)), None)
+        if found is None:
+            raise ValidationError(f"Time de usuário ID {time_usuario_id} não existe!")
+
+        result, to_add = plan_embedded_add(found, requested)
+        if not to_add:
+            return result
+
+        ids = [jogador["_id"] for jogador in to_add]
+        updated = db.time_usuario.update_one(
+            roster_schema.add_players_filter(time_usuario_id, ids),
+            roster_schema.add_players_update(to_add)
+        )
+        if updated.matched_count:
+            result.inseridos = ids
+            invalidate_collection("time_usuario")
+            roster_view.refresh_roster_if_enabled(db, time_usuario_id)
+            return result
+        # Another writer changed the roster between the read and the update: read again
+
+    raise ValidationError("O elenco foi alterado por outra operação, tente novamente!")
@@ -0,0 +1,95 @@
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from collections.abc import MutableMapping
+from pymongo.collection import Collection
+from pymongo.database import Database
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Type
+import os
+
+# How listing cursors decode the documents they receive:
+#   "dict"  - a dict per document (PyMongo's default)
+#   "raw"   - RawBSONDocument: keeps the bytes and decodes a document only
+#             when a field is first read
+#   "linha" - an object with __slots__ for exactly the projected fields, so
+#             no per-document dict is allocated (flat documents only); the
+#             listings use the entity classes of entities.py
+# The three behave as read-only mappings, so the row builders of the
+# listings work with any of them.
+DECODE_DICT = "dict"
+DECODE_RAW = "raw"
+DECODE_ROW = "linha"
+DECODE_MODES = (DECODE_DICT, DECODE_RAW, DECODE_ROW)
+
+QUERY_DECODE = os.getenv("QUERY_DECODE", DECODE_DICT).lower()
+if QUERY_DECODE not in DECODE_MODES:
+    raise ValueError(f"QUERY_DECODE must be one of {', '.join(DECODE_MODES)}")
+
+_row_classes: Dict[Tuple[str, ...], Type[MutableMapping]] = {}
+
+class SlottedRow(MutableMapping):
+    """Base of the row classes: a mapping stored in slots instead of a dict"""
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}") from None
+
+    def __delitem__(self, key: str) -> None:
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in self.__slots__ if hasattr(self, name))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+def row_class(fields: Sequence[str]) -> Type[MutableMapping]:
+    """Slotted mapping class holding exactly `fields` (one class per field set)"""
+    key = tuple(fields)
+    cls = _row_classes.get(key)
+    if cls is None:
+        cls = type("Row_" + "_".join(name.strip("_") for name in key), (SlottedRow,), {"__slots__": key})
+        _row_classes[key] = cls
+    return cls
+
+def codec_options(fields: Sequence[str], mode: str = QUERY_DECODE,
+                  row_type: Optional[Type[MutableMapping]] = None) -> CodecOptions:
+    """CodecOptions that decode documents with the given projected fields in `mode`.
+
+    `row_type` replaces the generated row class (e.g. an entity of entities.py).
+    """
+    if mode == DECODE_RAW:
+        return CodecOptions(document_class=RawBSONDocument)
+    if mode == DECODE_ROW:
+        return CodecOptions(document_class=row_type or row_class(fields))
+    if mode == DECODE_DICT:
+        return CodecOptions()
+    raise ValueError(f"Unknown decode mode: {mode}")
+
+def collection(db: Database, name: str, fields: Sequence[str], mode: str = QUERY_DECODE,
+               row_type: Optional[Type[MutableMapping]] = None) -> Collection:
+    """`db[name]` decoding its results in `mode`; `fields` must cover the whole projection"""
+    if mode == DECODE_DICT:
+        return db[name]
+    return db.get_collection(name, codec_options=codec_options(fields, mode, row_type))
+
+def projection(fields: Sequence[str]) -> Dict[str, int]:
+    """find() projection returning only `fields`"""
+    spec = {name: 1 for name in fields}
+    if "_id" not in spec:
+        spec["_id"] = 0
+    return spec
@@ -0,0 +1,179 @@
+from pymongo import ASCENDING, UpdateOne
+from pymongo.database import Database
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+import argparse
+import os
+import re
+import sys
+import time
+import unicodedata
+from cache import reference_cache
+from database import get_database, close_database
+
+# Name search for the ID prompts. Every searchable document keeps two derived
+# keys, folded to lower case without accents or punctuation:
+#   nome_busca      - the whole name ("joao da silva")
+#   palavras_busca  - the name from each later word on (["da silva", "silva"])
+# Both are indexed, so a search is an index range scan on the folded prefix
+# ("^silva"). Results whose whole name starts with the term rank first
+# (an exact match before longer names), then those where a later word does.
+# The keys are written with the document by every write path (operations.py,
+# async_db.py, importer.py, setup_database.py, synthetic_data.py), so a search
+# only reads; `python search.py` (re)computes them for every document, e.g.
+# once on a database created before the search existed.
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "10"))
+
+NAME_KEY = "nome_busca"
+WORDS_KEY = "palavras_busca"
+
+REFRESH_BATCH = 1000
+
+class SearchSpec:
+    """What a search returns for one collection"""
+
+    def __init__(self, fields: Sequence[str], describe: Callable[[Mapping[str, Any]], str],
+                 stages: Optional[List[Dict[str, Any]]] = None, joins: Sequence[str] = ()) -> None:
+        self.fields = tuple(fields)
+        self.describe = describe
+        # Stages run on the limited result only (e.g. the team name $lookup)
+        self.stages = stages or []
+        self.joins = tuple(joins)
+
+def _lookup_name(from_collection: str, local_field: str, as_field: str) -> List[Dict[str, Any]]:
+    return [
+        {"$lookup": {"from": from_collection, "localField": local_field, "foreignField": "_id", "as": as_field}},
+        {"$set": {as_field: {"$first": f"${as_field}.nome"}}}
+    ]
+
+SEARCH_SPECS: Dict[str, SearchSpec] = {
+    "usuario": SearchSpec(
+        ("_id", "nome", "email"),
+        lambda d: f"{d['_id']} - {d['nome']} ({d.get('email')})"
+    ),
+    "time_oficial": SearchSpec(
+        ("_id", "nome", "sigla"),
+        lambda d: f"{d['_id']} - {d['nome']} ({d.get('sigla')})"
+    ),
+    "jogador": SearchSpec(
+        ("_id", "nome", "posicao", "time_oficial"),
+        lambda d: f"{d['_id']} - {d['nome']} ({d.get('posicao')}) - Time: {d.get('time_oficial') or 'Livre'}",
+        _lookup_name("time_oficial", "time_id", "time_oficial"), ("time_oficial",)
+    ),
+    "time_usuario": SearchSpec(
+        ("_id", "nome", "dono"),
+        lambda d: f"{d['_id']} - {d['nome']} (Dono: {d.get('dono')})",
+        _lookup_name("usuario", "usuario_id", "dono"), ("usuario",)
+    )
+}
+
+def fold(text: Any) -> str:
+    """Lower case, no accents, punctuation as spaces: "João D'Ávila" -> "joao d avila" """
+    if not isinstance(text, str):
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return " ".join(re.sub(r"[^\w]+", " ", stripped).split())
+
+def search_keys(nome: Any) -> Dict[str, Any]:
+    """The derived keys stored for a name"""
+    folded = fold(nome)
+    words = folded.split(" ")
+    return {NAME_KEY: folded, WORDS_KEY: [" ".join(words[i:]) for i in range(1, len(words))]}
+
+def with_search_keys(collection_name: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """A document to insert, with the search keys of its name when its collection is searchable"""
+    if collection_name not in SEARCH_SPECS:
+        return doc
+    return {**doc, **search_keys(doc.get("nome"))}
+
+def refresh_search_keys(db: Database, collection_name: str, only_missing: bool = True) -> int:
+    """Store the keys of the documents that lack them (or of every document); returns how many were written"""
+    query = {NAME_KEY: {"$exists": False}} if only_missing else {}
+    updates: List[UpdateOne] = []
+    total = 0
+    for doc in db[collection_name].find(query, {"nome": 1}):
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": search_keys(doc.get("nome"))}))
+        if len(updates) >= REFRESH_BATCH:
+            db[collection_name].bulk_write(updates, ordered=False)
+            total += len(updates)
+            updates = []
+    if updates:
+        db[collection_name].bulk_write(updates, ordered=False)
+        total += len(updates)
+    return total
+
+def _prefix(term: str) -> Dict[str, Any]:
+    # An anchored, case-sensitive regex is an index range scan. A folded term
+    # has only word characters and spaces, so it needs no escaping (escapes
+    # would keep the server from deriving the range)
+    return {"$regex": "^" + term}
+
+def _search_pipeline(spec: SearchSpec, match: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    return [
+        {"$match": match},
+        {"$sort": {NAME_KEY: ASCENDING, "_id": ASCENDING}},
+        {"$limit": limit},
+        *spec.stages,
+        {"$project": {name: 1 for name in spec.fields}}
+    ]
+
+def _search(db: Database, collection_name: str, term: str, limit: int) -> List[Dict[str, Any]]:
+    spec = SEARCH_SPECS[collection_name]
+    results = list(db[collection_name].aggregate(_search_pipeline(spec, {NAME_KEY: _prefix(term)}, limit)))
+    if len(results) < limit:
+        found = [doc["_id"] for doc in results]
+        match = {WORDS_KEY: _prefix(term), "_id": {"$nin": found}}
+        results += db[collection_name].aggregate(_search_pipeline(spec, match, limit - len(results)))
+    return results
+
+def search(db: Database, collection_name: str, termo: str, limit: int = SEARCH_LIMIT) -> List[Dict[str, Any]]:
+    """Documents whose name, or a word of it, starts with `termo` (ignoring case and accents), best first"""
+    if collection_name not in SEARCH_SPECS:
+        raise ValueError(f"Busca não disponível para {collection_name}")
+    term = fold(termo)
+    if not term:
+        return []
+    spec = SEARCH_SPECS[collection_name]
+    return reference_cache.get_or_load(
+        (db.name, "busca", collection_name, term, limit),
+        (collection_name, *spec.joins),
+        lambda: _search(db, collection_name, term, limit)
+    )
+
+def describe(collection_name: str, doc: Mapping[str, Any]) -> str:
+    """One line for a search result"""
+    return SEARCH_SPECS[collection_name].describe(doc)
+
+def main() -> None:
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Busca por nome (sem diferenciar maiúsculas e acentos) ou recalcula as chaves de busca")
+    parser.add_argument("colecao", nargs="?", choices=sorted(SEARCH_SPECS))
+    parser.add_argument("termo", nargs="?", help="início do nome ou de uma palavra do nome")
+    parser.add_argument("--limite", type=int, default=SEARCH_LIMIT)
+    args = parser.parse_args()
+
+    if args.colecao and not args.termo:
+        parser.error("informe o termo da busca")
+
+    try:
+        db = get_database()
+        if args.colecao:
+            results = search(db, args.colecao, args.termo, args.limite)
+            for doc in results:
+                print(f"  {describe(args.colecao, doc)}")
+            print(f"\n{len(results)} resultado(s)")
+            return
+
+        print("=== Chaves de busca por nome ===\n")
+        for name in SEARCH_SPECS:
+            started = time.perf_counter()
+            total = refresh_search_keys(db, name, only_missing=False)
+            print(f"✓ {name}: {total} documentos ({time.perf_counter() - started:.2f}s)")
+    except Exception as e:
+        print(f"\n✗ Erro fatal: {e}")
+        sys.exit(1)
+    finally:
+        close_database()
+
+if __name__ == "__main__":
+    main()
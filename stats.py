@@ -0,0 +1,27 @@
+from typing import Any, Dict, List
+
+# Latency summaries shared by the benchmark and load-test scripts
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentile with linear interpolation over already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+def summarize(timings: List[float]) -> Dict[str, Any]:
+    """p50/p95/p99, mean, min and max of a list of durations in ms"""
+    ordered = sorted(timings)
+    if not ordered:
+        return {"runs": 0}
+    return {
+        "runs": len(ordered),
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3)
+    }
@@ -0,0 +1,140 @@
+from pymongo.database import Database
+from dataclasses import asdict, dataclass
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List
+import bisect
+import random
+from ids import COUNTERS_COLLECTION, sync_all_counters
+from indexes import apply_indexes
+from migrate_rosters import migrate_to_embedded
+from position_counts import rebuild_position_counts
+import roster_schema
+from search import with_search_keys
+
+COLLECTIONS = ("usuario", "time_oficial", "jogador", "time_usuario", "time_usuario_jogador")
+POSICOES = ["Goleiro", "Defensor", "Meio-campo", "Atacante"]
+# Roughly the shape of a real squad
+POSICAO_PESOS = [2, 8, 8, 5]
+INSERT_BATCH = 10000
+
+@dataclass
+class SyntheticConfig:
+    """Volumes and skew of a generated dataset; the same seed always yields the same data"""
+    usuarios: int = 1000
+    times_oficiais: int = 20
+    jogadores: int = 2000
+    times_por_usuario: float = 1.5
+    elenco: int = 11
+    jogadores_livres: float = 0.05
+    skew: float = 1.1
+    seed: int = 42
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class ZipfSampler:
+    """Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s"""
+
+    def __init__(self, n: int, s: float, rng: random.Random) -> None:
+        self._cumulative = list(accumulate(1.0 / (rank + 1) ** s for rank in range(n)))
+        self._rng = rng
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self._cumulative, self._rng.random() * self._cumulative[-1])
+
+def _insert_batched(db: Database, collection_name: str, docs: Iterator[Dict[str, Any]]) -> int:
+    total = 0
+    batch: List[Dict[str, Any]] = []
+    for doc in docs:
+        batch.append(with_search_keys(collection_name, doc))
+        if len(batch) >= INSERT_BATCH:
+            db[collection_name].insert_many(batch, ordered=False)
+            total += len(batch)
+            batch = []
+    if batch:
+        db[collection_name].insert_many(batch, ordered=False)
+        total += len(batch)
+    return total
+
+def generate(db: Database, config: SyntheticConfig) -> Dict[str, int]:
+    """Drop the app collections of `db` and fill them with a synthetic dataset.
+
+    Skew: big official teams have more players, a few teams are the
+    favourite of most users, some users own many teams and popular players
+    appear in many rosters (all Zipf-distributed).
+    """
+    if config.elenco > config.jogadores:
+        raise ValueError("elenco cannot be larger than the number of players")
+
+    rng = random.Random(config.seed)
+    counts: Dict[str, int] = {}
+
+    for name in COLLECTIONS + (COUNTERS_COLLECTION,):
+        db[name].drop()
+
+    siglas = [f"T{i:03d}" for i in range(1, config.times_oficiais + 1)]
+    counts["time_oficial"] = _insert_batched(db, "time_oficial", (
+        {"_id": i, "nome": f"Time {sigla}", "sigla": sigla, "nome_curto": sigla}
+        for i, sigla in enumerate(siglas, start=1)
+    ))
+
+    team_sampler = ZipfSampler(config.times_oficiais, config.skew, rng)
+
+    def jogadores() -> Iterator[Dict[str, Any]]:
+        for i in range(1, config.jogadores + 1):
+            livre = rng.random() < config.jogadores_livres
+            yield {
+                "_id": i,
+                "nome": f"Jogador {i:07d}",
+                "posicao": rng.choices(POSICOES, POSICAO_PESOS)[0],
+                "time_id": None if livre else team_sampler.sample() + 1
+            }
+
+    counts["jogador"] = _insert_batched(db, "jogador", jogadores())
+
+    def usuarios() -> Iterator[Dict[str, Any]]:
+        for i in range(1, config.usuarios + 1):
+            yield {
+                "_id": i,
+                "nome": f"Usuario {i:07d}",
+                "email": f"usuario{i}@example.com",
+                "senha": "hash",
+                "sexo": rng.choice("MFO"),
+                "telefone": None,
+                "data_nascimento": f"{rng.randint(1960, 2008)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "time_preferido": siglas[team_sampler.sample()] if rng.random() < 0.9 else None
+            }
+
+    counts["usuario"] = _insert_batched(db, "usuario", usuarios())
+
+    # Team ownership: most users own one team, a long tail owns many
+    total_times = max(1, int(config.usuarios * config.times_por_usuario))
+    owner_sampler = ZipfSampler(config.usuarios, config.skew, rng)
+    owners = list(range(1, config.usuarios + 1)) + [
+        owner_sampler.sample() + 1 for _ in range(max(0, total_times - config.usuarios))
+    ]
+    counts["time_usuario"] = _insert_batched(db, "time_usuario", (
+        {"_id": i, "nome": f"Time {i:07d}", "usuario_id": owner}
+        for i, owner in enumerate(owners, start=1)
+    ))
+
+    player_sampler = ZipfSampler(config.jogadores, config.skew, rng)
+
+    def links() -> Iterator[Dict[str, Any]]:
+        link_id = 0
+        for time_usuario_id in range(1, len(owners) + 1):
+            escolhidos = set()
+            while len(escolhidos) < config.elenco:
+                escolhidos.add(player_sampler.sample() + 1)
+            for jogador_id in sorted(escolhidos):
+                link_id += 1
+                yield {"_id": link_id, "time_usuario_id": time_usuario_id, "jogador_id": jogador_id}
+
+    counts["time_usuario_jogador"] = _insert_batched(db, "time_usuario_jogador", links())
+
+    sync_all_counters(db, COLLECTIONS)
+    rebuild_position_counts(db)
+    apply_indexes(db)
+    if roster_schema.EMBEDDED:
+        migrate_to_embedded(db)
+    return counts
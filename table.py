@@ -0,0 +1,68 @@
+from itertools import islice
+from typing import Any, Iterable, List, Sequence, Tuple
+
+# Rows buffered to compute column widths before streaming the rest
+WIDTH_SAMPLE_SIZE = 100
+
+def format_cell(cell: Any) -> str:
+    """Render a single table cell"""
+    return str(cell) if cell is not None else "NULL"
+
+def _print_row(cells: Sequence[Any], col_widths: List[int]) -> None:
+    print(" | ".join(format_cell(cell).ljust(col_widths[i]) for i, cell in enumerate(cells)))
+
+def _print_header(headers: List[str], col_widths: List[int]) -> None:
+    header_row = " | ".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
+    separator = "-+-".join("-" * w for w in col_widths)
+
+    print(header_row)
+    print(separator)
+
+def _widths(headers: List[str], rows: Iterable[Tuple[Any, ...]]) -> List[int]:
+    col_widths = [len(h) for h in headers]
+
+    for row in rows:
+        for i, cell in enumerate(row):
+            col_widths[i] = max(col_widths[i], len(format_cell(cell)))
+
+    return col_widths
+
+def print_table(headers: List[str], rows: List[Tuple[Any, ...]]) -> None:
+    """Print query results in a formatted table"""
+    if not rows:
+        print("Nenhum resultado encontrado.")
+        return
+
+    col_widths = _widths(headers, rows)
+    _print_header(headers, col_widths)
+
+    for row in rows:
+        _print_row(row, col_widths)
+    print()
+
+def print_table_stream(headers: List[str], rows: Iterable[Tuple[Any, ...]],
+                       sample_size: int = WIDTH_SAMPLE_SIZE) -> int:
+    """Print rows as they are produced, sizing columns from the first `sample_size` rows.
+
+    Later cells wider than the sample are printed in full (the row just
+    overflows its column). Returns the number of rows printed.
+    """
+    iterator = iter(rows)
+    sample = list(islice(iterator, sample_size))
+    if not sample:
+        print("Nenhum resultado encontrado.")
+        return 0
+
+    col_widths = _widths(headers, sample)
+    _print_header(headers, col_widths)
+
+    count = 0
+    for row in sample:
+        _print_row(row, col_widths)
+        count += 1
+    for row in iterator:
+        _print_row(row, col_widths)
+        count += 1
+    print()
+
+    return count
@@ -0,0 +1,142 @@
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional
+
+# Menu option -> stored value, as offered by cadastrar_usuario
+SEXO_OPCOES = {"1": "M", "2": "F", "3": "O"}
+SEXO_VALORES = set(SEXO_OPCOES.values())
+
+class ValidationError(ValueError):
+    """Raised when a record breaks one of the registration rules"""
+
+def _text(value: Any) -> str:
+    """Normalize a raw value (from input(), CSV or JSON) to a stripped string"""
+    if value is None:
+        return ""
+    return str(value).strip()
+
+def required(value: Any, message: str) -> str:
+    """Return the stripped value or raise if it is empty"""
+    text = _text(value)
+    if not text:
+        raise ValidationError(message)
+    return text
+
+def optional(value: Any) -> Optional[str]:
+    """Return the stripped value, or None if it is empty"""
+    text = _text(value)
+    return text if text else None
+
+def is_valid_date(value: str) -> bool:
+    """Check a date in the AAAA-MM-DD format"""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+def parse_sexo(value: Any) -> str:
+    """Accept either the menu option (1-3) or the stored value (M/F/O)"""
+    text = _text(value).upper()
+    sexo = SEXO_OPCOES.get(text, text)
+    if sexo not in SEXO_VALORES:
+        raise ValidationError("Opção de sexo inválida!")
+    return sexo
+
+def parse_id(value: Any, message: str = "ID inválido!") -> int:
+    """Parse a required integer ID"""
+    if isinstance(value, bool):
+        raise ValidationError(message)
+    if isinstance(value, int):
+        return value
+    try:
+        return int(_text(value))
+    except ValueError:
+        raise ValidationError(message) from None
+
+def parse_id_list(value: Any) -> List[int]:
+    """Parse one or more IDs separated by commas or spaces"""
+    if isinstance(value, (list, tuple)):
+        items = list(value)
+    else:
+        items = _text(value).replace(",", " ").split()
+    if not items:
+        raise ValidationError("ID inválido!")
+    return [parse_id(item) for item in items]
+
+def parse_time_id(value: Any) -> Optional[int]:
+    """Parse the official team of a player; empty or 0 means free agent"""
+    text = _text(value)
+    if not text or text == "0":
+        return None
+    return parse_id(text)
+
+def validate_usuario(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """Validate a user record, returning the document to store (without _id)"""
+    nome = required(data.get("nome"), "Nome é obrigatório!")
+    email = required(data.get("email"), "Email é obrigatório!")
+    senha = required(data.get("senha"), "Senha é obrigatória!")
+    sexo = parse_sexo(data.get("sexo"))
+    data_nascimento = _text(data.get("data_nascimento"))
+    if not is_valid_date(data_nascimento):
+        raise ValidationError("Data inválida! Use o formato AAAA-MM-DD")
+
+    return {
+        "nome": nome,
+        "email": email,
+        "senha": senha,
+        "sexo": sexo,
+        "telefone": optional(data.get("telefone")),
+        "data_nascimento": data_nascimento,
+        "time_preferido": optional(data.get("time_preferido"))
+    }
+
+def validate_time_oficial(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """Validate an official team record"""
+    nome = required(data.get("nome"), "Nome é obrigatório!")
+    sigla = required(data.get("sigla"), "Sigla é obrigatória!").upper()
+    time_oficial = {"nome": nome, "sigla": sigla}
+
+    nome_curto = optional(data.get("nome_curto"))
+    if nome_curto:
+        time_oficial["nome_curto"] = nome_curto
+
+    return time_oficial
+
+def validate_jogador(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """Validate a player record"""
+    nome = required(data.get("nome"), "Nome é obrigatório!")
+    posicao = required(data.get("posicao"), "Posição é obrigatória!")
+    return {
+        "nome": nome,
+        "posicao": posicao,
+        "time_id": parse_time_id(data.get("time_id"))
+    }
+
+def validate_time_usuario(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """Validate a user team record (the owner must still be checked in the database)"""
+    usuario_id = parse_id(data.get("usuario_id"))
+    nome = required(data.get("nome"), "Nome é obrigatório!")
+    return {"nome": nome, "usuario_id": usuario_id}
+
+def validate_time_usuario_jogador(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """Validate a roster link (team and player must still be checked in the database)"""
+    return {
+        "time_usuario_id": parse_id(data.get("time_usuario_id")),
+        "jogador_id": parse_id(data.get("jogador_id"))
+    }
+
+VALIDATORS = {
+    "usuario": validate_usuario,
+    "time_oficial": validate_time_oficial,
+    "jogador": validate_jogador,
+    "time_usuario": validate_time_usuario,
+    "time_usuario_jogador": validate_time_usuario_jogador
+}
+
+# Foreign keys checked before inserting: field -> referenced collection
+FOREIGN_KEYS = {
+    # Nullable: a player without an official team has time_id None
+    "jogador": {"time_id": "time_oficial"},
+    "time_usuario": {"usuario_id": "usuario"},
+    "time_usuario_jogador": {"time_usuario_id": "time_usuario", "jogador_id": "jogador"}
+}
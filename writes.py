@@ -0,0 +1,254 @@
+from collections import defaultdict
+from pymongo.database import Database
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, OperationFailure, PyMongoError
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, TypeVar
+import os
+import random
+import threading
+import time
+import uuid
+from cache import invalidate_collection
+from ids import IDEMPOTENCY_FIELD
+import operations
+from position_counts import ensure_position_counts, recount_position
+import roster_schema
+import roster_view
+from rosters import RosterAddResult
+
+# Retrying layer over the creates of operations.py, used by the menus and
+# the API. The driver already retries a failed write once (retryWrites); this
+# layer covers longer outages (failover, exhausted pool):
+#   - only transient errors are retried (network, no primary, pool wait
+#     timeout, write conflicts, errors labeled RetryableWriteError);
+#   - attempts wait with jittered exponential backoff ("full jitter");
+#   - retries spend tokens from a shared budget that successes refill, so an
+#     outage does not multiply the load by the number of attempts;
+#   - every call has an idempotency key (chosen by the caller or generated),
+#     stored with the created document: an attempt that finds its key already
+#     stored returns that document instead of creating another one. Roster
+#     links are protected by their unique (time_usuario_id, jogador_id) index;
+#     the key only tells a retried call's own links from pre-existing ones.
+# An attempt can fail after its insert but before the follow-up writes
+# (position counts, roster view, cache invalidation), so a replay redoes them
+# in a form that is safe to repeat: the player's count is recounted instead
+# of incremented, the view is recomputed and the caches invalidated.
+WRITE_RETRY_ATTEMPTS = int(os.getenv("WRITE_RETRY_ATTEMPTS", "5"))
+WRITE_RETRY_BASE_MS = float(os.getenv("WRITE_RETRY_BASE_MS", "50"))
+WRITE_RETRY_MAX_MS = float(os.getenv("WRITE_RETRY_MAX_MS", "2000"))
+# Retries available at once, and tokens returned by each success
+WRITE_RETRY_BUDGET = float(os.getenv("WRITE_RETRY_BUDGET", "10"))
+WRITE_RETRY_BUDGET_RATIO = float(os.getenv("WRITE_RETRY_BUDGET_RATIO", "0.1"))
+
+WRITE_CONFLICT = 112
+RETRYABLE_CODES = {WRITE_CONFLICT}
+RETRYABLE_LABELS = ("RetryableWriteError", "TransientTransactionError")
+
+T = TypeVar("T")
+
+class RetryBudget:
+    """Token bucket shared by every write of the process"""
+
+    def __init__(self, max_tokens: float = WRITE_RETRY_BUDGET, ratio: float = WRITE_RETRY_BUDGET_RATIO) -> None:
+        self.max_tokens = max_tokens
+        self.ratio = ratio
+        self._lock = threading.Lock()
+        self.tokens = max_tokens
+
+    def withdraw(self) -> bool:
+        """Take a token for one retry; False when the budget is exhausted"""
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+class WriteMetrics:
+    """Calls, retries and give-ups per operation"""
+
+    COUNTERS = ("chamadas", "sucessos", "falhas", "retentativas", "desistencias", "sem_orcamento", "reaplicadas")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(self.COUNTERS, 0))
+            self._backoff_ms: Dict[str, float] = defaultdict(float)
+
+    def add(self, operation: str, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[operation][counter] += n
+
+    def waited(self, operation: str, ms: float) -> None:
+        with self._lock:
+            self._backoff_ms[operation] += ms
+
+    def by_operation(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {**counts, "espera_backoff_ms": round(self._backoff_ms[name], 1)}
+                for name, counts in sorted(self._counts.items())
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals over every operation, plus the tokens left in the retry budget"""
+        totals: Dict[str, Any] = dict.fromkeys(self.COUNTERS, 0)
+        totals["espera_backoff_ms"] = 0.0
+        for counts in self.by_operation().values():
+            for key, value in counts.items():
+                totals[key] += value
+        totals["espera_backoff_ms"] = round(totals["espera_backoff_ms"], 1)
+        totals["orcamento_tokens"] = round(retry_budget.tokens, 2)
+        return totals
+
+retry_budget = RetryBudget()
+write_metrics = WriteMetrics()
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient failures that a later attempt can succeed on"""
+    if isinstance(error, DuplicateKeyError):
+        return False
+    if isinstance(error, ConnectionFailure):
+        # Network errors, no primary, server selection and pool wait timeouts
+        return True
+    if isinstance(error, PyMongoError) and any(error.has_error_label(label) for label in RETRYABLE_LABELS):
+        return True
+    return isinstance(error, OperationFailure) and error.code in RETRYABLE_CODES
+
+def backoff_ms(attempt: int, base_ms: float = WRITE_RETRY_BASE_MS, max_ms: float = WRITE_RETRY_MAX_MS,
+               rng: Optional[random.Random] = None) -> float:
+    """Wait before retry number `attempt` (1, 2, ...): uniform in [0, min(max, base * 2^(attempt-1))]"""
+    return (rng or random).uniform(0, min(max_ms, base_ms * 2 ** (attempt - 1)))
+
+def execute(operation: str, attempt: Callable[[int], T], attempts: int = WRITE_RETRY_ATTEMPTS,
+            budget: Optional[RetryBudget] = None, sleep: Callable[[float], Any] = time.sleep) -> T:
+    """Call attempt(n) for n = 0, 1, ... until it succeeds or the error is permanent.
+
+    Gives up with the last error after `attempts` calls or when the retry
+    budget has no tokens left.
+    """
+    budget = budget or retry_budget
+    write_metrics.add(operation, "chamadas")
+    n = 0
+    while True:
+        try:
+            result = attempt(n)
+        except Exception as e:
+            if not is_retryable(e):
+                write_metrics.add(operation, "falhas")
+                raise
+            if n + 1 >= attempts:
+                write_metrics.add(operation, "desistencias")
+                raise
+            if not budget.withdraw():
+                write_metrics.add(operation, "sem_orcamento")
+                raise
+            n += 1
+            write_metrics.add(operation, "retentativas")
+            delay = backoff_ms(n)
+            write_metrics.waited(operation, delay)
+            sleep(delay / 1000)
+            continue
+        budget.deposit()
+        write_metrics.add(operation, "sucessos")
+        return result
+
+def new_key() -> str:
+    """A fresh idempotency key"""
+    return uuid.uuid4().hex
+
+def _replay_jogador(db: Database, jogador: Dict[str, Any]) -> None:
+    ensure_position_counts(db)
+    recount_position(db, jogador.get("time_id"), jogador.get("posicao"))
+
+def _replay_time_usuario(db: Database, time_usuario: Dict[str, Any]) -> None:
+    roster_view.refresh_roster_if_enabled(db, time_usuario["_id"])
+
+# collection -> follow-up writes of its create, in a form safe to repeat
+REPLAYS: Dict[str, Callable[[Database, Dict[str, Any]], None]] = {
+    "jogador": _replay_jogador,
+    "time_usuario": _replay_time_usuario
+}
+
+def _create(db: Database, collection_name: str, operation: Callable[..., Dict[str, Any]],
+            dados: Mapping[str, Any], chave: Optional[str]) -> Dict[str, Any]:
+    # A key given by the caller may belong to a request that was already applied
+    check_first = chave is not None
+    key = chave if chave is not None else new_key()
+
+    def stored() -> Optional[Dict[str, Any]]:
+        doc = db[collection_name].find_one({IDEMPOTENCY_FIELD: key})
+        if doc is not None:
+            write_metrics.add(operation.__name__, "reaplicadas")
+        return doc
+
+    def attempt(n: int) -> Dict[str, Any]:
+        if n > 0 or check_first:
+            doc = stored()
+            if doc is not None:
+                # The attempt that inserted it may have failed before its follow-ups
+                if collection_name in REPLAYS:
+                    REPLAYS[collection_name](db, doc)
+                invalidate_collection(collection_name)
+                return doc
+        try:
+            return operation(db, dados, chave=key)
+        except DuplicateKeyError:
+            # A concurrent call with the same key won (unique key index) and
+            # makes its own follow-up writes
+            doc = stored()
+            if doc is None:
+                raise
+            return doc
+
+    return execute(operation.__name__, attempt)
+
+def cadastrar_usuario(db: Database, dados: Mapping[str, Any], chave: Optional[str] = None) -> Dict[str, Any]:
+    """operations.cadastrar_usuario with retries"""
+    return _create(db, "usuario", operations.cadastrar_usuario, dados, chave)
+
+def cadastrar_time_oficial(db: Database, dados: Mapping[str, Any], chave: Optional[str] = None) -> Dict[str, Any]:
+    """operations.cadastrar_time_oficial with retries"""
+    return _create(db, "time_oficial", operations.cadastrar_time_oficial, dados, chave)
+
+def cadastrar_jogador(db: Database, dados: Mapping[str, Any], chave: Optional[str] = None) -> Dict[str, Any]:
+    """operations.cadastrar_jogador with retries"""
+    return _create(db, "jogador", operations.cadastrar_jogador, dados, chave)
+
+def criar_time_usuario(db: Database, dados: Mapping[str, Any], chave: Optional[str] = None) -> Dict[str, Any]:
+    """operations.criar_time_usuario with retries"""
+    return _create(db, "time_usuario", operations.criar_time_usuario, dados, chave)
+
+def adicionar_jogadores(db: Database, time_usuario_id: int, jogador_ids: Iterable[int],
+                        chave: Optional[str] = None) -> RosterAddResult:
+    """operations.adicionar_jogadores with retries.
+
+    Players linked by an earlier attempt of the same call (same key) are
+    reported as inserted, not as duplicates. In the embedded layout the
+    $addToSet is idempotent but leaves no key, so they show as duplicates.
+    """
+    requested = list(jogador_ids)
+    check_first = chave is not None
+    key = chave if chave is not None else new_key()
+
+    def attempt(n: int) -> RosterAddResult:
+        result = operations.adicionar_jogadores(db, time_usuario_id, requested, chave=key)
+        if (n > 0 or check_first) and result.duplicados and not roster_schema.EMBEDDED:
+            ours = set(db.time_usuario_jogador.distinct(
+                "jogador_id", {"time_usuario_id": time_usuario_id, IDEMPOTENCY_FIELD: key}
+            ))
+            if ours:
+                write_metrics.add("adicionar_jogadores", "reaplicadas")
+                # The attempt that linked them may have failed before its follow-ups
+                invalidate_collection("time_usuario_jogador")
+                roster_view.refresh_roster_if_enabled(db, time_usuario_id)
+                result.inseridos += [j for j in result.duplicados if j in ours]
+                result.duplicados = [j for j in result.duplicados if j not in ours]
+        return result
+
+    return execute("adicionar_jogadores", attempt)